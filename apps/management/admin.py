@@ -1,6 +1,7 @@
 # apps/management/admin.py
 from django.contrib import admin
 from .models import Account, Category, Transaction, Debt
+from .purge import soft_delete_account, soft_delete_category
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
@@ -9,6 +10,14 @@ class AccountAdmin(admin.ModelAdmin):
     list_filter = ("currency",)
     ordering = ("-id",)
 
+    # удаление через soft delete + purge в воркере (у счёта могут быть тысячи транзакций)
+    def delete_model(self, request, obj):
+        soft_delete_account(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            soft_delete_account(obj)
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "name", "type")
@@ -16,6 +25,13 @@ class CategoryAdmin(admin.ModelAdmin):
     list_filter = ("type",)
     ordering = ("type", "name")
 
+    def delete_model(self, request, obj):
+        soft_delete_category(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            soft_delete_category(obj)
+
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "type", "amount", "title", "occurred_at", "created_at")
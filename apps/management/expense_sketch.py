@@ -0,0 +1,169 @@
+import math
+import struct
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.management.models import ExpenseSketch, Transaction
+from apps.users.models import UserProfile
+
+# -------------------------
+# "Большой расход" по своим же тратам: на (юзер, категория) храним DDSketch —
+# логарифмические корзины с относительной ошибкой SKETCH_ALPHA. Добавление O(1),
+# перцентиль — проход по <= SKETCH_MAX_BINS корзинам, blob — сотни байт. Историю не сканируем.
+# Правка/удаление операции через API убирает старую сумму из скетча. Purge счёта/категории
+# скетчи не правит: удалённые пачкой суммы остаются в распределении (на перцентиль это почти не влияет).
+# -------------------------
+
+SKETCH_ALPHA = 0.02
+SKETCH_MAX_BINS = 128
+
+# пока трат в категории меньше — работает прежний фиксированный порог
+BIG_EXPENSE_MIN_SAMPLES = getattr(settings, "BIG_EXPENSE_MIN_SAMPLES", 20)
+BIG_EXPENSE_FALLBACK_THRESHOLD = Decimal(str(getattr(settings, "BIG_EXPENSE_FALLBACK_THRESHOLD", 1000)))
+BIG_EXPENSE_DEFAULT_PERCENTILE = 95
+
+_HEADER = struct.Struct(">BHI")  # версия, число корзин, всего значений
+_BIN = struct.Struct(">hI")      # индекс корзины, счётчик
+_VERSION = 1
+
+
+class QuantileSketch:
+    """
+    DDSketch (Masson et al., 2019): значение x попадает в корзину ceil(log_gamma(x)),
+    gamma = (1 + a) / (1 - a). Любой перцентиль восстанавливается с относительной ошибкой a.
+    При переполнении сливаем нижние корзины — точность теряется только у мелких сумм.
+    """
+
+    gamma = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+    log_gamma = math.log(gamma)
+    # суммы меньше 0.01 (и нулевые) кладём в корзину минимума
+    min_value = 0.01
+
+    def __init__(self, bins: dict | None = None, count: int = 0):
+        self.bins = bins or {}
+        self.count = count
+
+    def key(self, value: float) -> int:
+        return math.ceil(math.log(max(value, self.min_value)) / self.log_gamma)
+
+    def add(self, value) -> None:
+        k = self.key(float(value))
+        self.bins[k] = self.bins.get(k, 0) + 1
+        self.count += 1
+        if len(self.bins) > SKETCH_MAX_BINS:
+            self._collapse()
+
+    def remove(self, value) -> None:
+        """
+        Обратное add. Корзину мелкой суммы могли слить в следующую (_collapse) —
+        тогда уменьшаем ближайшую корзину выше.
+        """
+        k = self.key(float(value))
+        if k not in self.bins:
+            k = min((b for b in self.bins if b > k), default=None)
+            if k is None:
+                return
+        self.bins[k] -= 1
+        if not self.bins[k]:
+            del self.bins[k]
+        self.count -= 1
+
+    def _collapse(self) -> None:
+        lowest, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(lowest)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if seen > rank:
+                # середина корзины (gamma^(k-1), gamma^k] в смысле относительной ошибки
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_bytes(self) -> bytes:
+        parts = [_HEADER.pack(_VERSION, len(self.bins), self.count)]
+        parts += [_BIN.pack(k, n) for k, n in sorted(self.bins.items())]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data) -> "QuantileSketch":
+        data = bytes(data or b"")
+        if len(data) < _HEADER.size:
+            return cls()
+        version, nbins, count = _HEADER.unpack_from(data)
+        if version != _VERSION:
+            return cls()
+        bins = dict(_BIN.iter_unpack(data[_HEADER.size:_HEADER.size + nbins * _BIN.size]))
+        return cls(bins, count)
+
+
+def _save(row: ExpenseSketch, sketch: QuantileSketch) -> None:
+    row.data = sketch.to_bytes()
+    row.count = sketch.count
+    row.save(update_fields=["data", "count", "updated_at"])
+
+
+def big_expense_percentile(user_id: int) -> int:
+    value = UserProfile.objects.filter(user_id=user_id).values_list("big_expense_percentile", flat=True).first()
+    return value or BIG_EXPENSE_DEFAULT_PERCENTILE
+
+
+def record_expense(tx) -> bool:
+    """
+    Добавляет расход в скетч его категории и говорит, "большой" ли он:
+    сравнение идёт с тратами ДО этой (сама сумма перцентиль не сдвигает).
+    """
+    percentile = big_expense_percentile(tx.user_id)
+
+    with transaction.atomic():
+        row, _ = ExpenseSketch.objects.select_for_update().get_or_create(
+            user_id=tx.user_id, category_id=tx.category_id,
+        )
+        sketch = QuantileSketch.from_bytes(row.data)
+
+        if sketch.count >= BIG_EXPENSE_MIN_SAMPLES:
+            is_big = float(tx.amount) > sketch.quantile(percentile / 100)
+        else:
+            is_big = tx.amount >= BIG_EXPENSE_FALLBACK_THRESHOLD
+
+        sketch.add(tx.amount)
+        _save(row, sketch)
+    return is_big
+
+
+def expense_sample(tx):
+    """
+    -> (user_id, category_id, amount) для расхода, None для дохода.
+    """
+    if tx.type != Transaction.EXPENSE:
+        return None
+    return tx.user_id, tx.category_id, tx.amount
+
+
+def replace_expense(old, new) -> None:
+    """
+    Правка/удаление операции: old/new — expense_sample() до и после (None — не расход / удалена).
+    """
+    if old == new:
+        return
+
+    with transaction.atomic():
+        if old:
+            user_id, category_id, amount = old
+            row = ExpenseSketch.objects.select_for_update().filter(user_id=user_id, category_id=category_id).first()
+            if row:
+                sketch = QuantileSketch.from_bytes(row.data)
+                sketch.remove(amount)
+                _save(row, sketch)
+        if new:
+            user_id, category_id, amount = new
+            row, _ = ExpenseSketch.objects.select_for_update().get_or_create(user_id=user_id, category_id=category_id)
+            sketch = QuantileSketch.from_bytes(row.data)
+            sketch.add(amount)
+            _save(row, sketch)
@@ -3,11 +3,34 @@ from django.conf import settings
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+
+# -------------------------
+# Soft delete: удалённое сразу пропадает из API (objects), строки
+# удаляет/обнуляет celery-задача пачками (apps.management.purge).
+# all_objects — полный доступ для purge/админки.
+# -------------------------
+class AliveManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class AliveTransactionManager(models.Manager):
+    # транзакции удалённого счёта исчезают вместе с ним, не дожидаясь purge
+    def get_queryset(self):
+        return super().get_queryset().filter(account__deleted_at__isnull=True)
+
+
 class Account(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="accounts")
     name = models.CharField(max_length=100, default="Основной")
     currency = models.CharField(max_length=5, default="KGS")
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+    # аренда purge: воркер, который сейчас чистит объект (apps.management.purge)
+    purge_started_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = AliveManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = "Счёт"
@@ -29,12 +52,23 @@ class Category(models.Model):
     name = models.CharField(max_length=100)
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, default=TYPE_EXPENSE)
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+    # аренда purge: воркер, который сейчас чистит объект (apps.management.purge)
+    purge_started_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = AliveManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = "Категория"
         verbose_name_plural = "Категории"
         constraints = [
-            models.UniqueConstraint(fields=["user", "name", "type"], name="uniq_user_category_name_type")
+            # удалённая (ждёт purge) категория не мешает создать такую же заново
+            models.UniqueConstraint(
+                fields=["user", "name", "type"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="uniq_user_category_name_type",
+            )
         ]
 
     def __str__(self):
@@ -61,6 +95,9 @@ class Transaction(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = AliveTransactionManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f"{self.type} {self.amount}"
 
@@ -94,3 +131,33 @@ class Debt(models.Model):
 
     def __str__(self):
         return f"{self.kind}: {self.person_name} {self.amount}"
+
+
+class ExpenseSketch(models.Model):
+    """
+    Сжатое распределение сумм расходов юзера по категории (category=None — без категории).
+    data — бинарный DDSketch (apps.management.expense_sketch), обновляется на каждый расход.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="expense_sketches")
+    category = models.ForeignKey("Category", null=True, blank=True, on_delete=models.CASCADE)
+
+    data = models.BinaryField(default=b"")
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "category"],
+                condition=models.Q(category__isnull=False),
+                name="uniq_expense_sketch_user_category",
+            ),
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(category__isnull=True),
+                name="uniq_expense_sketch_user_uncategorized",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Sketch u{self.user_id} c{self.category_id} (n={self.count})"
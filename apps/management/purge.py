@@ -0,0 +1,184 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.management.models import Account, Category, Debt, Transaction
+
+# -------------------------
+# Soft delete -> purge: запрос только ставит deleted_at (объект сразу пропадает из API),
+# зависимые строки воркер удаляет/обнуляет пачками по id — без долгих блокировок.
+# Объект захватывается коротким UPDATE (аренда purge_started_at): задача и beat не чистят
+# его параллельно. Каждая пачка — своя короткая транзакция, аренда продлевается после неё;
+# упавший воркер отпускает объект, когда аренда истекает.
+# -------------------------
+
+PURGE_BATCH_SIZE = getattr(settings, "PURGE_BATCH_SIZE", 2000)
+# beat подбирает то, для чего задача не дошла (упал воркер, потерялся .delay())
+PURGE_STALE_AFTER = timedelta(minutes=getattr(settings, "PURGE_STALE_AFTER_MINUTES", 10))
+PURGE_LEASE = timedelta(minutes=getattr(settings, "PURGE_LEASE_MINUTES", 10))
+
+
+def _invalidate(user_id: int) -> None:
+    from apps.management.views import invalidate_user_mgmt_cache
+
+    invalidate_user_mgmt_cache(user_id)
+
+
+def iter_id_batches(qs, batch_size: int = PURGE_BATCH_SIZE):
+    """
+    WHERE id > last_id ORDER BY id LIMIT n — каждая пачка по индексу, без OFFSET.
+    """
+    last_id = 0
+    while True:
+        ids = list(qs.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def claim_for_purge(qs) -> bool:
+    """
+    Один UPDATE в autocommit: ставит аренду, если объект удалён и его никто не чистит
+    (или аренда протухла). -> True, если объект достался нам.
+    """
+    now = timezone.now()
+    free = Q(purge_started_at__isnull=True) | Q(purge_started_at__lt=now - PURGE_LEASE)
+    return qs.filter(free).update(purge_started_at=now) > 0
+
+
+def renew_lease(model, pk: int) -> None:
+    model._base_manager.filter(pk=pk).update(purge_started_at=timezone.now())
+
+
+def delete_in_batches(qs, batch_size: int = PURGE_BATCH_SIZE, on_batch=None) -> int:
+    model = qs.model
+    deleted = 0
+    for ids in iter_id_batches(qs, batch_size):
+        with transaction.atomic():
+            n, _ = model._base_manager.filter(id__in=ids).delete()
+        deleted += n
+        if on_batch:
+            on_batch()
+    return deleted
+
+
+# -------------------------
+# Soft delete (в запросе)
+# -------------------------
+
+def soft_delete_account(account: Account) -> None:
+    from apps.management.tasks import purge_account_task
+
+    Account.all_objects.filter(pk=account.pk).update(deleted_at=timezone.now())
+    _invalidate(account.user_id)
+    transaction.on_commit(lambda: purge_account_task.delay(account.pk))
+
+
+def soft_delete_category(category: Category) -> None:
+    from apps.management.tasks import purge_category_task
+
+    Category.all_objects.filter(pk=category.pk).update(deleted_at=timezone.now())
+    _invalidate(category.user_id)
+    transaction.on_commit(lambda: purge_category_task.delay(category.pk))
+
+
+def soft_delete_user(user) -> None:
+    from apps.management.tasks import purge_user_task
+
+    # is_active=False через save(): сигнал сразу гасит кэш is_active (токены перестают работать)
+    user.is_active = False
+    user.deleted_at = timezone.now()
+    user.save(update_fields=["is_active", "deleted_at"])
+    transaction.on_commit(lambda: purge_user_task.delay(user.pk))
+
+
+# -------------------------
+# Purge (в воркере)
+# -------------------------
+
+def purge_account(account_id: int) -> int:
+    qs = Account.all_objects.filter(pk=account_id, deleted_at__isnull=False)
+    if not claim_for_purge(qs):
+        return 0
+
+    deleted = delete_in_batches(
+        Transaction.all_objects.filter(account_id=account_id),
+        on_batch=lambda: renew_lease(Account, account_id),
+    )
+    user_id = qs.values_list("user_id", flat=True).first()
+    with transaction.atomic():
+        qs.delete()
+    _invalidate(user_id)
+    return deleted
+
+
+def purge_category(category_id: int) -> int:
+    qs = Category.all_objects.filter(pk=category_id, deleted_at__isnull=False)
+    if not claim_for_purge(qs):
+        return 0
+
+    # SET_NULL пачками: UPDATE ... WHERE id IN (...)
+    updated = 0
+    for ids in iter_id_batches(Transaction.all_objects.filter(category_id=category_id)):
+        with transaction.atomic():
+            updated += Transaction.all_objects.filter(id__in=ids).update(category=None)
+        renew_lease(Category, category_id)
+
+    user_id = qs.values_list("user_id", flat=True).first()
+    with transaction.atomic():
+        qs.delete()
+    _invalidate(user_id)
+    return updated
+
+
+def purge_user(user_id: int) -> int:
+    from apps.notifications.models import CalendarEvent, Notification
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+    User = get_user_model()
+    qs = User.objects.filter(pk=user_id, deleted_at__isnull=False)
+    if not claim_for_purge(qs):
+        return 0
+
+    # большие таблицы — пачками; остальное (профиль, привилегии, устройства) заберёт каскад
+    deleted = 0
+    for dependents in (
+        Transaction.all_objects.filter(user_id=user_id),
+        Notification.objects.filter(user_id=user_id),
+        CalendarEvent.objects.filter(user_id=user_id),
+        Debt.objects.filter(user_id=user_id),
+        OutstandingToken.objects.filter(user_id=user_id),
+        Account.all_objects.filter(user_id=user_id),
+        Category.all_objects.filter(user_id=user_id),
+    ):
+        deleted += delete_in_batches(dependents, on_batch=lambda: renew_lease(User, user_id))
+
+    with transaction.atomic():
+        qs.delete()
+    _invalidate(user_id)
+    return deleted
+
+
+def purge_stale() -> int:
+    """
+    Страховка для beat: доделывает purge, который не запустился.
+    Объекты, которые прямо сейчас чистит задача, пропускаются (аренда claim_for_purge).
+    """
+    cutoff = timezone.now() - PURGE_STALE_AFTER
+    purged = 0
+
+    for account_id in Account.all_objects.filter(deleted_at__lt=cutoff).values_list("id", flat=True)[:100]:
+        purge_account(account_id)
+        purged += 1
+    for category_id in Category.all_objects.filter(deleted_at__lt=cutoff).values_list("id", flat=True)[:100]:
+        purge_category(category_id)
+        purged += 1
+    for user_id in get_user_model().objects.filter(deleted_at__lt=cutoff).values_list("id", flat=True)[:10]:
+        purge_user(user_id)
+        purged += 1
+    return purged
@@ -43,6 +43,13 @@ class TransactionSerializer(serializers.ModelSerializer):
             "title", "note", "occurred_at", "created_at",
         )
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # категория удалена и ждёт purge: для клиента её уже нет (views грузят category через select_related)
+        if instance.category_id and instance.category.deleted_at is not None:
+            data["category"] = None
+        return data
+
     def validate(self, attrs):
         user = self.context["request"].user
 
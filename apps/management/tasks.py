@@ -1,5 +1,28 @@
 from celery import shared_task
 
+from apps.management.purge import purge_account, purge_category, purge_stale, purge_user
+
+
 @shared_task
 def ping_task():
     return "pong"
+
+
+@shared_task
+def purge_account_task(account_id: int):
+    return purge_account(account_id)
+
+
+@shared_task
+def purge_category_task(category_id: int):
+    return purge_category(category_id)
+
+
+@shared_task
+def purge_user_task(user_id: int):
+    return purge_user(user_id)
+
+
+@shared_task
+def purge_soft_deleted():
+    return purge_stale()
@@ -1,3 +1,229 @@
-from django.test import TestCase
+import random
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.management.expense_sketch import (
+    BIG_EXPENSE_MIN_SAMPLES,
+    SKETCH_ALPHA,
+    SKETCH_MAX_BINS,
+    QuantileSketch,
+)
+from apps.management.models import Account, Category, Debt, ExpenseSketch, Transaction
+from apps.management.purge import (
+    PURGE_LEASE,
+    claim_for_purge,
+    purge_account,
+    purge_category,
+    purge_user,
+    soft_delete_user,
+)
+from core.testing import FakeRedisMixin
+
+
+# -------------------------
+# Скетч перцентилей
+# -------------------------
+
+class QuantileSketchTests(SimpleTestCase):
+    def exact(self, values, q):
+        ordered = sorted(values)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def test_empty(self):
+        self.assertIsNone(QuantileSketch().quantile(0.95))
+
+    def test_relative_error_within_alpha(self):
+        rnd = random.Random(42)
+        values = [round(rnd.lognormvariate(6, 1.2), 2) for _ in range(5000)]
+        sketch = QuantileSketch()
+        for v in values:
+            sketch.add(v)
+
+        self.assertEqual(sketch.count, len(values))
+        for q in (0.5, 0.9, 0.95, 0.99):
+            exact = self.exact(values, q)
+            self.assertLessEqual(abs(sketch.quantile(q) - exact) / exact, SKETCH_ALPHA * 1.01, q)
+
+    def test_bytes_roundtrip(self):
+        sketch = QuantileSketch()
+        for v in (10, 250, 250, 1200, Decimal("99.90")):
+            sketch.add(v)
+
+        restored = QuantileSketch.from_bytes(sketch.to_bytes())
+        self.assertEqual(restored.bins, sketch.bins)
+        self.assertEqual(restored.count, sketch.count)
+        self.assertEqual(restored.quantile(0.5), sketch.quantile(0.5))
+
+    def test_garbage_blob_is_empty_sketch(self):
+        self.assertEqual(QuantileSketch.from_bytes(b"").count, 0)
+        self.assertEqual(QuantileSketch.from_bytes(b"\x09" + b"\x00" * 10).count, 0)
+
+    def test_bins_are_bounded(self):
+        sketch = QuantileSketch()
+        for i in range(1, 5000):
+            sketch.add(1.05 ** (i % 600))
+        self.assertLessEqual(len(sketch.bins), SKETCH_MAX_BINS)
+        self.assertEqual(sum(sketch.bins.values()), sketch.count)
+        # сливаются нижние корзины — верхние перцентили не страдают
+        self.assertAlmostEqual(sketch.quantile(1.0) / 1.05 ** 599, 1, delta=SKETCH_ALPHA * 1.01)
+
+    def test_remove_undoes_add(self):
+        sketch = QuantileSketch()
+        for v in (100, 200, 300):
+            sketch.add(v)
+        sketch.remove(300)
+        self.assertEqual(sketch.count, 2)
+        self.assertLess(sketch.quantile(1.0), 300)
+
+        # сумма выше всех корзин, которой в скетче не было, ничего не ломает
+        sketch.remove(10_000)
+        self.assertEqual(sketch.count, 2)
+
+    def test_remove_after_collapse_hits_merged_bin(self):
+        sketch = QuantileSketch()
+        for i in range(SKETCH_MAX_BINS + 1):
+            sketch.add(1.05 ** i)
+        sketch.remove(1.0)  # его корзину слили со следующей
+        self.assertEqual(sketch.count, SKETCH_MAX_BINS)
+        self.assertEqual(sum(sketch.bins.values()), sketch.count)
+
+
+class BigExpenseApiTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.notify = self.enterContext(mock.patch("apps.management.views.create_and_send_notification"))
+
+        self.user = get_user_model().objects.create_user(email="big@example.com", password="pass12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.account = Account.objects.create(user=self.user)
+        self.food = Category.objects.create(user=self.user, name="Еда")
+        self.taxi = Category.objects.create(user=self.user, name="Такси")
+
+    def spend(self, amount, category) -> int:
+        r = self.client.post("/api/v1/management/transactions/", {
+            "account": self.account.id, "category": category.id, "type": "EXPENSE",
+            "amount": str(amount), "occurred_at": timezone.now().isoformat(),
+        }, format="json")
+        self.assertEqual(r.status_code, 201)
+        return r.json()["id"]
+
+    def sketch(self, category) -> QuantileSketch:
+        row = ExpenseSketch.objects.get(user=self.user, category=category)
+        return QuantileSketch.from_bytes(row.data)
+
+    def test_threshold_follows_own_spending(self):
+        for _ in range(BIG_EXPENSE_MIN_SAMPLES):
+            self.spend(100, self.food)
+        self.notify.assert_not_called()
+
+        # 500 меньше фиксированного порога, но намного больше обычной траты в категории
+        self.spend(500, self.food)
+        self.assertEqual(self.notify.call_args.kwargs["payload"]["event"], "big_expense")
+
+    def test_edit_and_delete_move_amount_between_sketches(self):
+        tx_id = self.spend(100, self.food)
+        self.spend(100, self.food)
+
+        r = self.client.patch(f"/api/v1/management/transactions/{tx_id}/", {"category": self.taxi.id}, format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual((self.sketch(self.food).count, self.sketch(self.taxi).count), (1, 1))
+
+        self.client.patch(f"/api/v1/management/transactions/{tx_id}/", {"type": "INCOME"}, format="json")
+        self.assertEqual(self.sketch(self.taxi).count, 0)
+
+        self.client.patch(f"/api/v1/management/transactions/{tx_id}/", {"type": "EXPENSE"}, format="json")
+        self.assertEqual(self.client.delete(f"/api/v1/management/transactions/{tx_id}/").status_code, 204)
+        self.assertEqual((self.sketch(self.food).count, self.sketch(self.taxi).count), (1, 0))
+
+    def test_debt_edits_do_not_touch_sketch(self):
+        debt = Debt.objects.create(user=self.user, kind=Debt.PAYABLE, person_name="Бек", amount=Decimal("50"))
+        r = self.client.patch(f"/api/v1/management/debts/{debt.id}/", {"amount": "70"}, format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.client.delete(f"/api/v1/management/debts/{debt.id}/").status_code, 204)
+        self.assertFalse(ExpenseSketch.objects.exists())
+
+
+# -------------------------
+# Soft delete
+# -------------------------
+
+class SoftDeleteApiTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch("apps.management.tasks.purge_account_task.delay"))
+        self.enterContext(mock.patch("apps.management.tasks.purge_category_task.delay"))
+        self.enterContext(mock.patch("apps.management.tasks.purge_user_task.delay"))
+
+        self.user = get_user_model().objects.create_user(email="soft@example.com", password="pass12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.account = Account.objects.create(user=self.user, name="Карта")
+        self.category = Category.objects.create(user=self.user, name="Еда")
+        self.tx = Transaction.objects.create(
+            user=self.user, account=self.account, category=self.category,
+            type=Transaction.EXPENSE, amount=Decimal("150"), occurred_at=timezone.now(),
+        )
+
+    def transactions(self):
+        data = self.client.get("/api/v1/management/transactions/").json()
+        return data.get("results", data) if isinstance(data, dict) else data
+
+    def test_deleted_category_is_hidden_before_purge(self):
+        self.assertEqual(self.client.delete(f"/api/v1/management/categories/{self.category.id}/").status_code, 204)
+
+        self.assertEqual(self.client.get(f"/api/v1/management/categories/{self.category.id}/").status_code, 404)
+        self.assertEqual([t["category"] for t in self.transactions()], [None])
+
+        stats = self.client.get("/api/v1/management/stats/categories/?refresh=1").json()
+        self.assertEqual([i["category_id"] for i in stats["items"]], [None])
+
+        self.assertEqual(purge_category(self.category.id), 1)
+        self.assertFalse(Category.all_objects.filter(pk=self.category.pk).exists())
+        self.assertIsNone(Transaction.objects.get(pk=self.tx.pk).category_id)
+        # повторный purge — ничего не делает
+        self.assertEqual(purge_category(self.category.id), 0)
+
+    def test_deleted_account_hides_its_transactions(self):
+        self.assertEqual(self.client.delete(f"/api/v1/management/accounts/{self.account.id}/").status_code, 204)
+        self.assertEqual(self.transactions(), [])
+
+        self.assertEqual(purge_account(self.account.id), 1)
+        self.assertFalse(Transaction.all_objects.filter(pk=self.tx.pk).exists())
+
+    def test_purge_is_noop_for_alive_objects(self):
+        self.assertEqual(purge_account(self.account.id), 0)
+        self.assertEqual(purge_category(self.category.id), 0)
+        self.assertEqual(purge_user(self.user.id), 0)
+        self.assertTrue(Transaction.objects.filter(pk=self.tx.pk).exists())
+
+    def test_object_claimed_by_another_worker_is_skipped_until_lease_expires(self):
+        self.client.delete(f"/api/v1/management/accounts/{self.account.id}/")
+        self.assertTrue(claim_for_purge(Account.all_objects.filter(pk=self.account.pk)))
+
+        self.assertEqual(purge_account(self.account.id), 0)
+        self.assertTrue(Transaction.all_objects.filter(pk=self.tx.pk).exists())
+
+        # воркер с арендой упал — после её истечения объект забирает следующий
+        Account.all_objects.filter(pk=self.account.pk).update(
+            purge_started_at=timezone.now() - PURGE_LEASE - timedelta(minutes=1),
+        )
+        self.assertEqual(purge_account(self.account.id), 1)
+        self.assertFalse(Account.all_objects.filter(pk=self.account.pk).exists())
+
+    def test_deleted_user_is_purged_with_data(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete_user(self.user)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+        self.assertGreater(purge_user(self.user.id), 0)
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Transaction.all_objects.filter(pk=self.tx.pk).exists())
@@ -3,7 +3,7 @@ from urllib.parse import urlencode
 
 from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Sum, Q, Value, DecimalField
+from django.db.models import Case, F, Sum, Q, Value, When, DecimalField
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.dateparse import parse_date
@@ -15,6 +15,7 @@ from rest_framework.views import APIView
 
 from apps.motivation.ai import generate_motivation
 from apps.notifications.services import create_and_send_notification
+from apps.users.services import bump_data_generation
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes, OpenApiExample
 from .serializers_swagger import (
@@ -23,7 +24,9 @@ from .serializers_swagger import (
     StatsByCategoryResponseSerializer,
     StatsSummaryResponseSerializer,
 )
+from .expense_sketch import expense_sample, record_expense, replace_expense
 from .models import Account, Category, Transaction, Debt
+from .purge import soft_delete_account, soft_delete_category
 from .serializers import (
     AccountSerializer,
     CategorySerializer,
@@ -56,6 +59,8 @@ def build_cache_key(prefix: str, user_id: int, params) -> str:
 
 
 def invalidate_user_mgmt_cache(user_id: int) -> None:
+    # сводка профиля (/users/me) кэшируется под поколением данных — поднимаем его
+    bump_data_generation(user_id)
     try:
         conn = get_redis_connection("default")
         for key in conn.scan_iter(match=f"mgmt:*:u{user_id}:*"):
@@ -238,8 +243,8 @@ class AccountDetailView(generics.RetrieveUpdateDestroyAPIView):
         invalidate_user_mgmt_cache(self.request.user.id)
 
     def perform_destroy(self, instance):
-        instance.delete()
-        invalidate_user_mgmt_cache(self.request.user.id)
+        # транзакции счёта удалит воркер пачками; из API счёт пропадает сразу
+        soft_delete_account(instance)
 
 
 # -------------------------
@@ -282,8 +287,8 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
         invalidate_user_mgmt_cache(self.request.user.id)
 
     def perform_destroy(self, instance):
-        instance.delete()
-        invalidate_user_mgmt_cache(self.request.user.id)
+        # category=NULL в транзакциях проставит воркер пачками
+        soft_delete_category(instance)
 
 
 # -------------------------
@@ -345,10 +350,10 @@ class TransactionListCreateView(
                 body=text,
                 type_="SYSTEM",
                 payload={"event": "salary_received", "tx_id": tx.id},
+                collapse_key="salary_received",
             )
-        BIG_EXPENSE_THRESHOLD = Decimal("1000")  # можешь поменять
-
-        is_big_expense = tx.type == Transaction.EXPENSE and tx.amount >= BIG_EXPENSE_THRESHOLD
+        # порог — перцентиль своих трат юзера в этой категории (apps.management.expense_sketch)
+        is_big_expense = tx.type == Transaction.EXPENSE and record_expense(tx)
         if is_big_expense:
             text = generate_motivation("big_expense", amount=tx.amount, ctx={"title": tx.title})
             create_and_send_notification(
@@ -357,6 +362,7 @@ class TransactionListCreateView(
                 body=text,
                 type_="SYSTEM",
                 payload={"event": "big_expense", "tx_id": tx.id, "amount": str(tx.amount)},
+                collapse_key="big_expense",
             )
 
 
@@ -376,11 +382,16 @@ class TransactionDetailView(generics.RetrieveUpdateDestroyAPIView):
         )
 
     def perform_update(self, serializer):
-        serializer.save()
+        old = expense_sample(serializer.instance)
+        tx = serializer.save()
+        # скетч "большого расхода": старая сумма/категория уходит, новая приходит
+        replace_expense(old, expense_sample(tx))
         invalidate_user_mgmt_cache(self.request.user.id)
 
     def perform_destroy(self, instance):
+        old = expense_sample(instance)
         instance.delete()
+        replace_expense(old, None)
         invalidate_user_mgmt_cache(self.request.user.id)
 
 
@@ -614,8 +625,14 @@ class StatsByCategoryView(DateRangeFilterMixin, APIView):
         qs = Transaction.objects.filter(user=request.user, type=tx_type)
         qs = self.apply_date_range(qs, request, field="occurred_at")
 
+        # траты удалённой (ещё не вычищенной) категории — сразу в "Без категории", как после purge
+        alive = Q(category__deleted_at__isnull=True)
         rows = (
-            qs.values("category_id", "category__name")
+            qs.annotate(
+                alive_category_id=Case(When(alive, then=F("category_id"))),
+                alive_category_name=Case(When(alive, then=F("category__name"))),
+            )
+            .values("alive_category_id", "alive_category_name")
             .annotate(total=Coalesce(Sum("amount"), ZERO))
             .order_by("-total")
         )
@@ -624,8 +641,8 @@ class StatsByCategoryView(DateRangeFilterMixin, APIView):
             "type": tx_type,
             "items": [
                 {
-                    "category_id": r["category_id"],
-                    "category_name": r["category__name"] or "Без категории",
+                    "category_id": r["alive_category_id"],
+                    "category_name": r["alive_category_name"] or "Без категории",
                     "total": str(r["total"]),
                 }
                 for r in rows
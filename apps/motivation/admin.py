@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import MotivationItem
+
+
+class MotivationItemAdmin(admin.ModelAdmin):
+    list_display = ('title', 'type', 'is_active', 'priority', 'updated_at')
+    list_filter = ('type', 'is_active')
+    search_fields = ('title', 'short_text')
+    list_editable = ('is_active', 'priority')
+
+admin.site.register(MotivationItem, MotivationItemAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MotivationConfig(AppConfig):
     name = 'apps.motivation'
     verbose_name = "Мотивация"
+
+    def ready(self):
+        from apps.motivation import signals  # noqa: F401
@@ -0,0 +1,56 @@
+from apps.motivation.models import MotivationItem
+from apps.motivation.serializers import MotivationItemDetailSerializer, MotivationItemListSerializer
+from apps.users.catalog import VersionedCatalog, render_json
+
+# -------------------------
+# Карточки "Подробнее" (MotivationDetailView): все активные элементы одним справочником,
+# на каждый — готовые JSON-байты и ETag (apps.users.catalog)
+# -------------------------
+
+
+def build_motivation_catalog() -> dict:
+    return {
+        item.id: render_json(MotivationItemDetailSerializer(item).data)
+        for item in MotivationItem.objects.filter(is_active=True)
+    }
+
+
+motivation_catalog = VersionedCatalog("motivation", build_motivation_catalog)
+
+
+# -------------------------
+# Снимок ленты (MotivationFeedView): активные элементы по типам, уже сериализованные.
+# На запрос остаётся срез по limit, выбор цитаты/пожелания дня по индексу и динамика.
+# -------------------------
+
+# цитаты/пожелания дня выбираются из первых N (по priority)
+DAILY_PICK_POOL = 200
+
+FEED_LIST_TYPES = {
+    "smart_hints": MotivationItem.SMART_HINT,
+    "financial_tips": MotivationItem.FIN_TIP,
+    "remember": MotivationItem.REMEMBER,
+}
+FEED_PICK_TYPES = {
+    "quotes": MotivationItem.QUOTE,
+    "wishes": MotivationItem.WISH,
+}
+
+
+def build_feed_snapshot() -> dict:
+    by_type = {}
+    # один проход вместо запроса на каждый тип; порядок — Meta.ordering
+    for item in MotivationItem.objects.filter(is_active=True):
+        by_type.setdefault(item.type, []).append(item)
+
+    snapshot = {}
+    for key, type_ in FEED_LIST_TYPES.items():
+        snapshot[key] = MotivationItemListSerializer(by_type.get(type_, []), many=True).data
+    for key, type_ in FEED_PICK_TYPES.items():
+        snapshot[key] = MotivationItemListSerializer(by_type.get(type_, [])[:DAILY_PICK_POOL], many=True).data
+
+    # ReturnList/OrderedDict -> обычные list/dict: компактнее в pickle
+    return {key: [dict(row) for row in rows] for key, rows in snapshot.items()}
+
+
+feed_catalog = VersionedCatalog("motivation_feed", build_feed_snapshot)
@@ -0,0 +1,323 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.management.models import Category, Debt, Transaction
+from apps.management.purge import iter_id_batches
+from apps.motivation.models import UserInsights
+
+# -------------------------
+# Персональные подсказки: ночная пачечная обработка.
+# На пачку юзеров — три агрегирующих запроса (дневные суммы за окно, баланс, долги),
+# дальше по каждому юзеру numpy над дневными рядами. Лента читает готовые карточки.
+# -------------------------
+
+INSIGHTS_CHUNK_SIZE = getattr(settings, "INSIGHTS_CHUNK_SIZE", 500)
+
+# 5 недель: последняя неделя против средней из 4 предыдущих
+WINDOW_DAYS = 35
+WEEK = 7
+SAVINGS_DAYS = 30
+
+TREND_THRESHOLD = getattr(settings, "INSIGHTS_TREND_THRESHOLD", 0.25)
+SPIKE_RATIO = getattr(settings, "INSIGHTS_SPIKE_RATIO", 1.5)
+SPIKE_MIN_AMOUNT = getattr(settings, "INSIGHTS_SPIKE_MIN_AMOUNT", 500)
+SAVINGS_LOW_RATE = 0.10
+SAVINGS_GOOD_RATE = 0.20
+DEBT_HORIZON_DAYS = getattr(settings, "INSIGHTS_DEBT_HORIZON_DAYS", 7)
+DEBT_MAX_CARDS = 2
+
+
+def _fmt(amount) -> str:
+    return f"{amount:.0f}"
+
+
+def card(code: str, title: str, short_text: str, icon: str, color: str, **data) -> dict:
+    # формат как у прежней динамической карточки LOW_BALANCE + данные для клиента
+    return {
+        "type": "DYNAMIC",
+        "code": code,
+        "title": title,
+        "short_text": short_text,
+        "icon": icon,
+        "color": color,
+        "data": data,
+    }
+
+
+# -------------------------
+# Ряды
+# -------------------------
+
+def daily_series(rows, window: int = WINDOW_DAYS):
+    """
+    rows: [(day_idx, is_expense, category_id, amount)] одного юзера.
+    -> income[window], expense[window], category_ids[k], by_category[k, window] (только расходы)
+    """
+    if not rows:
+        empty = np.zeros(window)
+        return empty, empty, np.array([], dtype=np.int64), np.zeros((0, window))
+
+    days = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    is_exp = np.fromiter((r[1] for r in rows), dtype=bool, count=len(rows))
+    cats = np.fromiter((r[2] or 0 for r in rows), dtype=np.int64, count=len(rows))
+    amounts = np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows))
+
+    income = np.bincount(days[~is_exp], weights=amounts[~is_exp], minlength=window)
+    expense = np.bincount(days[is_exp], weights=amounts[is_exp], minlength=window)
+
+    # расходы без категории (0) в разбивку по категориям не идут
+    mask = is_exp & (cats != 0)
+    category_ids, inverse = np.unique(cats[mask], return_inverse=True)
+    by_category = np.zeros((len(category_ids), window))
+    np.add.at(by_category, (inverse, days[mask]), amounts[mask])
+    return income, expense, category_ids, by_category
+
+
+# -------------------------
+# Подсказки
+# -------------------------
+
+def spending_trend_hint(expense):
+    recent = expense[-WEEK:].sum()
+    weeks = expense[:-WEEK].reshape(-1, WEEK).sum(axis=1)
+    # мало истории — тренд не показываем
+    if np.count_nonzero(weeks) < 2:
+        return None
+    baseline = weeks.mean()
+    change = recent / baseline - 1
+
+    if change >= TREND_THRESHOLD:
+        return card(
+            "SPENDING_TREND_UP", "Расходы растут",
+            f"За неделю вы потратили на {change:.0%} больше обычного ({_fmt(recent)} KGS против ~{_fmt(baseline)}).",
+            "trending_up", "orange", change=round(float(change), 3), week=float(recent), baseline=float(baseline),
+        )
+    if change <= -TREND_THRESHOLD:
+        return card(
+            "SPENDING_TREND_DOWN", "Расходы снизились",
+            f"На этой неделе вы потратили на {-change:.0%} меньше обычного. Так держать!",
+            "trending_down", "green", change=round(float(change), 3), week=float(recent), baseline=float(baseline),
+        )
+    return None
+
+
+def category_spike_hint(category_ids, by_category, names: dict):
+    if not len(category_ids):
+        return None
+
+    recent = by_category[:, -WEEK:].sum(axis=1)
+    weeks = by_category[:, :-WEEK].reshape(len(category_ids), -1, WEEK).sum(axis=2)
+    mean = weeks.mean(axis=1)
+    std = weeks.std(axis=1)
+
+    excess = recent - mean
+    spikes = (
+        (mean > 0)
+        & (recent >= mean * SPIKE_RATIO)
+        & (recent > mean + 2 * std)
+        & (excess >= SPIKE_MIN_AMOUNT)
+    )
+    # удалённые категории (нет имени) не показываем
+    known = np.fromiter((int(c) in names for c in category_ids), dtype=bool, count=len(category_ids))
+    spikes &= known
+    if not spikes.any():
+        return None
+
+    i = int(np.argmax(np.where(spikes, excess, -np.inf)))
+    category_id = int(category_ids[i])
+    return card(
+        "CATEGORY_SPIKE", f"Всплеск трат: {names[category_id]}",
+        f"{_fmt(recent[i])} KGS за неделю — в {recent[i] / mean[i]:.1f} раза больше обычного.",
+        "category", "red", category_id=category_id, week=float(recent[i]), baseline=float(mean[i]),
+    )
+
+
+def savings_rate_hint(income, expense):
+    inc = income[-SAVINGS_DAYS:].sum()
+    exp = expense[-SAVINGS_DAYS:].sum()
+    if inc <= 0:
+        return None
+    rate = (inc - exp) / inc
+
+    if rate < 0:
+        return card(
+            "SAVINGS_NEGATIVE", "Тратите больше, чем получаете",
+            f"За 30 дней расходы превысили доходы на {_fmt(exp - inc)} KGS.",
+            "savings", "red", rate=round(float(rate), 3),
+        )
+    if rate < SAVINGS_LOW_RATE:
+        return card(
+            "SAVINGS_LOW", "Мало откладываете",
+            f"За 30 дней отложено {rate:.0%} дохода. Попробуйте откладывать хотя бы 10%.",
+            "savings", "orange", rate=round(float(rate), 3),
+        )
+    if rate >= SAVINGS_GOOD_RATE:
+        return card(
+            "SAVINGS_GOOD", "Отличная норма сбережений",
+            f"За 30 дней вы отложили {rate:.0%} дохода ({_fmt(inc - exp)} KGS).",
+            "savings", "green", rate=round(float(rate), 3),
+        )
+    return None
+
+
+def debt_hints(debts, today) -> list[dict]:
+    """
+    debts: открытые долги со сроком до today + горизонт, отсортированы по сроку.
+    """
+    cards = []
+    for kind, person, amount, due in debts[:DEBT_MAX_CARDS]:
+        days_left = (due - today).days
+        when = "просрочен" if days_left < 0 else ("сегодня" if days_left == 0 else f"через {days_left} дн.")
+        if kind == Debt.PAYABLE:
+            cards.append(card(
+                "DEBT_DUE", f"Вернуть долг: {person}",
+                f"{_fmt(amount)} KGS, срок {due:%d.%m} ({when}).",
+                "debt", "red" if days_left < 0 else "orange",
+                kind=kind, amount=str(amount), due_date=due.isoformat(),
+            ))
+        else:
+            cards.append(card(
+                "DEBT_RECEIVABLE_DUE", f"Вам должны вернуть: {person}",
+                f"{_fmt(amount)} KGS, срок {due:%d.%m} ({when}).",
+                "debt", "blue",
+                kind=kind, amount=str(amount), due_date=due.isoformat(),
+            ))
+    return cards
+
+
+def low_balance_hint(balance: Decimal):
+    if balance > 0:
+        return None
+    return card(
+        "LOW_BALANCE", "У вас мало средств!",
+        "Пересмотрите расходы и попробуйте сократить необязательные покупки.",
+        "warning", "orange", balance=str(balance),
+    )
+
+
+def build_cards(income, expense, category_ids, by_category, names, balance, debts, today) -> list[dict]:
+    # просроченные долги — первыми, предстоящие — в конце
+    due = debt_hints(debts, today)
+    cards = [c for c in due if c["color"] == "red"]
+    for hint in (
+        low_balance_hint(balance),
+        category_spike_hint(category_ids, by_category, names),
+        spending_trend_hint(expense),
+        savings_rate_hint(income, expense),
+    ):
+        if hint:
+            cards.append(hint)
+    cards += [c for c in due if c["color"] != "red"]
+    return cards
+
+
+# -------------------------
+# Пачка юзеров
+# -------------------------
+
+def compute_insights(user_ids: list[int]) -> int:
+    today = timezone.localdate()
+    start = today - timedelta(days=WINDOW_DAYS - 1)
+    start_dt = timezone.make_aware(datetime.combine(start, time.min))
+
+    rows = {uid: [] for uid in user_ids}
+    daily = (
+        Transaction.objects
+        .filter(user_id__in=user_ids, occurred_at__gte=start_dt)
+        .annotate(day=TruncDate("occurred_at"))
+        .values_list("user_id", "day", "type", "category_id")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    category_ids = set()
+    for user_id, day, type_, category_id, total in daily:
+        idx = (day - start).days
+        if not 0 <= idx < WINDOW_DAYS:
+            continue
+        rows[user_id].append((idx, type_ == Transaction.EXPENSE, category_id, total))
+        if category_id:
+            category_ids.add(category_id)
+
+    names = dict(Category.objects.filter(id__in=category_ids).values_list("id", "name"))
+
+    balances = {
+        r["user_id"]: (r["income"] or Decimal("0")) - (r["expense"] or Decimal("0"))
+        for r in (
+            Transaction.objects
+            .filter(user_id__in=user_ids)
+            .values("user_id")
+            .annotate(
+                income=Sum("amount", filter=Q(type=Transaction.INCOME)),
+                expense=Sum("amount", filter=Q(type=Transaction.EXPENSE)),
+            )
+            .order_by()
+        )
+    }
+
+    debts = {uid: [] for uid in user_ids}
+    for user_id, kind, person, amount, due in (
+        Debt.objects
+        .filter(user_id__in=user_ids, is_closed=False, due_date__lte=today + timedelta(days=DEBT_HORIZON_DAYS))
+        .order_by("due_date", "id")
+        .values_list("user_id", "kind", "person_name", "amount", "due_date")
+    ):
+        debts[user_id].append((kind, person, amount, due))
+
+    now = timezone.now()
+    objs = []
+    for user_id in user_ids:
+        income, expense, cat_ids, by_category = daily_series(rows[user_id])
+        cards = build_cards(
+            income, expense, cat_ids, by_category, names,
+            balances.get(user_id, Decimal("0")), debts[user_id], today,
+        )
+        objs.append(UserInsights(user_id=user_id, cards=cards, computed_at=now))
+
+    UserInsights.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["cards", "computed_at"],
+    )
+    return len(objs)
+
+
+def schedule_insights() -> int:
+    """
+    Режет активных юзеров на пачки по id и раздаёт воркерам параллельно.
+    """
+    from apps.motivation.tasks import compute_insights_chunk
+
+    users = get_user_model().objects.filter(is_active=True, deleted_at__isnull=True)
+    chunks = 0
+    for ids in iter_id_batches(users, INSIGHTS_CHUNK_SIZE):
+        compute_insights_chunk.delay(ids)
+        chunks += 1
+    return chunks
+
+
+# -------------------------
+# Чтение для ленты
+# -------------------------
+
+def get_user_cards(user_id: int) -> list[dict]:
+    cards = UserInsights.objects.filter(user_id=user_id).values_list("cards", flat=True).first()
+    if cards is not None:
+        return cards
+
+    # новый юзер: ночь ещё не прошла — посчитаем в фоне один раз
+    try:
+        if cache.add(f"insights:pending:u{user_id}", 1, 600):
+            from apps.motivation.tasks import compute_insights_chunk
+            compute_insights_chunk.delay([user_id])
+    except Exception:
+        pass
+    return []
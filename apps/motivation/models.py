@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 
@@ -39,3 +40,20 @@ class MotivationItem(models.Model):
 
     def __str__(self):
         return f"{self.type}: {self.title}"
+
+
+class UserInsights(models.Model):
+    """
+    Персональные подсказки для ленты: считает ночная задача (apps.motivation.insights),
+    лента отдаёт cards как есть.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="insights")
+    cards = models.JSONField(default=list, blank=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Подсказки пользователя"
+        verbose_name_plural = "Подсказки пользователей"
+
+    def __str__(self):
+        return f"Insights of user #{self.user_id}"
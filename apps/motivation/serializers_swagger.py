@@ -8,6 +8,7 @@ class DynamicTipSerializer(serializers.Serializer):
     short_text = serializers.CharField()
     icon = serializers.CharField()
     color = serializers.CharField()
+    data = serializers.DictField(required=False)
 
 class MotivationFeedResponseSerializer(serializers.Serializer):
     smart_hints = MotivationItemListSerializer(many=True)
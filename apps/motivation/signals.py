@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.motivation.catalog import feed_catalog, motivation_catalog
+from apps.motivation.models import MotivationItem
+
+
+@receiver(post_save, sender=MotivationItem)
+@receiver(post_delete, sender=MotivationItem)
+def motivation_catalog_changed(sender, instance, **kwargs):
+    motivation_catalog.bump()
+    feed_catalog.bump()
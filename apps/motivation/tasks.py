@@ -0,0 +1,13 @@
+from celery import shared_task
+
+from apps.motivation.insights import compute_insights, schedule_insights
+
+
+@shared_task
+def compute_insights_chunk(user_ids: list[int]):
+    return compute_insights(user_ids)
+
+
+@shared_task
+def schedule_nightly_insights():
+    return schedule_insights()
@@ -1,3 +1,205 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.management.models import Account, Category, Debt, Transaction
+from apps.motivation.catalog import feed_catalog, motivation_catalog
+from apps.motivation.insights import (
+    WINDOW_DAYS,
+    compute_insights,
+    daily_series,
+    savings_rate_hint,
+    schedule_insights,
+    spending_trend_hint,
+)
+from apps.motivation.models import MotivationItem, UserInsights
+from core.testing import FakeRedisMixin
+
+
+# -------------------------
+# Лента и справочник мотивации
+# -------------------------
+
+class MotivationFeedTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for catalog in (feed_catalog, motivation_catalog):
+            self.enterContext(mock.patch.object(catalog, "_local", None))
+            catalog.version()
+
+        self.user = get_user_model().objects.create_user(email="feed@example.com", password="pass12345")
+        UserInsights.objects.create(user=self.user, cards=[{"kind": "trend"}], computed_at=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quotes = [
+                MotivationItem.objects.create(type=MotivationItem.QUOTE, title=f"Цитата {i}", priority=i)
+                for i in range(3)
+            ]
+            for i in range(3):
+                MotivationItem.objects.create(type=MotivationItem.FIN_TIP, title=f"Совет {i}", priority=i)
+            MotivationItem.objects.create(type=MotivationItem.FIN_TIP, title="Скрыт", is_active=False)
+
+    def feed(self, **params) -> dict:
+        r = self.client.get("/api/v1/motivation/motivation/", params)
+        self.assertEqual(r.status_code, 200)
+        return r.json()
+
+    def test_warm_feed_reads_only_user_cards(self):
+        self.feed()
+        with self.assertNumQueries(1):
+            data = self.feed(limit=2)
+        self.assertEqual([t["title"] for t in data["financial_tips"]], ["Совет 0", "Совет 1"])
+        self.assertEqual(data["dynamic"], [{"kind": "trend"}])
+        self.assertIsNone(data["wish_of_day"])
+
+    def test_quote_of_day_is_stable_within_a_day(self):
+        day = date(2026, 5, 1)
+        with mock.patch("apps.motivation.views.timezone.localdate", return_value=day):
+            first = self.feed()["quote_of_day"]["title"]
+            self.assertEqual(self.feed()["quote_of_day"]["title"], first)
+        expected = self.quotes[(day.toordinal() + self.user.id + 1) % len(self.quotes)]
+        self.assertEqual(first, expected.title)
+
+        with mock.patch("apps.motivation.views.timezone.localdate", return_value=date(2026, 5, 2)):
+            self.assertNotEqual(self.feed()["quote_of_day"]["title"], first)
+
+    def test_admin_change_is_visible_at_once(self):
+        self.feed()
+        with self.captureOnCommitCallbacks(execute=True):
+            MotivationItem.objects.create(type=MotivationItem.FIN_TIP, title="Новый", priority=0)
+        self.assertEqual(self.feed()["financial_tips"][0]["title"], "Новый")
+
+    def test_detail_etag_and_inactive(self):
+        item = self.quotes[0]
+        r = self.client.get(f"/api/v1/motivation/motivation/{item.id}/")
+        self.assertEqual(r.json()["title"], item.title)
+        self.assertTrue(r["Cache-Control"].startswith("private"))
+
+        with self.assertNumQueries(0):
+            r304 = self.client.get(f"/api/v1/motivation/motivation/{item.id}/", HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(r304.status_code, 304)
+
+        hidden = MotivationItem.objects.get(title="Скрыт")
+        self.assertEqual(self.client.get(f"/api/v1/motivation/motivation/{hidden.id}/").status_code, 404)
+
+
+# -------------------------
+# Персональные подсказки
+# -------------------------
+
+class DailySeriesTests(SimpleTestCase):
+    def test_empty(self):
+        income, expense, category_ids, by_category = daily_series([])
+        self.assertEqual(income.shape, (WINDOW_DAYS,))
+        self.assertEqual(expense.shape, (WINDOW_DAYS,))
+        self.assertEqual(len(category_ids), 0)
+        self.assertEqual(by_category.shape, (0, WINDOW_DAYS))
+
+    def test_sums_by_day_and_category(self):
+        rows = [
+            (0, False, None, 1000),  # доход
+            (0, True, 7, 100),
+            (0, True, 7, 50),
+            (3, True, 9, 20),
+            (3, True, None, 5),  # расход без категории — только в общий ряд
+            (WINDOW_DAYS - 1, True, 9, 30),
+        ]
+        income, expense, category_ids, by_category = daily_series(rows)
+
+        self.assertEqual(income[0], 1000)
+        self.assertEqual(income.sum(), 1000)
+        self.assertEqual(expense[0], 150)
+        self.assertEqual(expense[3], 25)
+        self.assertEqual(expense[-1], 30)
+        self.assertEqual(expense.sum(), 205)
+
+        self.assertEqual(category_ids.tolist(), [7, 9])
+        self.assertEqual(by_category.shape, (2, WINDOW_DAYS))
+        np.testing.assert_array_equal(by_category.sum(axis=1), [150, 50])
+        self.assertEqual(by_category[1, 3], 20)
+
+    def test_custom_window(self):
+        income, expense, _, by_category = daily_series([(6, True, 1, 10)], window=7)
+        self.assertEqual(expense.shape, (7,))
+        self.assertEqual(by_category.shape, (1, 7))
+
+
+class HintTests(SimpleTestCase):
+    def test_trend_needs_history(self):
+        expense = np.zeros(WINDOW_DAYS)
+        expense[-1] = 500
+        self.assertIsNone(spending_trend_hint(expense))
+
+    def test_trend_up_and_down(self):
+        expense = np.full(WINDOW_DAYS, 10.0)
+        expense[-7:] = 20
+        self.assertEqual(spending_trend_hint(expense)["code"], "SPENDING_TREND_UP")
+        expense[-7:] = 5
+        self.assertEqual(spending_trend_hint(expense)["code"], "SPENDING_TREND_DOWN")
+        expense[-7:] = 11
+        self.assertIsNone(spending_trend_hint(expense))
+
+    def test_savings_rate(self):
+        income = np.zeros(WINDOW_DAYS)
+        self.assertIsNone(savings_rate_hint(income, np.zeros(WINDOW_DAYS)))
+        income[-1] = 1000
+        for spent, code in ((1200, "SAVINGS_NEGATIVE"), (950, "SAVINGS_LOW"), (700, "SAVINGS_GOOD")):
+            expense = np.zeros(WINDOW_DAYS)
+            expense[-2] = spent
+            self.assertEqual(savings_rate_hint(income, expense)["code"], code)
+
+
+class ComputeInsightsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="insights@example.com", password="pass12345")
+        self.account = Account.objects.create(user=self.user)
+        self.cafe = Category.objects.create(user=self.user, name="Кафе")
+
+    def add(self, days_ago: int, type_: str, amount: int, category=None):
+        day = timezone.localdate() - timedelta(days=days_ago)
+        Transaction.objects.create(
+            user=self.user, account=self.account, category=category, type=type_, amount=Decimal(amount),
+            occurred_at=timezone.make_aware(datetime.combine(day, time(12, 0))),
+        )
+
+    def test_cards_are_ordered_and_stored(self):
+        self.add(20, Transaction.INCOME, 10000)
+        for days_ago in (8, 15, 22, 29):  # по разу в каждую прошлую неделю
+            self.add(days_ago, Transaction.EXPENSE, 100, self.cafe)
+        self.add(1, Transaction.EXPENSE, 2000, self.cafe)
+        Debt.objects.create(
+            user=self.user, kind=Debt.PAYABLE, person_name="Азамат", amount=Decimal("300"),
+            due_date=timezone.localdate() - timedelta(days=2),
+        )
+
+        self.assertEqual(compute_insights([self.user.id]), 1)
+        cards = UserInsights.objects.get(user=self.user).cards
+        self.assertEqual(
+            [c["code"] for c in cards],
+            ["DEBT_DUE", "CATEGORY_SPIKE", "SPENDING_TREND_UP", "SAVINGS_GOOD"],
+        )
+        self.assertEqual(cards[1]["data"]["category_id"], self.cafe.id)
+
+        # повторный расчёт перезаписывает строку, а не добавляет новую
+        Debt.objects.update(is_closed=True)
+        compute_insights([self.user.id])
+        self.assertEqual(UserInsights.objects.get(user=self.user).cards[0]["code"], "CATEGORY_SPIKE")
+
+    def test_schedule_splits_active_users_into_chunks(self):
+        User = get_user_model()
+        for i in range(2):
+            User.objects.create_user(email=f"insights{i}@example.com", password="pass12345")
+        User.objects.create_user(email="blocked@example.com", password="pass12345", is_active=False)
+
+        with mock.patch("apps.motivation.insights.INSIGHTS_CHUNK_SIZE", 2):
+            with mock.patch("apps.motivation.tasks.compute_insights_chunk.delay") as delay:
+                self.assertEqual(schedule_insights(), 2)
+        self.assertEqual(sum(len(c.args[0]) for c in delay.call_args_list), 3)
@@ -1,14 +1,17 @@
 from django.utils import timezone
-from django.db.models import Sum
-from decimal import Decimal
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import generics
+from rest_framework.exceptions import NotFound
 
+from apps.users.catalog import CATALOG_HTTP_MAX_AGE, json_response
+
+from .catalog import feed_catalog, motivation_catalog
+from .insights import get_user_cards
 from .models import MotivationItem
-from .serializers import MotivationItemListSerializer, MotivationItemDetailSerializer
+from .serializers import MotivationItemDetailSerializer
 from .serializers_swagger import MotivationFeedResponseSerializer
 from drf_spectacular.utils import extend_schema
 
@@ -18,8 +21,8 @@ class DailyPickMixin:
     каждому юзеру будет попадаться один элемент в день (без хранения в БД).
     """
 
-    def pick_daily(self, qs, user, salt: int = 0):
-        items = list(qs)
+    def pick_daily(self, items, user, salt: int = 0):
+        # items — готовый список из снимка ленты, тут только индекс
         if not items:
             return None
         today_seed = timezone.localdate().toordinal()
@@ -32,57 +35,28 @@ class MotivationFeedView(DailyPickMixin, APIView):
     @extend_schema(
         tags=['Motivation'],
         summary="Главная лента мотивации и советов",
-        description="Возвращает цитату дня, советы и динамические карточки на основе баланса.",
+        description="Возвращает цитату дня, советы и персональные карточки (пересчитываются ночью).",
         responses={200: MotivationFeedResponseSerializer}
     )
     def get(self, request):
-        limit = int(request.query_params.get("limit", 10))
-
-        base = MotivationItem.objects.filter(is_active=True)
-
-        smart_hints = base.filter(type=MotivationItem.SMART_HINT)[:limit]
-        fin_tips = base.filter(type=MotivationItem.FIN_TIP)[:limit]
-        remember = base.filter(type=MotivationItem.REMEMBER)[:limit]
+        limit = max(int(request.query_params.get("limit", 10)), 0)
 
-        quote_qs = base.filter(type=MotivationItem.QUOTE)[:200]
-        wish_qs = base.filter(type=MotivationItem.WISH)[:200]
+        # сериализованные элементы по типам (apps.motivation.catalog), без запросов в БД
+        snapshot = feed_catalog.get()
 
-        quote = self.pick_daily(quote_qs, request.user, salt=1)
-        wish = self.pick_daily(wish_qs, request.user, salt=2)
+        quote = self.pick_daily(snapshot["quotes"], request.user, salt=1)
+        wish = self.pick_daily(snapshot["wishes"], request.user, salt=2)
 
-        # --- Динамические подсказки (по желанию, очень полезно для экранов "У вас мало средств") ---
-        dynamic = []
-        try:
-            from apps.management.models import Transaction
+        # персональные карточки (тренд, всплеск категории, долги, сбережения, баланс)
+        # считает ночная задача — см. apps.motivation.insights
+        dynamic = get_user_cards(request.user.id)
 
-            income = (Transaction.objects
-                      .filter(user=request.user, type=Transaction.INCOME)
-                      .aggregate(s=Sum("amount"))["s"] or Decimal("0"))
-            expense = (Transaction.objects
-                       .filter(user=request.user, type=Transaction.EXPENSE)
-                       .aggregate(s=Sum("amount"))["s"] or Decimal("0"))
-            balance = income - expense
-
-            # Пример: если баланс низкий/минус — показываем карточку
-            if balance <= 0:
-                dynamic.append({
-                    "type": "DYNAMIC",
-                    "code": "LOW_BALANCE",
-                    "title": "У вас мало средств!",
-                    "short_text": "Пересмотрите расходы и попробуйте сократить необязательные покупки.",
-                    "icon": "warning",
-                    "color": "orange",
-                })
-        except Exception:
-            pass
-
-        ctx = {"request": request}
         return Response({
-            "smart_hints": MotivationItemListSerializer(smart_hints, many=True, context=ctx).data,
-            "quote_of_day": MotivationItemListSerializer(quote, context=ctx).data if quote else None,
-            "wish_of_day": MotivationItemListSerializer(wish, context=ctx).data if wish else None,
-            "financial_tips": MotivationItemListSerializer(fin_tips, many=True, context=ctx).data,
-            "remember": MotivationItemListSerializer(remember, many=True, context=ctx).data,
+            "smart_hints": snapshot["smart_hints"][:limit],
+            "quote_of_day": quote,
+            "wish_of_day": wish,
+            "financial_tips": snapshot["financial_tips"][:limit],
+            "remember": snapshot["remember"][:limit],
             "dynamic": dynamic,
         })
 
@@ -93,3 +67,12 @@ class MotivationDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         return MotivationItem.objects.filter(is_active=True)
+
+    def retrieve(self, request, *args, **kwargs):
+        # справочник из apps.motivation.catalog: без запроса в БД, ETag -> 304
+        cached = motivation_catalog.get().get(int(kwargs["pk"]))
+        if cached is None:
+            raise NotFound()
+        body, etag = cached
+        # под JWT: кэширует только клиент, не общий прокси
+        return json_response(request, body, etag, f"private, max-age={CATALOG_HTTP_MAX_AGE}")
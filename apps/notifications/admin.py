@@ -1,5 +1,5 @@
-from django.contrib import admin
-from apps.notifications.models import Notification, CalendarEvent 
+from django.contrib import admin, messages
+from apps.notifications.models import Notification, CalendarEvent, Broadcast
 
 
 @admin.register(Notification)
@@ -18,3 +18,25 @@ class CalendarEventAdmin(admin.ModelAdmin):
     search_fields = ("title", "note", "user__email", "user__phone_number")
     ordering = ("-starts_at", "-id")
     readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ("id", "title", "segment", "status", "sent_count", "push_count", "rate_per_sec", "created_at", "finished_at")
+    list_filter = ("segment", "status")
+    search_fields = ("title", "body")
+    ordering = ("-created_at", "-id")
+    readonly_fields = ("status", "sent_count", "push_count", "rate_per_sec", "created_at", "started_at", "finished_at")
+    actions = ("send_selected",)
+
+    @admin.action(description="Отправить рассылку")
+    def send_selected(self, request, queryset):
+        from apps.notifications.tasks import send_broadcast_task
+
+        queued = 0
+        for b in queryset.filter(status__in=[Broadcast.Status.DRAFT, Broadcast.Status.FAILED]):
+            Broadcast.objects.filter(pk=b.pk).update(status=Broadcast.Status.QUEUED)
+            send_broadcast_task.delay(b.id)
+            queued += 1
+
+        self.message_user(request, f"В очереди: {queued}", messages.SUCCESS)
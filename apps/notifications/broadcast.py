@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from apps.notifications import ws_stream
+from apps.notifications.firebase import MULTICAST_LIMIT, send_multicast
+from apps.notifications.models import Broadcast, DeviceToken, Notification
+from apps.notifications.services import ws_payload
+
+# -------------------------
+# Массовая рассылка: keyset-пагинация по id, bulk_create пачками,
+# FCM multicast, WS одной пачкой на чанк. Память не растёт с числом юзеров.
+# Курсор (last_user_id) коммитится вместе с уведомлениями чанка — повторный запуск
+# после падения продолжает с места остановки, без дублей.
+# -------------------------
+
+BROADCAST_CHUNK_SIZE = getattr(settings, "NOTIFICATIONS_BROADCAST_CHUNK_SIZE", 1000)
+
+
+def segment_queryset(segment: str):
+    from apps.users.models import UserPrivilege
+
+    qs = get_user_model().objects.filter(is_active=True)
+
+    if segment == Broadcast.Segment.PREMIUM:
+        qs = qs.filter(Exists(UserPrivilege.objects.filter(user_id=OuterRef("pk"))))
+    elif segment == Broadcast.Segment.NOTIFICATIONS_ENABLED:
+        # нет профиля = настройки по умолчанию (уведомления включены)
+        qs = qs.filter(Q(profile__isnull=True) | Q(profile__notifications_enabled=True))
+
+    return qs
+
+
+def iter_user_id_chunks(segment: str, chunk_size: int = BROADCAST_CHUNK_SIZE, after_id: int = 0):
+    """
+    WHERE id > last_id ORDER BY id LIMIT n — без OFFSET, без растущих списков.
+    """
+    qs = segment_queryset(segment)
+    last_id = after_id
+    while True:
+        ids = list(qs.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+async def _fanout_ws(items: list[tuple[int, dict]]):
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*(
+        channel_layer.group_send(f"notifications_user_{user_id}", {"type": "notify", "payload": payload})
+        for user_id, payload in items
+    ))
+
+
+def _send_ws_chunk(notifications: list[Notification]):
+    items = [(n.user_id, ws_payload(n)) for n in notifications]
+    try:
+        stream_ids = ws_stream.append_many(items)
+        items = [(user_id, {**payload, "stream_id": sid}) for (user_id, payload), sid in zip(items, stream_ids)]
+    except Exception:
+        pass
+
+    try:
+        async_to_sync(_fanout_ws)(items)
+    except Exception:
+        pass
+
+
+def _send_push_chunk(user_ids: list[int], title: str, body: str, data: dict) -> int:
+    tokens = list(
+        DeviceToken.objects
+        .filter(user_id__in=user_ids, is_active=True)
+        .values_list("token", flat=True)
+    )
+
+    sent = 0
+    for i in range(0, len(tokens), MULTICAST_LIMIT):
+        try:
+            ok, dead = send_multicast(tokens[i:i + MULTICAST_LIMIT], title=title, body=body, data=data)
+        except Exception:
+            continue
+        sent += ok
+        if dead:
+            DeviceToken.objects.filter(token__in=dead).update(is_active=False)
+    return sent
+
+
+def send_broadcast(broadcast: Broadcast, chunk_size: int = BROADCAST_CHUNK_SIZE, progress=None) -> Broadcast:
+    """
+    progress(sent_count, push_count, rate_per_sec) — вызывается после каждого чанка.
+    Рассылка с ненулевым last_user_id продолжается, счётчики не обнуляются.
+    """
+    resume = broadcast.last_user_id > 0
+    broadcast.status = Broadcast.Status.RUNNING
+    if not resume:
+        broadcast.started_at = timezone.now()
+        broadcast.sent_count = 0
+        broadcast.push_count = 0
+    broadcast.save(update_fields=["status", "started_at", "sent_count", "push_count"])
+
+    started = time.monotonic()
+    sent_before = broadcast.sent_count
+    data = {"broadcast_id": broadcast.id}
+
+    try:
+        for user_ids in iter_user_id_chunks(broadcast.segment, chunk_size, after_id=broadcast.last_user_id):
+            broadcast.last_user_id = user_ids[-1]
+            broadcast.sent_count += len(user_ids)
+
+            with transaction.atomic():
+                notifications = Notification.objects.bulk_create([
+                    Notification(
+                        user_id=user_id,
+                        type=Notification.Type.SYSTEM,
+                        title=broadcast.title,
+                        body=broadcast.body,
+                        payload=data,
+                    )
+                    for user_id in user_ids
+                ])
+                Broadcast.objects.filter(pk=broadcast.pk).update(
+                    last_user_id=broadcast.last_user_id,
+                    sent_count=broadcast.sent_count,
+                )
+
+            _send_ws_chunk(notifications)
+            broadcast.push_count += _send_push_chunk(user_ids, broadcast.title, broadcast.body, data)
+            broadcast.rate_per_sec = (broadcast.sent_count - sent_before) / max(time.monotonic() - started, 1e-6)
+
+            Broadcast.objects.filter(pk=broadcast.pk).update(
+                push_count=broadcast.push_count,
+                rate_per_sec=broadcast.rate_per_sec,
+            )
+            if progress:
+                progress(broadcast.sent_count, broadcast.push_count, broadcast.rate_per_sec)
+    except Exception:
+        broadcast.status = Broadcast.Status.FAILED
+        broadcast.finished_at = timezone.now()
+        broadcast.save(update_fields=["status", "finished_at"])
+        raise
+
+    broadcast.status = Broadcast.Status.DONE
+    broadcast.finished_at = timezone.now()
+    broadcast.save(update_fields=["status", "finished_at"])
+    return broadcast
@@ -1,8 +1,24 @@
 import json
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from . import presence, ws_stream
+from .executor import run_sync
+
 
 class NotificationsConsumer(AsyncWebsocketConsumer):
+    """
+    ws/notifications/?token=<access>&last_id=<stream_id>
+
+    last_id — stream_id последнего полученного сообщения.
+    После connect досылаем всё, что было после него; если разрыв больше
+    стрима — шлём {"event": "resync"}, и клиент догружается через REST.
+
+    Heartbeat: клиент шлёт {"type": "ping"} раз в ~30 сек, отвечаем
+    {"event": "pong"} и продлеваем presence (пока он жив, FCM не дублируем).
+    """
+
     async def connect(self):
         user = self.scope.get("user")
         if not user or getattr(user, "is_anonymous", True):
@@ -10,8 +26,15 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
             return
 
         self.group_name = f"notifications_user_{user.id}"
+        self.last_sent_id = None
+
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        await self.touch_presence(user.id)
+
+        last_id = self.get_last_id()
+        if last_id:
+            await self.replay(user.id, last_id)
 
     async def disconnect(self, close_code):
         user = self.scope.get("user")
@@ -19,7 +42,65 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
             await self.channel_layer.group_discard(
                 f"notifications_user_{user.id}", self.channel_name
             )
+            try:
+                await run_sync(presence.leave, user.id, self.channel_name)
+            except Exception:
+                pass
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            message = json.loads(text_data or "{}")
+        except ValueError:
+            return
+
+        if isinstance(message, dict) and message.get("type") == "ping":
+            await self.touch_presence(self.scope["user"].id)
+            await self.send(text_data=json.dumps({"event": "pong"}))
 
     async def notify(self, event):
         payload = event.get("payload", {})
+
+        # то, что уже ушло при replay, второй раз не шлём
+        stream_id = payload.get("stream_id")
+        if self.last_sent_id and not ws_stream.is_newer(stream_id, self.last_sent_id):
+            return
+
+        await self.send_payload(payload)
+
+    async def touch_presence(self, user_id: int):
+        try:
+            await run_sync(presence.touch, user_id, self.channel_name)
+        except Exception:
+            pass
+
+    # -------------------------
+    # Replay
+    # -------------------------
+    def get_last_id(self):
+        raw_qs = self.scope.get("query_string", b"").decode(errors="ignore")
+        last_id = parse_qs(raw_qs).get("last_id", [None])[0]
+        if not ws_stream.is_valid_id(last_id):
+            return None
+        return last_id.strip()
+
+    async def replay(self, user_id: int, last_id: str):
+        try:
+            payloads, complete = await run_sync(ws_stream.read_since, user_id, last_id)
+        except Exception:
+            payloads, complete = [], False
+
+        if not complete:
+            await self.send(text_data=json.dumps({
+                "event": "resync",
+                "detail": "Пропущено больше, чем хранится. Обновите список через REST.",
+                "rest": "/api/v1/notifications/notifications/",
+            }, ensure_ascii=False))
+            return
+
+        for payload in payloads:
+            await self.send_payload(payload)
+
+    async def send_payload(self, payload: dict):
         await self.send(text_data=json.dumps(payload, ensure_ascii=False))
+        if payload.get("stream_id"):
+            self.last_sent_id = payload["stream_id"]
@@ -0,0 +1,49 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+# -------------------------
+# Отдельные пулы потоков для sync-вызовов из async-кода.
+# Не делим дефолтный пул sync_to_async с HTTP: шторм переподключений
+# или медленный FCM упираются в свой лимит, а не забивают весь процесс.
+# -------------------------
+
+# WS: auth, replay, presence
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "NOTIFICATIONS_WS_EXECUTOR_WORKERS", 8),
+    thread_name_prefix="ws-sync",
+)
+
+# FCM: сетевые вызовы send_push, в БД не ходят
+_push_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "NOTIFICATIONS_PUSH_EXECUTOR_WORKERS", 16),
+    thread_name_prefix="fcm-push",
+)
+
+
+def _call(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(_call, func, args, kwargs))
+
+
+async def run_push(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_push_executor, functools.partial(func, *args, **kwargs))
+
+
+def map_push(func, items) -> list:
+    """
+    Sync-вариант для create_and_send_notification: параллельно в том же пуле FCM.
+    """
+    return list(_push_executor.map(func, items))
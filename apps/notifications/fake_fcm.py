@@ -0,0 +1,68 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+
+# -------------------------
+# In-process заглушка FCM: задержка и ошибки как у настоящего,
+# но без сети и без квоты Google. Для бенчмарков и локальной разработки.
+# -------------------------
+
+UNREGISTERED = "UNREGISTERED"
+QUOTA_EXCEEDED = "QUOTA_EXCEEDED"
+
+
+class FakeFCMTransport:
+    def __init__(self, latency_ms=None, unregistered_rate=None, quota_rate=None, seed=None):
+        conf = getattr(settings, "NOTIFICATIONS_FAKE_FCM", {})
+        self.latency = (conf.get("LATENCY_MS", 30) if latency_ms is None else latency_ms) / 1000
+        self.unregistered_rate = conf.get("UNREGISTERED_RATE", 0.0) if unregistered_rate is None else unregistered_rate
+        self.quota_rate = conf.get("QUOTA_RATE", 0.0) if quota_rate is None else quota_rate
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, UNREGISTERED: 0, QUOTA_EXCEEDED: 0, "requests": 0}
+
+    def _outcome(self) -> str | None:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.unregistered_rate:
+            return UNREGISTERED
+        if roll < self.unregistered_rate + self.quota_rate:
+            return QUOTA_EXCEEDED
+        return None
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def send(self, token: str, title: str, body: str, data: dict | None = None, collapse_key: str | None = None):
+        time.sleep(self.latency)
+        self._count("requests")
+
+        error = self._outcome()
+        if error:
+            self._count(error)
+            return False, error
+
+        self._count("sent")
+        return True, f"projects/fake/messages/{token[:16]}"
+
+    def send_multicast(self, tokens: list[str], title: str, body: str, data: dict | None = None):
+        # один HTTP-запрос на пачку — одна задержка
+        time.sleep(self.latency)
+        self._count("requests")
+
+        ok, dead = 0, []
+        for token in tokens:
+            error = self._outcome()
+            if error == UNREGISTERED:
+                dead.append(token)
+            if error:
+                self._count(error)
+                continue
+            ok += 1
+
+        self._count("sent", ok)
+        return ok, dead
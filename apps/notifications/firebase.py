@@ -2,8 +2,12 @@ import os
 import firebase_admin
 from firebase_admin import credentials, messaging
 from django.conf import settings
+from django.utils.module_loading import import_string
 
 _app = None
+_transport = None
+
+MULTICAST_LIMIT = 500  # лимит FCM на один multicast
 
 def get_firebase_app():
     global _app
@@ -18,18 +22,90 @@ def get_firebase_app():
     _app = firebase_admin.initialize_app(cred)
     return _app
 
-def send_push(token: str, title: str, body: str, data: dict | None = None):
-    app = get_firebase_app()
-    if not app:
-        return False, "Firebase not configured"
+def collapse_configs(collapse_key: str | None) -> dict:
+    """
+    Один collapse_key для всех платформ: новый push заменяет старый на устройстве.
+    """
+    if not collapse_key:
+        return {}
+    return {
+        "android": messaging.AndroidConfig(
+            collapse_key=collapse_key,
+            notification=messaging.AndroidNotification(tag=collapse_key),
+        ),
+        "apns": messaging.APNSConfig(headers={"apns-collapse-id": collapse_key[:64]}),
+        "webpush": messaging.WebpushConfig(notification=messaging.WebpushNotification(tag=collapse_key)),
+    }
+
+
+class FirebaseTransport:
+    """
+    Настоящий FCM через firebase-admin. Транспорт выбирается NOTIFICATIONS_PUSH_TRANSPORT
+    (для нагрузочных тестов — apps.notifications.fake_fcm.FakeFCMTransport).
+    """
+
+    def send(self, token: str, title: str, body: str, data: dict | None = None, collapse_key: str | None = None):
+        app = get_firebase_app()
+        if not app:
+            return False, "Firebase not configured"
 
-    try:
-        msg = messaging.Message(
-            token=token,
+        try:
+            msg = messaging.Message(
+                token=token,
+                notification=messaging.Notification(title=title, body=body),
+                data={k: str(v) for k, v in (data or {}).items()},
+                **collapse_configs(collapse_key),
+            )
+            resp = messaging.send(msg, app=app)
+            return True, resp
+        except Exception as e:
+            return False, str(e)
+
+    def send_multicast(self, tokens: list[str], title: str, body: str, data: dict | None = None):
+        app = get_firebase_app()
+        if not app or not tokens:
+            return 0, []
+
+        msg = messaging.MulticastMessage(
+            tokens=tokens,
             notification=messaging.Notification(title=title, body=body),
             data={k: str(v) for k, v in (data or {}).items()},
         )
-        resp = messaging.send(msg, app=app)
-        return True, resp
-    except Exception as e:
-        return False, str(e)
+        resp = messaging.send_each_for_multicast(msg, app=app)
+
+        dead = [
+            token
+            for token, r in zip(tokens, resp.responses)
+            if not r.success and isinstance(r.exception, messaging.UnregisteredError)
+        ]
+        return resp.success_count, dead
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        path = getattr(settings, "NOTIFICATIONS_PUSH_TRANSPORT", "apps.notifications.firebase.FirebaseTransport")
+        _transport = import_string(path)()
+    return _transport
+
+
+def set_transport(transport):
+    """
+    Подменить транспорт в рантайме (бенчмарк). Возвращает предыдущий.
+    """
+    global _transport
+    previous = get_transport()
+    _transport = transport
+    return previous
+
+
+def send_push(token: str, title: str, body: str, data: dict | None = None, collapse_key: str | None = None):
+    return get_transport().send(token, title=title, body=body, data=data, collapse_key=collapse_key)
+
+
+def send_multicast(tokens: list[str], title: str, body: str, data: dict | None = None):
+    """
+    Одно сообщение на пачку токенов (до 500). -> (success_count, dead_tokens)
+    dead_tokens — токены, которые FCM больше не знает, их стоит выключить.
+    """
+    return get_transport().send_multicast(tokens, title=title, body=body, data=data)
@@ -0,0 +1,189 @@
+import hashlib
+import secrets
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from apps.notifications.models import CalendarEvent, CalendarFeed
+
+# -------------------------
+# iCalendar (RFC 5545) фид событий пользователя
+# -------------------------
+
+ICS_CHUNK_SIZE = 500
+
+
+def _new_secret() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def get_feed_token(user_id: int) -> str:
+    feed, _ = CalendarFeed.objects.get_or_create(user_id=user_id, defaults={"secret": _new_secret()})
+    return feed.secret
+
+
+def rotate_feed_token(user_id: int) -> str:
+    """
+    Новый секрет — все ранее выданные ссылки сразу перестают работать.
+    """
+    secret = _new_secret()
+    CalendarFeed.objects.update_or_create(user_id=user_id, defaults={"secret": secret})
+    return secret
+
+
+def load_feed(token: str) -> tuple[int, str] | None:
+    """
+    (user_id, etag) по секрету ссылки — одним запросом: строка фида + max(updated_at)/count
+    событий по индексу (user, updated_at). count ловит удаления, которые max не меняют.
+    Для неактивных и удалённых юзеров — None (фид отдаёт 404).
+    """
+    if not token or len(token) > 64:
+        return None
+    row = (
+        CalendarFeed.objects
+        .filter(secret=token, user__is_active=True, user__deleted_at__isnull=True)
+        .annotate(last=Max("user__calendar_events__updated_at"), n=Count("user__calendar_events"))
+        .values_list("user_id", "last", "n")
+        .first()
+    )
+    if row is None:
+        return None
+
+    user_id, last, n = row
+    raw = f"{user_id}:{n}:{last.isoformat() if last else '-'}"
+    return user_id, '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def _escape(text: str) -> str:
+    return (
+        (text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    # строки длиннее 75 октетов переносим (RFC 5545, 3.1)
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+
+    parts = []
+    chunk = b""
+    for ch in line:
+        enc = ch.encode()
+        limit = 75 if not parts else 74
+        if len(chunk) + len(enc) > limit:
+            parts.append(chunk.decode())
+            chunk = b""
+        chunk += enc
+    parts.append(chunk.decode())
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _dt(value) -> str:
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _local_dt(value) -> str:
+    # локальное время зоны TZID: RRULE повторяет "в 9:00 по Бишкеку", а не "в 3:00 UTC"
+    return timezone.localtime(value).strftime("%Y%m%dT%H%M%S")
+
+
+def _offset(delta) -> str:
+    minutes = int(delta.total_seconds()) // 60
+    sign = "+" if minutes >= 0 else "-"
+    return f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+
+def _vtimezone(tz) -> list[str]:
+    """
+    VTIMEZONE для зоны без перехода на летнее время (TIME_ZONE = Asia/Bishkek).
+    Для зон с переходами — пусто: клиенты понимают TZID по имени IANA.
+    """
+    year = timezone.now().year
+    winter = datetime(year, 1, 1, tzinfo=tz).utcoffset()
+    summer = datetime(year, 7, 1, tzinfo=tz).utcoffset()
+    if winter != summer:
+        return []
+    return [
+        "BEGIN:VTIMEZONE",
+        f"TZID:{tz.key}",
+        "BEGIN:STANDARD",
+        "DTSTART:19700101T000000",
+        f"TZOFFSETFROM:{_offset(winter)}",
+        f"TZOFFSETTO:{_offset(winter)}",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+    ]
+
+
+def _rrule(event: CalendarEvent) -> str | None:
+    if event.repeat == CalendarEvent.Repeat.DAILY:
+        return "FREQ=DAILY"
+    if event.repeat == CalendarEvent.Repeat.WEEKLY:
+        return "FREQ=WEEKLY"
+    if event.repeat == CalendarEvent.Repeat.MONTHLY:
+        day = timezone.localtime(event.starts_at).day
+        if day <= 28:
+            return "FREQ=MONTHLY"
+        # как у нас: 31-е в коротком месяце -> последний день месяца
+        days = ",".join(str(d) for d in range(28, day + 1))
+        return f"FREQ=MONTHLY;BYMONTHDAY={days};BYSETPOS=-1"
+    return None
+
+
+def render_event(event: CalendarEvent) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event.id}@besh-tashta",
+        f"DTSTAMP:{_dt(event.updated_at)}",
+        f"DTSTART;TZID={timezone.get_current_timezone_name()}:{_local_dt(event.starts_at)}",
+        f"SUMMARY:{_escape(event.title)}",
+    ]
+    if event.note:
+        lines.append(f"DESCRIPTION:{_escape(event.note)}")
+
+    rrule = _rrule(event)
+    if rrule:
+        lines.append(f"RRULE:{rrule}")
+
+    if event.reminder_minutes is not None:
+        lines += [
+            "BEGIN:VALARM",
+            "ACTION:DISPLAY",
+            f"DESCRIPTION:{_escape(event.title)}",
+            f"TRIGGER:-PT{event.reminder_minutes}M",
+            "END:VALARM",
+        ]
+
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def iter_feed(user_id: int):
+    """
+    Стримит календарь по кусочку на событие; в памяти не больше одной пачки строк.
+    """
+    tz = timezone.get_current_timezone()
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Besh-Tashta//Calendar//RU",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        "X-WR-CALNAME:Besh-Tashta",
+        f"X-WR-TIMEZONE:{tz.key}",
+        *_vtimezone(tz),
+    ))
+
+    qs = CalendarEvent.objects.filter(user_id=user_id).order_by("id")
+    for event in qs.iterator(chunk_size=ICS_CHUNK_SIZE):
+        yield render_event(event)
+
+    yield _fold("END:VCALENDAR")
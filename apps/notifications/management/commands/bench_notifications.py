@@ -0,0 +1,77 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.notifications.fake_fcm import FakeFCMTransport
+from apps.notifications.firebase import set_transport
+from apps.notifications.models import DeviceToken
+from apps.notifications.services import create_and_send_notification
+
+
+class Command(BaseCommand):
+    help = "Benchmark create_and_send_notification against the in-process fake FCM"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--devices", default="1,10,1000", help="Devices per user, comma separated")
+        parser.add_argument("--count", type=int, default=50, help="Notifications per run")
+        parser.add_argument("--latency-ms", type=float, default=30)
+        parser.add_argument("--unregistered-rate", type=float, default=0.0)
+        parser.add_argument("--quota-rate", type=float, default=0.0)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        transport = FakeFCMTransport(
+            latency_ms=options["latency_ms"],
+            unregistered_rate=options["unregistered_rate"],
+            quota_rate=options["quota_rate"],
+            seed=options["seed"],
+        )
+        previous = set_transport(transport)
+
+        try:
+            for devices in [int(x) for x in options["devices"].split(",") if x.strip()]:
+                self.run(devices, options["count"], transport)
+        finally:
+            set_transport(previous)
+
+    def run(self, devices: int, count: int, transport: FakeFCMTransport):
+        User = get_user_model()
+        user = User.objects.create_user(email=f"bench_{time.time_ns()}@example.invalid")
+        DeviceToken.objects.bulk_create([
+            DeviceToken(user=user, token=f"bench-{user.id}-{i}") for i in range(devices)
+        ])
+
+        transport.stats = dict.fromkeys(transport.stats, 0)
+        latencies = []
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for i in range(count):
+                    t0 = time.perf_counter()
+                    create_and_send_notification(
+                        user=user,
+                        title="Bench",
+                        body=f"#{i}",
+                        payload={"bench": i},
+                        # как у напоминаний: push на каждое уведомление, лимит push (token bucket) не применяется
+                        delivery="both",
+                    )
+                    latencies.append(time.perf_counter() - t0)
+                elapsed = time.perf_counter() - started
+        finally:
+            user.delete()
+
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+
+        self.stdout.write(
+            f"devices={devices:<5} n={count:<5} "
+            f"rate={count / elapsed:8.1f}/s  p50={p50:8.1f}ms  p99={p99:8.1f}ms  "
+            f"queries/notification={len(queries.captured_queries) / count:.1f}  "
+            f"fcm={transport.stats}"
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.notifications.broadcast import BROADCAST_CHUNK_SIZE, send_broadcast
+from apps.notifications.models import Broadcast
+
+
+class Command(BaseCommand):
+    help = "Send a notification to all users or a segment (ALL / PREMIUM / NOTIFICATIONS_ENABLED)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--title")
+        parser.add_argument("--body", default="")
+        parser.add_argument("--segment", default=Broadcast.Segment.ALL, choices=Broadcast.Segment.values)
+        parser.add_argument("--chunk-size", type=int, default=BROADCAST_CHUNK_SIZE)
+        parser.add_argument("--resume", type=int, help="id упавшей рассылки: продолжить с last_user_id")
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            broadcast = Broadcast.objects.filter(pk=options["resume"]).exclude(status=Broadcast.Status.DONE).first()
+            if not broadcast:
+                raise CommandError(f"broadcast {options['resume']} not found or already done")
+        elif options["title"]:
+            broadcast = Broadcast.objects.create(
+                title=options["title"],
+                body=options["body"],
+                segment=options["segment"],
+            )
+        else:
+            raise CommandError("--title or --resume is required")
+
+        def progress(sent, pushed, rate):
+            self.stdout.write(f"sent={sent} push={pushed} rate={rate:.0f}/s")
+
+        send_broadcast(broadcast, chunk_size=options["chunk_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"broadcast={broadcast.id} sent={broadcast.sent_count} push={broadcast.push_count} "
+            f"rate={broadcast.rate_per_sec:.0f}/s"
+        ))
@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-19 06:11
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_next_fire_at(apps, schema_editor):
+    from apps.notifications.recurrence import next_occurrence_after
+
+    CalendarEvent = apps.get_model("notifications", "CalendarEvent")
+    now = timezone.now()
+
+    batch = []
+    qs = CalendarEvent.objects.filter(reminder_minutes__isnull=False).only("id", "starts_at", "repeat", "reminder_minutes")
+    for ev in qs.iterator(chunk_size=2000):
+        lead = timedelta(minutes=ev.reminder_minutes)
+        occurrence = next_occurrence_after(ev.starts_at, ev.repeat, now + lead)
+        if occurrence is None:
+            continue
+        ev.next_fire_at = occurrence - lead
+        batch.append(ev)
+        if len(batch) >= 2000:
+            CalendarEvent.objects.bulk_update(batch, ["next_fire_at"])
+            batch = []
+
+    if batch:
+        CalendarEvent.objects.bulk_update(batch, ["next_fire_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_devicetoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarevent',
+            name='next_fire_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['next_fire_at'], name='calendar_next_fire_idx'),
+        ),
+        migrations.RunPython(backfill_next_fire_at, migrations.RunPython.noop),
+    ]
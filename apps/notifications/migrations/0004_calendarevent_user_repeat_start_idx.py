@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 06:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_calendarevent_next_fire_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['user', 'repeat', 'starts_at'], name='calendar_user_repeat_start_idx'),
+        ),
+    ]
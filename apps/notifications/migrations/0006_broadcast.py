@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_calendarevent_user_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True, default='')),
+                ('segment', models.CharField(choices=[('ALL', 'Все пользователи'), ('PREMIUM', 'С привилегиями'), ('NOTIFICATIONS_ENABLED', 'Включены уведомления')], default='ALL', max_length=32)),
+                ('status', models.CharField(choices=[('DRAFT', 'Черновик'), ('QUEUED', 'В очереди'), ('RUNNING', 'Отправляется'), ('DONE', 'Отправлено'), ('FAILED', 'Ошибка')], default='DRAFT', max_length=16)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('push_count', models.PositiveIntegerField(default=0)),
+                ('rate_per_sec', models.FloatField(default=0)),
+                ('last_user_id', models.PositiveBigIntegerField(default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Рассылка',
+                'verbose_name_plural': 'Рассылки',
+                'ordering': ('-created_at', '-id'),
+            },
+        ),
+    ]
@@ -1,5 +1,10 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from apps.notifications.recurrence import next_occurrence_after
 
 
 class CalendarEvent(models.Model):
@@ -17,15 +22,48 @@ class CalendarEvent(models.Model):
     repeat = models.CharField(max_length=16, choices=Repeat.choices, default=Repeat.NONE)
     reminder_minutes = models.PositiveIntegerField(null=True, blank=True)  # например 10/60/1440
 
+    # когда слать ближайшее напоминание (NULL — напоминаний больше нет)
+    next_fire_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    SCHEDULE_FIELDS = {"starts_at", "repeat", "reminder_minutes"}
+
     class Meta:
         ordering = ("-starts_at", "-id")
+        indexes = [
+            models.Index(fields=["next_fire_at"], name="calendar_next_fire_idx"),
+            models.Index(fields=["user", "repeat", "starts_at"], name="calendar_user_repeat_start_idx"),
+            models.Index(fields=["user", "updated_at"], name="calendar_user_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.starts_at})"
 
+    def compute_next_fire_at(self, after=None):
+        """
+        Ближайшее время напоминания строго позже after (по умолчанию — сейчас).
+        """
+        if self.reminder_minutes is None or not self.starts_at:
+            return None
+
+        after = after or timezone.now()
+        lead = timedelta(minutes=self.reminder_minutes)
+
+        occurrence = next_occurrence_after(self.starts_at, self.repeat, after + lead)
+        if occurrence is None:
+            return None
+        return occurrence - lead
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or self.SCHEDULE_FIELDS & set(update_fields):
+            self.next_fire_at = self.compute_next_fire_at()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "next_fire_at"}
+        super().save(*args, **kwargs)
+
 
 class Notification(models.Model):
     class Type(models.TextChoices):
@@ -63,4 +101,56 @@ class DeviceToken(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user_id} {self.platform}"
\ No newline at end of file
+        return f"{self.user_id} {self.platform}"
+
+
+class CalendarFeed(models.Model):
+    """
+    Секрет ICS-ссылки: случайный, у каждого юзера свой, перевыпуск делает старую ссылку мёртвой.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="calendar_feed")
+    secret = models.CharField(max_length=64, unique=True)
+    rotated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} feed"
+
+
+class Broadcast(models.Model):
+    """
+    Рассылка уведомления всем / сегменту пользователей (из админки или командой send_broadcast).
+    """
+    class Segment(models.TextChoices):
+        ALL = "ALL", "Все пользователи"
+        PREMIUM = "PREMIUM", "С привилегиями"
+        NOTIFICATIONS_ENABLED = "NOTIFICATIONS_ENABLED", "Включены уведомления"
+
+    class Status(models.TextChoices):
+        DRAFT = "DRAFT", "Черновик"
+        QUEUED = "QUEUED", "В очереди"
+        RUNNING = "RUNNING", "Отправляется"
+        DONE = "DONE", "Отправлено"
+        FAILED = "FAILED", "Ошибка"
+
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True, default="")
+    segment = models.CharField(max_length=32, choices=Segment.choices, default=Segment.ALL)
+
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.DRAFT)
+    sent_count = models.PositiveIntegerField(default=0)
+    push_count = models.PositiveIntegerField(default=0)
+    rate_per_sec = models.FloatField(default=0)
+    # курсор keyset-итерации: после падения рассылка продолжается с id > last_user_id
+    last_user_id = models.PositiveBigIntegerField(default=0, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at", "-id")
+        verbose_name = "Рассылка"
+        verbose_name_plural = "Рассылки"
+
+    def __str__(self):
+        return f"[{self.segment}] {self.title}"
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+# -------------------------
+# Presence: есть ли у юзера живой WS.
+# ZSET channel_name -> срок годности; connect/heartbeat продлевают, disconnect удаляет.
+# Если сокет умер без disconnect — запись просто протухнет через PRESENCE_TTL.
+# -------------------------
+
+PRESENCE_TTL = getattr(settings, "NOTIFICATIONS_PRESENCE_TTL", 90)
+
+
+def presence_key(user_id: int) -> str:
+    return f"notif:presence:u{user_id}"
+
+
+def touch(user_id: int, channel_name: str) -> None:
+    conn = get_redis_connection("default")
+    key = presence_key(user_id)
+
+    pipe = conn.pipeline()
+    pipe.zadd(key, {channel_name: time.time() + PRESENCE_TTL})
+    pipe.expire(key, PRESENCE_TTL)
+    pipe.execute()
+
+
+def leave(user_id: int, channel_name: str) -> None:
+    conn = get_redis_connection("default")
+    conn.zrem(presence_key(user_id), channel_name)
+
+
+def is_online(user_id: int) -> bool:
+    conn = get_redis_connection("default")
+    key = presence_key(user_id)
+
+    pipe = conn.pipeline()
+    pipe.zremrangebyscore(key, "-inf", time.time())
+    pipe.zcard(key)
+    _, alive = pipe.execute()
+    return alive > 0
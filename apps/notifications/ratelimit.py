@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+# -------------------------
+# Схлопывание похожих уведомлений и token bucket на push для юзера
+# -------------------------
+
+COLLAPSE_WINDOW = getattr(settings, "NOTIFICATIONS_COLLAPSE_WINDOW", 600)
+PUSH_BUCKET_CAPACITY = getattr(settings, "NOTIFICATIONS_PUSH_BUCKET_CAPACITY", 5)
+PUSH_BUCKET_REFILL_PER_MIN = getattr(settings, "NOTIFICATIONS_PUSH_BUCKET_REFILL_PER_MIN", 1)
+
+
+def collapse_key_name(user_id: int, collapse_key: str) -> str:
+    return f"notif:collapse:u{user_id}:{collapse_key}"
+
+
+def get_collapsed_id(user_id: int, collapse_key: str) -> int | None:
+    """
+    id уведомления, в которое надо схлопнуть новое (None — окно пустое).
+    """
+    conn = get_redis_connection("default")
+    value = conn.get(collapse_key_name(user_id, collapse_key))
+    return int(value) if value else None
+
+
+def remember_collapsed_id(user_id: int, collapse_key: str, notification_id: int) -> None:
+    # окно считается от первого уведомления, дальше не продлеваем
+    conn = get_redis_connection("default")
+    conn.set(collapse_key_name(user_id, collapse_key), notification_id, ex=COLLAPSE_WINDOW, nx=True)
+
+
+# Атомарно: долить токены за прошедшее время, списать один если есть
+_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return allowed
+"""
+
+
+def bucket_key(user_id: int) -> str:
+    return f"notif:bucket:u{user_id}"
+
+
+def take_push_token(user_id: int, capacity: int | None = None, refill_per_min: float | None = None) -> bool:
+    """
+    False — юзер исчерпал лимит push, уведомление остаётся в ленте и WS.
+    capacity/refill_per_min — по умолчанию из настроек.
+    """
+    conn = get_redis_connection("default")
+    capacity = PUSH_BUCKET_CAPACITY if capacity is None else capacity
+    rate = (PUSH_BUCKET_REFILL_PER_MIN if refill_per_min is None else refill_per_min) / 60.0
+    allowed = conn.eval(_BUCKET_LUA, 1, bucket_key(user_id), capacity, rate, time.time())
+    return bool(allowed)
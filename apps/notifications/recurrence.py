@@ -0,0 +1,92 @@
+import copy
+import heapq
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.utils import timezone
+
+# -------------------------
+# Повторы CalendarEvent.
+# n-е повторение считаем от исходного starts_at (а не от предыдущего),
+# чтобы 31-е число не "съезжало" на 28-е после февраля.
+# -------------------------
+
+STEPS = {
+    "DAILY": relativedelta(days=1),
+    "WEEKLY": relativedelta(weeks=1),
+    "MONTHLY": relativedelta(months=1),
+}
+
+# Примерная длина шага — только для оценки номера повторения
+APPROX_STEP = {
+    "DAILY": timedelta(days=1),
+    "WEEKLY": timedelta(weeks=1),
+    "MONTHLY": timedelta(days=28),
+}
+
+
+def nth_occurrence(starts_at: datetime, repeat: str, n: int) -> datetime:
+    # считаем в локальном времени: "каждый день в 9:00" не плывёт при смене смещения
+    return timezone.localtime(starts_at) + STEPS[repeat] * n
+
+
+def _first_index_after(starts_at: datetime, repeat: str, moment: datetime) -> int:
+    """
+    Номер первого повторения строго позже moment.
+    """
+    if starts_at > moment:
+        return 0
+
+    # оценка снизу, дальше добиваем шагами (обычно 0-2 итерации)
+    n = max(0, int((moment - starts_at) / APPROX_STEP[repeat]) - 1)
+    if repeat == "MONTHLY":
+        n = max(0, (moment.year - starts_at.year) * 12 + moment.month - starts_at.month - 1)
+
+    while nth_occurrence(starts_at, repeat, n) <= moment:
+        n += 1
+    return n
+
+
+def next_occurrence_after(starts_at: datetime, repeat: str, moment: datetime) -> datetime | None:
+    """
+    Первое повторение строго позже moment (None — повторов больше нет).
+    """
+    if starts_at > moment:
+        return starts_at
+    if repeat not in STEPS:
+        return None
+    return nth_occurrence(starts_at, repeat, _first_index_after(starts_at, repeat, moment))
+
+
+def occurrences_between(starts_at: datetime, repeat: str, start: datetime, end: datetime):
+    """
+    Лениво отдаёт повторения в [start, end). Ничего не материализует.
+    """
+    if repeat not in STEPS:
+        if start <= starts_at < end:
+            yield starts_at
+        return
+
+    n = _first_index_after(starts_at, repeat, start - timedelta(microseconds=1))
+    occurrence = nth_occurrence(starts_at, repeat, n)
+    while occurrence < end:
+        yield occurrence
+        n += 1
+        occurrence = nth_occurrence(starts_at, repeat, n)
+
+
+def _event_occurrences(event, start: datetime, end: datetime):
+    for occurrence in occurrences_between(event.starts_at, event.repeat, start, end):
+        yield occurrence, event.id, event
+
+
+def expand_events(events, start: datetime, end: datetime):
+    """
+    Повторения всех событий в [start, end), по времени.
+    Отдаёт лёгкие копии события с подменённым starts_at (в БД ничего не пишем).
+    """
+    streams = [_event_occurrences(ev, start, end) for ev in events]
+    for occurrence, _, event in heapq.merge(*streams):
+        item = copy.copy(event)
+        item.starts_at = occurrence
+        yield item
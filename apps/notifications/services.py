@@ -1,11 +1,114 @@
+import asyncio
+
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 from .models import Notification, DeviceToken
 from .firebase import send_push
+from . import presence, ratelimit, ws_stream
+from .executor import map_push, run_push, run_sync
+
+# -------------------------
+# Delivery: куда слать уведомление
+# -------------------------
+DELIVERY_AUTO = "auto"  # живой сокет -> только WS, иначе WS + push
+DELIVERY_WS = "ws"
+DELIVERY_PUSH = "push"
+DELIVERY_BOTH = "both"
+
+# Напоминания календаря должны "звенеть" системно даже при открытом приложении
+DELIVERY_BY_TYPE = {
+    Notification.Type.CALENDAR: DELIVERY_BOTH,
+    Notification.Type.SYSTEM: DELIVERY_AUTO,
+}
+
+
+def resolve_delivery(user_id: int, type_: str, delivery: str | None = None) -> tuple[bool, bool]:
+    """
+    -> (send_ws, send_push)
+    """
+    delivery = delivery or DELIVERY_BY_TYPE.get(type_, DELIVERY_AUTO)
+
+    if delivery == DELIVERY_WS:
+        return True, False
+    if delivery == DELIVERY_PUSH:
+        return False, True
+    if delivery == DELIVERY_BOTH:
+        return True, True
+
+    try:
+        online = presence.is_online(user_id)
+    except Exception:
+        online = False
+    return True, not online
+
+
+def push_is_rate_limited(type_: str, delivery: str | None = None) -> bool:
+    """
+    Лимит push только для "фоновых" уведомлений. Напоминания (both) юзер
+    поставил сам — их не глушим, и в общий bucket они не списываются.
+    """
+    return (delivery or DELIVERY_BY_TYPE.get(type_, DELIVERY_AUTO)) != DELIVERY_BOTH
+
+
+def ws_payload(n: Notification) -> dict:
+    return {
+        "id": n.id,
+        "type": n.type,
+        "title": n.title,
+        "body": n.body,
+        "payload": n.payload,
+        "created_at": n.created_at.isoformat(),
+    }
+
+
+def push_data(n: Notification) -> dict:
+    return {"notification_id": n.id, **n.payload}
+
+
+def _notification_fields(user_id: int, type_: str, title: str, body: str, payload: dict, collapse_key: str | None) -> dict:
+    if collapse_key:
+        payload = {**payload, "collapse_key": collapse_key, "count": 1}
+    return {"user_id": user_id, "type": type_, "title": title, "body": body, "payload": payload}
+
+
+def _apply_collapse(n: Notification, title: str, body: str, payload: dict, collapse_key: str) -> list[str]:
+    """
+    Текст последнего события, count += 1. -> update_fields.
+    """
+    n.title = title
+    n.body = body
+    n.payload = {**payload, "collapse_key": collapse_key, "count": int(n.payload.get("count", 1)) + 1}
+    n.is_read = False
+    return ["title", "body", "payload", "is_read"]
 
 
+def _remember_collapsed(user_id: int, collapse_key: str, notification_id: int) -> None:
+    try:
+        ratelimit.remember_collapsed_id(user_id, collapse_key, notification_id)
+    except Exception:
+        pass
+
+
+def _push_allowed(user_id: int, type_: str, delivery: str | None) -> bool:
+    if not push_is_rate_limited(type_, delivery):
+        return True
+    try:
+        return ratelimit.take_push_token(user_id)
+    except Exception:
+        return True
+
+
+# -------------------------
+# Sync API (views, celery)
+# -------------------------
 def broadcast_ws(user_id: int, payload: dict):
+    # сначала в стрим — id нужен клиенту как last_id для переподключения
+    try:
+        payload = {**payload, "stream_id": ws_stream.append(user_id, payload)}
+    except Exception:
+        pass
+
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
         f"notifications_user_{user_id}",
@@ -13,36 +116,155 @@ def broadcast_ws(user_id: int, payload: dict):
     )
 
 
-def create_and_send_notification(*, user, title: str, body: str, type_: str = "SYSTEM", payload: dict | None = None):
+def _send_push_safe(token: str, title: str, body: str, data: dict, collapse_key: str | None = None):
+    try:
+        ok, _ = send_push(token, title=title, body=body, data=data, collapse_key=collapse_key)
+        return ok
+    except Exception:
+        return False
+
+
+def _collapse_into(user_id: int, collapse_key: str, title: str, body: str, payload: dict):
+    """
+    Если в окне уже есть уведомление с тем же collapse_key — обновляем его
+    вместо новой строки. None — схлопывать некуда.
+    """
+    try:
+        existing_id = ratelimit.get_collapsed_id(user_id, collapse_key)
+    except Exception:
+        return None
+    if not existing_id:
+        return None
+
+    n = Notification.objects.filter(id=existing_id, user_id=user_id).first()
+    if not n:
+        return None
+
+    n.save(update_fields=_apply_collapse(n, title, body, payload, collapse_key))
+    return n
+
+
+def create_and_send_notification(
+    *,
+    user,
+    title: str,
+    body: str,
+    type_: str = "SYSTEM",
+    payload: dict | None = None,
+    delivery: str | None = None,
+    collapse_key: str | None = None,
+):
+    """
+    collapse_key: однотипные события в окне NOTIFICATIONS_COLLAPSE_WINDOW
+    схлопываются в одно уведомление, а на устройстве заменяют предыдущий push.
+    Из async-кода — acreate_and_send_notification.
+    """
     payload = payload or {}
+    send_ws, send_fcm = resolve_delivery(user.id, type_, delivery)
 
-    n = Notification.objects.create(
-        user=user,
-        type=type_,
-        title=title,
-        body=body,
-        payload=payload,
-    )
+    n = _collapse_into(user.id, collapse_key, title, body, payload) if collapse_key else None
+    if n is None:
+        n = Notification.objects.create(**_notification_fields(user.id, type_, title, body, payload, collapse_key))
+        if collapse_key:
+            _remember_collapsed(user.id, collapse_key, n.id)
+
+    if send_ws:
+        try:
+            broadcast_ws(user.id, ws_payload(n))
+        except Exception:
+            pass
 
+    if not send_fcm or not _push_allowed(user.id, type_, delivery):
+        return n
+
+    tokens = DeviceToken.objects.filter(user_id=user.id, is_active=True).values_list("token", flat=True)
+    data = push_data(n)
+    map_push(lambda token: _send_push_safe(token, title, body, data, collapse_key), tokens)
+
+    return n
+
+
+# -------------------------
+# Async API (консьюмеры, async views): без async_to_sync и лишних прыжков между потоками
+# -------------------------
+async def abroadcast_ws(user_id: int, payload: dict):
     try:
-        broadcast_ws(user.id, {
-            "id": n.id,
-            "type": n.type,
-            "title": n.title,
-            "body": n.body,
-            "payload": n.payload,
-            "created_at": n.created_at.isoformat(),
-        })
+        payload = {**payload, "stream_id": await run_sync(ws_stream.append, user_id, payload)}
     except Exception:
         pass
 
-    tokens = DeviceToken.objects.filter(user=user, is_active=True).values_list("token", flat=True)
-    for token in tokens:
+    channel_layer = get_channel_layer()
+    await channel_layer.group_send(
+        f"notifications_user_{user_id}",
+        {"type": "notify", "payload": payload},
+    )
+
+
+async def _asend_push_safe(token: str, title: str, body: str, data: dict, collapse_key: str | None = None):
+    try:
+        ok, _ = await run_push(send_push, token, title=title, body=body, data=data, collapse_key=collapse_key)
+        return ok
+    except Exception:
+        return False
+
+
+async def _acollapse_into(user_id: int, collapse_key: str, title: str, body: str, payload: dict):
+    """
+    Async-версия _collapse_into.
+    """
+    try:
+        existing_id = await run_sync(ratelimit.get_collapsed_id, user_id, collapse_key)
+    except Exception:
+        return None
+    if not existing_id:
+        return None
+
+    n = await Notification.objects.filter(id=existing_id, user_id=user_id).afirst()
+    if not n:
+        return None
+
+    await n.asave(update_fields=_apply_collapse(n, title, body, payload, collapse_key))
+    return n
+
+
+async def acreate_and_send_notification(
+    *,
+    user,
+    title: str,
+    body: str,
+    type_: str = "SYSTEM",
+    payload: dict | None = None,
+    delivery: str | None = None,
+    collapse_key: str | None = None,
+):
+    """
+    Async-версия create_and_send_notification (консьюмеры, async views).
+    """
+    payload = payload or {}
+    send_ws, send_fcm = await run_sync(resolve_delivery, user.id, type_, delivery)
+
+    n = None
+    if collapse_key:
+        n = await _acollapse_into(user.id, collapse_key, title, body, payload)
+
+    if n is None:
+        n = await Notification.objects.acreate(**_notification_fields(user.id, type_, title, body, payload, collapse_key))
+        if collapse_key:
+            await run_sync(_remember_collapsed, user.id, collapse_key, n.id)
+
+    if send_ws:
         try:
-            ok, _ = send_push(token, title=title, body=body, data={"notification_id": n.id, **payload})
-            if not ok:
-                break
+            await abroadcast_ws(user.id, ws_payload(n))
         except Exception:
             pass
 
+    if not send_fcm or not await run_sync(_push_allowed, user.id, type_, delivery):
+        return n
+
+    tokens = [
+        t async for t in DeviceToken.objects.filter(user_id=user.id, is_active=True).values_list("token", flat=True)
+    ]
+    data = push_data(n)
+    await asyncio.gather(*(_asend_push_safe(token, title, body, data, collapse_key) for token in tokens))
+
     return n
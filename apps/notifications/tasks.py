@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.notifications.broadcast import send_broadcast
+from apps.notifications.models import Broadcast, CalendarEvent, Notification
+from apps.notifications.services import create_and_send_notification
+
+REMINDER_BATCH_SIZE = getattr(settings, "CALENDAR_REMINDER_BATCH_SIZE", 500)
+REMINDER_MAX_BATCHES = getattr(settings, "CALENDAR_REMINDER_MAX_BATCHES", 20)
+# если воркер лежал и событие давно началось — напоминание уже не нужно
+REMINDER_GRACE = timedelta(minutes=getattr(settings, "CALENDAR_REMINDER_GRACE_MINUTES", 30))
+
+
+def _claim_due_reminders(now, batch_size: int) -> list[tuple[CalendarEvent, object]]:
+    """
+    Забирает пачку созревших напоминаний и сразу переносит их next_fire_at
+    на следующее повторение. Отправка — уже после коммита, вне блокировок.
+    """
+    with transaction.atomic():
+        events = list(
+            CalendarEvent.objects
+            # of=("self",): строки users_user из JOIN не блокируем — иначе воркер
+            # держит юзеров до коммита, а skip_locked пропускает их события в других воркерах
+            .select_for_update(skip_locked=True, of=("self",))
+            .filter(next_fire_at__lte=now)
+            .select_related("user")
+            .order_by("next_fire_at")[:batch_size]
+        )
+
+        claimed = []
+        for ev in events:
+            occurrence = ev.next_fire_at + timedelta(minutes=ev.reminder_minutes or 0)
+            claimed.append((ev, occurrence))
+            ev.next_fire_at = ev.compute_next_fire_at(after=max(now, ev.next_fire_at))
+
+        CalendarEvent.objects.bulk_update(events, ["next_fire_at"])
+
+    return claimed
+
+
+@shared_task
+def fire_due_reminders():
+    """
+    Beat раз в несколько секунд: берёт только созревшие строки по индексу next_fire_at.
+    """
+    now = timezone.now()
+    sent = 0
+
+    for _ in range(REMINDER_MAX_BATCHES):
+        claimed = _claim_due_reminders(now, REMINDER_BATCH_SIZE)
+
+        for ev, occurrence in claimed:
+            if occurrence < now - REMINDER_GRACE:
+                continue
+            try:
+                create_and_send_notification(
+                    user=ev.user,
+                    title="Напоминание",
+                    body=ev.title,
+                    type_=Notification.Type.CALENDAR,
+                    payload={"event_id": ev.id, "starts_at": occurrence.isoformat()},
+                )
+                sent += 1
+            except Exception:
+                pass
+
+        if len(claimed) < REMINDER_BATCH_SIZE:
+            break
+
+    return sent
+
+
+@shared_task
+def send_broadcast_task(broadcast_id: int):
+    broadcast = Broadcast.objects.filter(pk=broadcast_id).first()
+    if not broadcast or broadcast.status in (Broadcast.Status.RUNNING, Broadcast.Status.DONE):
+        return 0
+
+    return send_broadcast(broadcast).sent_count
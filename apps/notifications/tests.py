@@ -1,3 +1,569 @@
-from django.test import TestCase
+import io
+import json
+from datetime import datetime, timedelta
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.notifications import presence, ratelimit, ws_stream
+from apps.notifications.broadcast import send_broadcast
+from apps.notifications.models import Broadcast, CalendarEvent, DeviceToken, Notification
+from apps.notifications.recurrence import next_occurrence_after
+from apps.notifications.consumers import NotificationsConsumer
+from apps.notifications.fake_fcm import QUOTA_EXCEEDED, UNREGISTERED, FakeFCMTransport
+from apps.notifications.firebase import get_transport, send_multicast, send_push, set_transport
+from apps.notifications.ics import _fold
+from apps.notifications.services import (
+    acreate_and_send_notification,
+    create_and_send_notification,
+    resolve_delivery,
+)
+from apps.notifications.tasks import fire_due_reminders
+from apps.notifications.ws_auth import JwtAuthMiddleware, WsTokenUser
+from apps.users.active_cache import set_user_active
+from core.testing import FakeRedisMixin
+
+BISHKEK = ZoneInfo("Asia/Bishkek")
+
+
+def local(*args) -> datetime:
+    return datetime(*args, tzinfo=BISHKEK)
+
+
+# -------------------------
+# WS: стрим и replay
+# -------------------------
+
+class WsStreamTests(FakeRedisMixin, SimpleTestCase):
+    def test_read_since_returns_only_newer_messages(self):
+        first = ws_stream.append(1, {"id": 1})
+        second = ws_stream.append(1, {"id": 2})
+        ws_stream.append(2, {"id": 3})
+
+        payloads, complete = ws_stream.read_since(1, first)
+        self.assertTrue(complete)
+        self.assertEqual(payloads, [{"id": 2, "stream_id": second}])
+
+    def test_missing_stream_asks_for_resync(self):
+        self.assertEqual(ws_stream.read_since(1, "1-0"), ([], False))
+
+    def test_is_newer(self):
+        self.assertTrue(ws_stream.is_newer("5-1", "5-0"))
+        self.assertFalse(ws_stream.is_newer("5-0", "5-0"))
+        self.assertTrue(ws_stream.is_newer(None, "5-0"))
+
+
+class ReplayConsumerTests(FakeRedisMixin, SimpleTestCase):
+    user_id = 7
+
+    def communicator(self, query: str) -> WebsocketCommunicator:
+        communicator = WebsocketCommunicator(NotificationsConsumer.as_asgi(), f"/ws/notifications/?{query}")
+        communicator.scope["user"] = get_user_model()(id=self.user_id, email="ws@example.com")
+        return communicator
+
+    async def test_replays_missed_messages_once(self):
+        first = ws_stream.append(self.user_id, {"id": 1})
+        second = ws_stream.append(self.user_id, {"id": 2})
+
+        communicator = self.communicator(f"last_id={first}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(json.loads(await communicator.receive_from()), {"id": 2, "stream_id": second})
+
+        # то же сообщение пришло через group_send уже после replay — не дублируем
+        group = f"notifications_user_{self.user_id}"
+        await get_channel_layer().group_send(group, {"type": "notify", "payload": {"id": 2, "stream_id": second}})
+        self.assertTrue(await communicator.receive_nothing())
+
+        third = ws_stream.append(self.user_id, {"id": 3})
+        await get_channel_layer().group_send(group, {"type": "notify", "payload": {"id": 3, "stream_id": third}})
+        self.assertEqual(json.loads(await communicator.receive_from())["id"], 3)
+        await communicator.disconnect()
+
+    async def test_gap_larger_than_stream_sends_resync(self):
+        communicator = self.communicator("last_id=1-0")
+        await communicator.connect()
+        self.assertEqual(json.loads(await communicator.receive_from())["event"], "resync")
+        await communicator.disconnect()
+
+
+# -------------------------
+# WS: аутентификация по claims
+# -------------------------
+
+class JwtAuthMiddlewareTests(FakeRedisMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        # юзер должен браться из claims и кэша is_active — в БД не ходим
+        self.enterContext(mock.patch("apps.users.active_cache.get_user_model", side_effect=AssertionError("DB")))
+
+    def token(self, user_id: int) -> str:
+        token = AccessToken()
+        token["user_id"] = str(user_id)
+        return str(token)
+
+    async def scope_user(self, query: str):
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen["user"] = scope["user"]
+
+        await JwtAuthMiddleware(app)({"type": "websocket", "query_string": query.encode()}, None, None)
+        return seen["user"]
+
+    async def test_active_user_from_claims(self):
+        set_user_active(42, True)
+        user = await self.scope_user(f"token={self.token(42)}")
+        self.assertIsInstance(user, WsTokenUser)
+        self.assertEqual((user.id, user.pk), (42, 42))
+
+    async def test_inactive_user_is_anonymous(self):
+        set_user_active(42, False)
+        self.assertTrue((await self.scope_user(f"token={self.token(42)}")).is_anonymous)
+
+    async def test_bad_token_is_anonymous(self):
+        self.assertTrue((await self.scope_user("token=garbage")).is_anonymous)
+        self.assertTrue((await self.scope_user("")).is_anonymous)
+
+
+# -------------------------
+# Presence и выбор канала доставки
+# -------------------------
+
+class PresenceDeliveryTests(FakeRedisMixin, SimpleTestCase):
+    def test_auto_skips_push_while_socket_is_alive(self):
+        system = Notification.Type.SYSTEM
+        self.assertEqual(resolve_delivery(1, system), (True, True))
+
+        presence.touch(1, "chan-a")
+        presence.touch(1, "chan-b")
+        self.assertEqual(resolve_delivery(1, system), (True, False))
+        self.assertEqual(resolve_delivery(2, system), (True, True))
+
+        presence.leave(1, "chan-a")
+        self.assertEqual(resolve_delivery(1, system), (True, False))
+        presence.leave(1, "chan-b")
+        self.assertEqual(resolve_delivery(1, system), (True, True))
+
+    def test_expired_socket_is_offline(self):
+        self.redis.zadd(presence.presence_key(1), {"dead": 1})
+        self.assertFalse(presence.is_online(1))
+
+    def test_calendar_always_pushes(self):
+        presence.touch(1, "chan-a")
+        self.assertEqual(resolve_delivery(1, Notification.Type.CALENDAR), (True, True))
+
+
+# -------------------------
+# Напоминания календаря
+# -------------------------
+
+class NextOccurrenceAfterTests(SimpleTestCase):
+    def test_future_start_is_returned_as_is(self):
+        starts_at = local(2026, 5, 10, 9, 0)
+        self.assertEqual(next_occurrence_after(starts_at, "DAILY", local(2026, 5, 1)), starts_at)
+
+    def test_non_repeating_event_in_the_past_has_no_next(self):
+        self.assertIsNone(next_occurrence_after(local(2026, 5, 1, 9, 0), "NONE", local(2026, 5, 2)))
+
+    def test_daily_is_strictly_after_moment(self):
+        starts_at = local(2026, 5, 1, 9, 0)
+        self.assertEqual(next_occurrence_after(starts_at, "DAILY", local(2026, 5, 3, 9, 0)), local(2026, 5, 4, 9, 0))
+        self.assertEqual(next_occurrence_after(starts_at, "DAILY", local(2026, 5, 3, 8, 59)), local(2026, 5, 3, 9, 0))
+
+    def test_weekly(self):
+        starts_at = local(2026, 5, 1, 18, 30)
+        self.assertEqual(next_occurrence_after(starts_at, "WEEKLY", local(2026, 5, 9)), local(2026, 5, 15, 18, 30))
+
+    def test_monthly_keeps_day_of_month_after_short_month(self):
+        starts_at = local(2026, 1, 31, 10, 0)
+        self.assertEqual(next_occurrence_after(starts_at, "MONTHLY", local(2026, 2, 1)), local(2026, 2, 28, 10, 0))
+        # считаем от исходной даты: после февраля снова 31-е, а не 28-е
+        self.assertEqual(next_occurrence_after(starts_at, "MONTHLY", local(2026, 3, 1)), local(2026, 3, 31, 10, 0))
+
+    def test_far_moment_does_not_drift(self):
+        starts_at = local(2020, 1, 1, 7, 0)
+        result = next_occurrence_after(starts_at, "DAILY", local(2026, 6, 15, 12, 0))
+        self.assertEqual(timezone.localtime(result, BISHKEK), local(2026, 6, 16, 7, 0))
+
+
+class FireDueRemindersTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="remind@example.com", password="pass12345")
+        self.send = self.enterContext(mock.patch("apps.notifications.tasks.create_and_send_notification"))
+
+    def fire_at(self, now: datetime) -> int:
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            return fire_due_reminders()
+
+    def test_fires_once_and_moves_to_next_occurrence(self):
+        with mock.patch("django.utils.timezone.now", return_value=local(2026, 5, 1, 11, 0)):
+            ev = CalendarEvent.objects.create(
+                user=self.user, title="Обед", starts_at=local(2026, 5, 1, 13, 0),
+                repeat=CalendarEvent.Repeat.DAILY, reminder_minutes=60,
+            )
+        self.assertEqual(ev.next_fire_at, local(2026, 5, 1, 12, 0))
+
+        self.assertEqual(self.fire_at(local(2026, 5, 1, 12, 0, 5)), 1)
+        payload = self.send.call_args.kwargs["payload"]
+        self.assertEqual(payload["event_id"], ev.id)
+        self.assertEqual(datetime.fromisoformat(payload["starts_at"]), local(2026, 5, 1, 13, 0))
+
+        ev.refresh_from_db()
+        self.assertEqual(ev.next_fire_at, local(2026, 5, 2, 12, 0))
+        self.assertEqual(self.fire_at(local(2026, 5, 1, 12, 0, 10)), 0)
+        self.assertEqual(self.send.call_count, 1)
+
+    def test_stale_reminder_is_skipped_but_rescheduled(self):
+        with mock.patch("django.utils.timezone.now", return_value=local(2026, 5, 1, 8, 0)):
+            ev = CalendarEvent.objects.create(
+                user=self.user, title="Зарядка", starts_at=local(2026, 5, 1, 9, 0),
+                repeat=CalendarEvent.Repeat.DAILY, reminder_minutes=10,
+            )
+
+        # воркер лежал до вечера: утреннее напоминание уже не шлём
+        self.assertEqual(self.fire_at(local(2026, 5, 1, 20, 0)), 0)
+        self.send.assert_not_called()
+        ev.refresh_from_db()
+        self.assertEqual(ev.next_fire_at, local(2026, 5, 2, 8, 50))
+
+    def test_schedule_change_recomputes_next_fire_at(self):
+        with mock.patch("django.utils.timezone.now", return_value=local(2026, 5, 1, 8, 0)):
+            ev = CalendarEvent.objects.create(user=self.user, title="Встреча", starts_at=local(2026, 5, 1, 9, 0))
+            self.assertIsNone(ev.next_fire_at)
+
+            ev.reminder_minutes = 15
+            ev.save(update_fields=["reminder_minutes"])
+        ev.refresh_from_db()
+        self.assertEqual(ev.next_fire_at, local(2026, 5, 1, 8, 45))
+
+
+class EventWindowApiTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="window@example.com", password="pass12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        CalendarEvent.objects.create(user=self.user, title="Зарядка", starts_at=local(2026, 4, 20, 7, 0), repeat="DAILY")
+        CalendarEvent.objects.create(user=self.user, title="Отчёт", starts_at=local(2026, 5, 2, 12, 0))
+        CalendarEvent.objects.create(user=self.user, title="Старое", starts_at=local(2026, 4, 1, 12, 0))
+
+    def events(self, query: str) -> dict:
+        r = self.client.get(f"/api/v1/notifications/events/?{query}")
+        self.assertEqual(r.status_code, 200)
+        return r.json()
+
+    def test_window_expands_occurrences_in_time_order(self):
+        data = self.events("from=2026-05-01&to=2026-05-03")
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(
+            [(item["title"], datetime.fromisoformat(item["starts_at"])) for item in data["results"]],
+            [
+                ("Зарядка", local(2026, 5, 1, 7, 0)),
+                ("Зарядка", local(2026, 5, 2, 7, 0)),
+                ("Отчёт", local(2026, 5, 2, 12, 0)),
+                ("Зарядка", local(2026, 5, 3, 7, 0)),
+            ],
+        )
+
+    def test_pagination_slices_occurrences(self):
+        data = self.events("from=2026-05-01&to=2026-05-31&limit=5&offset=29")
+        self.assertEqual(data["count"], 32)
+        self.assertEqual(
+            [datetime.fromisoformat(item["starts_at"]) for item in data["results"]],
+            [local(2026, 5, 29, 7, 0), local(2026, 5, 30, 7, 0), local(2026, 5, 31, 7, 0)],
+        )
+
+    def test_window_is_capped(self):
+        r = self.client.get("/api/v1/notifications/events/?from=2026-01-01&to=2027-06-01")
+        self.assertEqual(r.status_code, 400)
+
+
+# -------------------------
+# iCalendar фид
+# -------------------------
+
+class FoldTests(SimpleTestCase):
+    def test_short_line_is_not_folded(self):
+        self.assertEqual(_fold("SUMMARY:Обед"), "SUMMARY:Обед\r\n")
+
+    def test_long_line_is_folded_at_75_octets(self):
+        folded = _fold("DESCRIPTION:" + "x" * 200)
+        lines = folded[:-2].split("\r\n")
+        self.assertTrue(folded.endswith("\r\n"))
+        self.assertEqual(len(lines[0].encode()), 75)
+        for line in lines[1:]:
+            self.assertTrue(line.startswith(" "))
+            self.assertLessEqual(len(line.encode()), 75)
+        self.assertEqual("".join([lines[0]] + [line[1:] for line in lines[1:]]), "DESCRIPTION:" + "x" * 200)
+
+    def test_multibyte_characters_are_not_split(self):
+        text = "SUMMARY:" + "ж" * 100
+        lines = _fold(text)[:-2].split("\r\n")
+        for line in lines:
+            self.assertLessEqual(len(line.encode()), 75)
+            line.encode().decode()  # не падает: символ не разрезан
+        self.assertEqual("".join([lines[0]] + [line[1:] for line in lines[1:]]), text)
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="feed@example.com", password="pass12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def feed_path(self, response) -> str:
+        return response.json()["url"].replace("http://testserver", "")
+
+    def test_link_is_stable_until_regenerated(self):
+        path = self.feed_path(self.client.get("/api/v1/notifications/events/feed/"))
+        self.assertEqual(path, self.feed_path(self.client.get("/api/v1/notifications/events/feed/")))
+        self.assertEqual(APIClient().get(path).status_code, 200)
+
+        new_path = self.feed_path(self.client.post("/api/v1/notifications/events/feed/"))
+        self.assertNotEqual(new_path, path)
+        self.assertEqual(APIClient().get(path).status_code, 404)
+        self.assertEqual(APIClient().get(new_path).status_code, 200)
+
+    def test_inactive_or_deleted_user_gets_404(self):
+        path = self.feed_path(self.client.get("/api/v1/notifications/events/feed/"))
+
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(APIClient().get(path).status_code, 404)
+
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=True, deleted_at=timezone.now())
+        self.assertEqual(APIClient().get(path).status_code, 404)
+
+    def test_etag_changes_with_events(self):
+        path = self.feed_path(self.client.get("/api/v1/notifications/events/feed/"))
+        event = CalendarEvent.objects.create(user=self.user, title="Обед", starts_at=local(2026, 5, 1, 13, 0))
+
+        etag = APIClient().get(path)["ETag"]
+        with self.assertNumQueries(1):
+            r = APIClient().get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        event.delete()
+        r = APIClient().get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+
+    def test_event_uses_local_time_with_tzid(self):
+        path = self.feed_path(self.client.get("/api/v1/notifications/events/feed/"))
+        CalendarEvent.objects.create(
+            user=self.user, title="Зарядка", starts_at=local(2026, 5, 1, 7, 0), repeat="DAILY", reminder_minutes=10,
+        )
+
+        body = b"".join(APIClient().get(path).streaming_content).decode()
+        self.assertIn("X-WR-TIMEZONE:Asia/Bishkek\r\n", body)
+        self.assertIn("BEGIN:VTIMEZONE\r\nTZID:Asia/Bishkek\r\n", body)
+        self.assertIn("DTSTART;TZID=Asia/Bishkek:20260501T070000\r\n", body)
+        self.assertIn("RRULE:FREQ=DAILY\r\n", body)
+        self.assertIn("TRIGGER:-PT10M\r\n", body)
+
+
+# -------------------------
+# Создание и отправка: sync и async пути
+# -------------------------
+
+class CreateAndSendTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(email="send@example.com", password="pass12345")
+        DeviceToken.objects.create(user=self.user, token="tok-a")
+        DeviceToken.objects.create(user=self.user, token="tok-b")
+        DeviceToken.objects.create(user=self.user, token="tok-off", is_active=False)
+        self.send_push = self.enterContext(
+            mock.patch("apps.notifications.services.send_push", return_value=(True, None))
+        )
+
+    def pushed_tokens(self) -> list[str]:
+        return sorted(c.args[0] for c in self.send_push.call_args_list)
+
+    def test_sync_pushes_to_active_devices(self):
+        n = create_and_send_notification(user=self.user, title="Привет", body="Тест", delivery="push")
+        self.assertEqual(self.pushed_tokens(), ["tok-a", "tok-b"])
+        self.assertEqual(self.send_push.call_args.kwargs["data"], {"notification_id": n.id})
+
+    def test_async_pushes_to_active_devices(self):
+        n = async_to_sync(acreate_and_send_notification)(user=self.user, title="Привет", body="Тест", delivery="push")
+        self.assertEqual(self.pushed_tokens(), ["tok-a", "tok-b"])
+        self.assertEqual(self.send_push.call_args.kwargs["data"], {"notification_id": n.id})
+
+    def test_sync_and_async_collapse_into_one_row(self):
+        first = create_and_send_notification(
+            user=self.user, title="Бюджет", body="Потрачено 80%", delivery="ws", collapse_key="budget",
+        )
+        second = async_to_sync(acreate_and_send_notification)(
+            user=self.user, title="Бюджет", body="Потрачено 90%", delivery="ws", collapse_key="budget",
+        )
+
+        self.assertEqual(first.id, second.id)
+        n = Notification.objects.get(user=self.user)
+        self.assertEqual((n.body, n.payload["count"], n.payload["collapse_key"]), ("Потрачено 90%", 2, "budget"))
+        self.send_push.assert_not_called()
+
+
+# -------------------------
+# Массовая рассылка
+# -------------------------
+
+class SendBroadcastTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.users = [User.objects.create_user(email=f"b{i}@example.com", password="pass12345") for i in range(5)]
+        User.objects.filter(pk=self.users[4].pk).update(is_active=False)
+        self.broadcast = Broadcast.objects.create(title="Новости", body="Обновление")
+
+    def test_resume_after_crash_has_no_duplicates(self):
+        crash = mock.patch("apps.notifications.broadcast._send_ws_chunk", side_effect=[None, RuntimeError("ws")])
+        with crash, self.assertRaises(RuntimeError):
+            send_broadcast(self.broadcast, chunk_size=2)
+
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, Broadcast.Status.FAILED)
+        self.assertEqual(self.broadcast.last_user_id, self.users[3].pk)
+
+        # курсор уже за последним активным юзером — повтор ничего не дублирует
+        send_broadcast(self.broadcast, chunk_size=2)
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, Broadcast.Status.DONE)
+        self.assertEqual(self.broadcast.sent_count, 4)
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user_id", flat=True)),
+            [u.pk for u in self.users[:4]],
+        )
+
+    def test_resume_continues_from_cursor(self):
+        Broadcast.objects.filter(pk=self.broadcast.pk).update(last_user_id=self.users[1].pk, sent_count=2)
+        self.broadcast.refresh_from_db()
+
+        progress = mock.Mock()
+        send_broadcast(self.broadcast, chunk_size=1, progress=progress)
+        self.assertEqual(self.broadcast.sent_count, 4)
+        self.assertEqual([c.args[0] for c in progress.call_args_list], [3, 4])
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user_id", flat=True)),
+            [self.users[2].pk, self.users[3].pk],
+        )
+
+    def test_dead_tokens_are_deactivated(self):
+        DeviceToken.objects.create(user=self.users[0], token="alive")
+        DeviceToken.objects.create(user=self.users[1], token="dead")
+
+        with mock.patch("apps.notifications.broadcast.send_multicast", return_value=(1, ["dead"])) as multicast:
+            send_broadcast(self.broadcast)
+
+        self.assertEqual(sorted(multicast.call_args.args[0]), ["alive", "dead"])
+        self.assertEqual(self.broadcast.push_count, 1)
+        self.assertFalse(DeviceToken.objects.get(token="dead").is_active)
+
+
+# -------------------------
+# Лимит push и схлопывание
+# -------------------------
+
+class PushBucketTests(FakeRedisMixin, SimpleTestCase):
+    def take(self, now: float) -> bool:
+        with mock.patch.object(ratelimit.time, "time", return_value=now):
+            return ratelimit.take_push_token(1, capacity=3, refill_per_min=2)
+
+    def test_capacity_then_refill(self):
+        now = 1_700_000_000.0
+        self.assertEqual([self.take(now) for _ in range(3)], [True] * 3)
+        self.assertFalse(self.take(now))
+
+        # за 60 / refill_per_min секунд доливается ровно один токен
+        self.assertTrue(self.take(now + 30))
+        self.assertFalse(self.take(now + 30))
+
+    def test_collapse_window_keeps_first_id(self):
+        self.assertIsNone(ratelimit.get_collapsed_id(1, "budget"))
+        ratelimit.remember_collapsed_id(1, "budget", 10)
+        ratelimit.remember_collapsed_id(1, "budget", 11)
+        self.assertEqual(ratelimit.get_collapsed_id(1, "budget"), 10)
+        self.assertIsNone(ratelimit.get_collapsed_id(2, "budget"))
+
+
+class PushLimitTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(email="limit@example.com", password="pass12345")
+        DeviceToken.objects.create(user=self.user, token="tok")
+        self.send_push = self.enterContext(
+            mock.patch("apps.notifications.services.send_push", return_value=(True, None))
+        )
+        self.enterContext(mock.patch.object(ratelimit, "PUSH_BUCKET_CAPACITY", 2))
+
+    def notify(self, type_=Notification.Type.SYSTEM, **kwargs):
+        return create_and_send_notification(user=self.user, title="t", body="b", type_=type_, **kwargs)
+
+    def test_background_pushes_are_limited_but_saved(self):
+        for _ in range(4):
+            self.notify()
+        self.assertEqual(self.send_push.call_count, 2)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 4)
+
+    def test_reminders_bypass_the_bucket(self):
+        for _ in range(4):
+            self.notify(type_=Notification.Type.CALENDAR)
+        self.assertEqual(self.send_push.call_count, 4)
+
+    def test_collapsed_push_replaces_previous_on_device(self):
+        self.notify(collapse_key="budget")
+        self.notify(collapse_key="budget")
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+        self.assertEqual({c.kwargs["collapse_key"] for c in self.send_push.call_args_list}, {"budget"})
+
+
+# -------------------------
+# Заглушка FCM и бенчмарк
+# -------------------------
+
+class FakeFCMTransportTests(SimpleTestCase):
+    def test_outcomes_and_stats(self):
+        transport = FakeFCMTransport(latency_ms=0, unregistered_rate=0.5, quota_rate=0.5, seed=1)
+        results = [transport.send(f"tok-{i}", title="t", body="b") for i in range(20)]
+
+        self.assertTrue(all(not ok for ok, _ in results))
+        self.assertEqual({error for _, error in results}, {UNREGISTERED, QUOTA_EXCEEDED})
+        self.assertEqual(transport.stats["requests"], 20)
+        self.assertEqual(transport.stats[UNREGISTERED] + transport.stats[QUOTA_EXCEEDED], 20)
+
+    def test_multicast_reports_dead_tokens(self):
+        transport = FakeFCMTransport(latency_ms=0, unregistered_rate=1.0, quota_rate=0.0)
+        self.assertEqual(transport.send_multicast(["a", "b"], title="t", body="b"), (0, ["a", "b"]))
+        self.assertEqual(transport.stats["requests"], 1)
+
+    def test_set_transport_swaps_and_restores(self):
+        transport = FakeFCMTransport(latency_ms=0)
+        previous = set_transport(transport)
+        try:
+            self.assertIs(get_transport(), transport)
+            self.assertTrue(send_push("tok", title="t", body="b")[0])
+            self.assertEqual(send_multicast(["a", "b"], title="t", body="b"), (2, []))
+        finally:
+            set_transport(previous)
+        self.assertIs(get_transport(), previous)
+        self.assertEqual(transport.stats["sent"], 3)
+
+
+class BenchNotificationsTests(FakeRedisMixin, TestCase):
+    def test_runs_against_fake_fcm_and_cleans_up(self):
+        out = io.StringIO()
+        call_command("bench_notifications", devices="1,3", count=2, latency_ms=0, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("'sent': 6", lines[1])
+        self.assertFalse(get_user_model().objects.filter(email__startswith="bench_").exists())
@@ -6,12 +6,16 @@ from .views import (
     NotificationReadView,
     NotificationReadAllView,
     DeviceTokenUpsertView,
-    TestNotifyView
+    TestNotifyView,
+    CalendarFeedLinkView,
+    CalendarFeedView,
 )
 
 urlpatterns = [
     path("events/", EventListCreateView.as_view()),
     path("events/<int:pk>/", EventDetailView.as_view()),
+    path("events/feed/", CalendarFeedLinkView.as_view()),
+    path("events/feed/<str:token>.ics", CalendarFeedView.as_view()),
 
     path("notifications/", NotificationListView.as_view()),
     path("notifications/<int:pk>/read/", NotificationReadView.as_view()),
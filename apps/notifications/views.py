@@ -1,19 +1,94 @@
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import parse_etags
 from django.utils.dateparse import parse_date
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from apps.notifications.models import CalendarEvent, Notification, DeviceToken
 from apps.notifications.serializers import CalendarEventSerializer, NotificationSerializer, DeviceTokenSerializer, NotificationSerializer
 from apps.notifications.services import create_and_send_notification
+from apps.notifications.recurrence import expand_events
+from apps.notifications import ics
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes, OpenApiExample
 
 
+EXPAND_MAX_DAYS = 366
+
+
+class OccurrenceWindow:
+    """
+    Ленивый "список" повторений для LimitOffsetPagination:
+    срез генерирует только нужную страницу, len() — просто пересчёт без сериализации.
+    """
+
+    def __init__(self, events, start, end):
+        self.events = events
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        return expand_events(self.events, self.start, self.end)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError("OccurrenceWindow supports only slices")
+        return list(islice(iter(self), item.start, item.stop))
+
+
 class EventListCreateView(generics.ListCreateAPIView):
+    """
+    GET /events/?from=YYYY-MM-DD&to=YYYY-MM-DD
+    С from и to повторяющиеся события разворачиваются в повторения внутри периода
+    (id у повторений — id исходного события, starts_at — время повторения).
+    """
     permission_classes = [IsAuthenticated]
     serializer_class = CalendarEventSerializer
+
+    def get_window(self):
+        date_from = parse_date(self.request.query_params.get("from") or "")
+        date_to = parse_date(self.request.query_params.get("to") or "")
+        if not date_from or not date_to:
+            return None
+
+        if (date_to - date_from).days > EXPAND_MAX_DAYS:
+            raise ValidationError({"to": f"Период не больше {EXPAND_MAX_DAYS} дней."})
+
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz)
+        return start, end
+
+    def list(self, request, *args, **kwargs):
+        window = self.get_window()
+        if window is None:
+            return super().list(request, *args, **kwargs)
+
+        start, end = window
+        # индекс (user, repeat, starts_at): разовые — внутри окна, повторяющиеся — начатые до конца окна
+        events = list(
+            CalendarEvent.objects.filter(user=request.user).filter(
+                Q(repeat=CalendarEvent.Repeat.NONE, starts_at__gte=start, starts_at__lt=end)
+                | (~Q(repeat=CalendarEvent.Repeat.NONE) & Q(starts_at__lt=end))
+            )
+        )
+
+        page = self.paginate_queryset(OccurrenceWindow(events, start, end))
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(list(OccurrenceWindow(events, start, end)), many=True).data)
+
     @extend_schema(
         tags=['Notifications'],
         summary="Список событий календаря",
@@ -60,6 +135,58 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
         return CalendarEvent.objects.filter(user=self.request.user)
 
 
+class CalendarFeedLinkView(APIView):
+    permission_classes = [IsAuthenticated]
+    @extend_schema(
+        tags=['Notifications'],
+        summary="Ссылка на ICS-фид календаря",
+        responses={200: OpenApiTypes.OBJECT},
+        examples=[OpenApiExample('Success', value={"url": "https://beshtashta.kg/api/v1/notifications/events/feed/Xy3...abc.ics"})]
+    )
+    def get(self, request):
+        return Response({"url": self.feed_url(request, ics.get_feed_token(request.user.id))})
+
+    @extend_schema(
+        tags=['Notifications'],
+        summary="Перевыпустить ссылку на ICS-фид",
+        description="Старая ссылка перестаёт работать (например, если ею случайно поделились).",
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    def post(self, request):
+        return Response({"url": self.feed_url(request, ics.rotate_feed_token(request.user.id))})
+
+    @staticmethod
+    def feed_url(request, token: str) -> str:
+        return request.build_absolute_uri(f"/api/v1/notifications/events/feed/{token}.ics")
+
+
+class CalendarFeedView(APIView):
+    """
+    GET /events/feed/<token>.ics — для подписки из Google/Apple Calendar.
+    Доступ по секрету ссылки (без JWT). Неактивный/удалённый юзер или
+    перевыпущенная ссылка -> 404. If-None-Match -> 304.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @extend_schema(exclude=True)
+    def get(self, request, token: str):
+        feed = ics.load_feed(token)
+        if feed is None:
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        user_id, etag = feed
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            resp = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            resp = StreamingHttpResponse(ics.iter_feed(user_id), content_type="text/calendar; charset=utf-8")
+            resp["Content-Disposition"] = 'inline; filename="besh-tashta.ics"'
+
+        resp["ETag"] = etag
+        resp["Cache-Control"] = "private, no-cache"
+        return resp
+
+
 class NotificationReadView(APIView):
     permission_classes = [IsAuthenticated]
     @extend_schema(
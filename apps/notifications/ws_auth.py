@@ -1,13 +1,35 @@
 from urllib.parse import parse_qs
 
 from channels.middleware import BaseMiddleware
-from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+from apps.notifications.executor import run_sync
+from apps.users.active_cache import is_user_active
+
+# True: scope["user"] собирается из claims токена + кэш is_active, без запроса в БД
+WS_AUTH_TOKEN_USER = getattr(settings, "WS_AUTH_TOKEN_USER", True)
+
+
+class WsTokenUser(TokenUser):
+    """
+    Юзер из проверенного access-токена. is_active уже проверен по кэшу.
+    """
+    is_active = True
+
+    @cached_property
+    def id(self) -> int:
+        return int(self.token["user_id"])  # у тебя user_id в токене строкой "5"
+
+    @cached_property
+    def pk(self) -> int:
+        return self.id
 
 
-@database_sync_to_async
 def get_user_by_id(user_id: int):
     User = get_user_model()
     return User.objects.filter(id=user_id).first()
@@ -34,11 +56,15 @@ class JwtAuthMiddleware(BaseMiddleware):
             if user_id is None:
                 return await super().__call__(scope, receive, send)
 
-            user_id = int(user_id)  # у тебя user_id в токене строкой "5"
-            user = await get_user_by_id(user_id)
+            user_id = int(user_id)
 
-            if user:
-                scope["user"] = user
+            if WS_AUTH_TOKEN_USER:
+                if await run_sync(is_user_active, user_id):
+                    scope["user"] = WsTokenUser(validated)
+            else:
+                user = await run_sync(get_user_by_id, user_id)
+                if user:
+                    scope["user"] = user
 
         except Exception:
             scope["user"] = AnonymousUser()
@@ -0,0 +1,131 @@
+import json
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+# -------------------------
+# Redis Stream последних WS-сообщений пользователя
+# (для догрузки пропущенного при переподключении)
+# -------------------------
+
+STREAM_MAXLEN = getattr(settings, "NOTIFICATIONS_WS_STREAM_MAXLEN", 200)
+STREAM_TTL = getattr(settings, "NOTIFICATIONS_WS_STREAM_TTL", 60 * 60 * 24 * 7)  # 7 дней
+
+
+def stream_key(user_id: int) -> str:
+    return f"notif:stream:u{user_id}"
+
+
+def _decode(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode()
+    return str(value)
+
+
+def _id_tuple(stream_id) -> tuple[int, int]:
+    ms, _, seq = _decode(stream_id).partition("-")
+    return int(ms), int(seq or 0)
+
+
+def is_valid_id(stream_id: str | None) -> bool:
+    if not stream_id:
+        return False
+    try:
+        _id_tuple(stream_id)
+    except ValueError:
+        return False
+    return True
+
+
+def append(user_id: int, payload: dict) -> str:
+    """
+    Кладёт payload в стрим юзера (MAXLEN ~ STREAM_MAXLEN) и возвращает его id.
+    """
+    conn = get_redis_connection("default")
+    key = stream_key(user_id)
+
+    pipe = conn.pipeline()
+    pipe.xadd(
+        key,
+        {"data": json.dumps(payload, ensure_ascii=False)},
+        maxlen=STREAM_MAXLEN,
+        approximate=True,
+    )
+    pipe.expire(key, STREAM_TTL)
+    stream_id, _ = pipe.execute()
+    return _decode(stream_id)
+
+
+def append_many(items: list[tuple[int, dict]]) -> list[str]:
+    """
+    То же, что append, но для пачки (user_id, payload) за один round-trip.
+    """
+    conn = get_redis_connection("default")
+
+    pipe = conn.pipeline(transaction=False)
+    for user_id, payload in items:
+        key = stream_key(user_id)
+        pipe.xadd(
+            key,
+            {"data": json.dumps(payload, ensure_ascii=False)},
+            maxlen=STREAM_MAXLEN,
+            approximate=True,
+        )
+        pipe.expire(key, STREAM_TTL)
+    results = pipe.execute()
+    return [_decode(stream_id) for stream_id in results[::2]]
+
+
+def _has_gap(conn, key: str, last_id: str) -> bool:
+    """
+    True, если часть сообщений после last_id уже вытеснена из стрима.
+    """
+    try:
+        info = conn.xinfo_stream(key)
+    except Exception:
+        # стрима нет (истёк TTL) — восстановить нечего
+        return True
+
+    info = {_decode(k): v for k, v in info.items()}
+
+    deleted = info.get("max-deleted-entry-id")
+    if deleted is not None:
+        # Redis 7+: точно знаем, что вытеснялось
+        return _id_tuple(deleted) > _id_tuple(last_id)
+
+    first = info.get("first-entry")
+    if not first:
+        return False
+    return _id_tuple(first[0]) > _id_tuple(last_id) and info.get("length", 0) >= STREAM_MAXLEN
+
+
+def read_since(user_id: int, last_id: str) -> tuple[list[dict], bool]:
+    """
+    Возвращает (payloads после last_id, complete).
+    complete=False — разрыв больше стрима, клиенту нужно догрузиться через REST.
+    """
+    conn = get_redis_connection("default")
+    key = stream_key(user_id)
+
+    if _has_gap(conn, key, last_id):
+        return [], False
+
+    entries = conn.xrange(key, min=f"({last_id}", max="+", count=STREAM_MAXLEN)
+
+    payloads = []
+    for stream_id, fields in entries:
+        fields = {_decode(k): v for k, v in fields.items()}
+        try:
+            payload = json.loads(_decode(fields["data"]))
+        except Exception:
+            continue
+        payload["stream_id"] = _decode(stream_id)
+        payloads.append(payload)
+
+    return payloads, True
+
+
+def is_newer(stream_id: str | None, last_id: str | None) -> bool:
+    if not is_valid_id(stream_id) or not is_valid_id(last_id):
+        return True
+    return _id_tuple(stream_id) > _id_tuple(last_id)
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+# -------------------------
+# Общий (Redis) кэш флага is_active:
+# stateless-аутентификация не ходит в БД за юзером на каждый запрос
+# -------------------------
+
+ACTIVE_CACHE_TTL = getattr(settings, "USER_ACTIVE_CACHE_TTL", 60)
+
+
+def active_cache_key(user_id: int) -> str:
+    return f"users:active:u{user_id}"
+
+
+def set_user_active(user_id: int, is_active: bool) -> None:
+    try:
+        cache.set(active_cache_key(user_id), int(is_active), ACTIVE_CACHE_TTL)
+    except Exception:
+        pass
+
+
+def is_user_active(user_id: int) -> bool:
+    """
+    Активен ли юзер. Несуществующий = неактивный.
+    """
+    try:
+        cached = cache.get(active_cache_key(user_id))
+    except Exception:
+        cached = None
+
+    if cached is not None:
+        return bool(cached)
+
+    User = get_user_model()
+    is_active = User.objects.filter(id=user_id, is_active=True).exists()
+    set_user_active(user_id, is_active)
+    return is_active
@@ -1,11 +1,20 @@
 from django.contrib import admin
-from .models import User, UserProfile, Privilege, UserPrivilege
+from apps.management.purge import soft_delete_user
+from .models import User, UserProfile, Privilege, UserPrivilege, EmailOutbox, DataExport
 
 class UserAdmin(admin.ModelAdmin):
     list_display = ('email', 'phone_number', 'first_name', 'last_name', 'is_active', "is_staff", "is_superuser")
     search_fields = ('email', 'phone_number')
     list_filter = ('is_active', "is_staff", "is_superuser")
 
+    # данные юзера удаляет воркер пачками (apps.management.purge), сам юзер сразу неактивен
+    def delete_model(self, request, obj):
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            soft_delete_user(obj)
+
 admin.site.register(User, UserAdmin)
 
 class UserProfileAdmin(admin.ModelAdmin):
@@ -28,3 +37,22 @@ class UserPrivilegeAdmin(admin.ModelAdmin):
     list_filter = ('purchased_at',)
 
 admin.site.register(UserPrivilege, UserPrivilegeAdmin)
+
+
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('to', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    search_fields = ('to', 'subject')
+    list_filter = ('status',)
+    readonly_fields = ('last_error', 'created_at')
+    exclude = ('body',)  # там коды сброса
+
+admin.site.register(EmailOutbox, EmailOutboxAdmin)
+
+
+class DataExportAdmin(admin.ModelAdmin):
+    list_display = ('user', 'status', 'size', 'created_at', 'finished_at', 'expires_at')
+    list_filter = ('status',)
+    search_fields = ('user__email',)
+    readonly_fields = ('error', 'created_at', 'finished_at')
+
+admin.site.register(DataExport, DataExportAdmin)
@@ -4,3 +4,6 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
     verbose_name = "Пользователи"
+
+    def ready(self):
+        from apps.users import signals  # noqa: F401
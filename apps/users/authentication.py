@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from apps.users.active_cache import is_user_active
+
+# -------------------------
+# Stateless JWT: юзер собирается из подписанных claims, без SELECT на каждый запрос.
+# Отзыв (блокировка юзера) — через общий кэш is_active, см. apps.users.active_cache.
+# -------------------------
+
+def user_from_claims(validated_token):
+    """
+    Экземпляр User с id/is_active/is_staff из токена, остальные поля отложены:
+    первое обращение к ним догружает строку целиком (User.refresh_from_db).
+    FK-присваивания и фильтры по request.user работают как с обычным юзером.
+    """
+    User = get_user_model()
+    values = [int(validated_token["user_id"]), bool(validated_token["is_active"]), bool(validated_token["is_staff"])]
+    user = User.from_db("default", list(User.CLAIM_FIELDS), values)
+    # premium из токена может устареть до refresh — проверки идут через apps.users.entitlements
+    user._from_claims = True
+    user._claim_values = dict(zip(User.CLAIM_FIELDS, values))
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # токены, выданные до появления claims, — по-старому через БД
+        if "is_active" not in validated_token or "is_staff" not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = int(validated_token["user_id"])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        if not validated_token["is_active"] or not is_user_active(user_id):
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        return user_from_claims(validated_token)
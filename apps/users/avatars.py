@@ -0,0 +1,178 @@
+import hashlib
+import secrets
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from apps.users.models import UserProfile
+
+# -------------------------
+# Аватары: EXIF (GPS и т.п.) срезаем ещё в запросе, в воркере делаем квадратные варианты
+# WebP + JPEG и кладём под именами по хэшу содержимого — можно кэшировать навсегда.
+# Каталог у каждого профиля свой: avatars/v/<profile_id>/.
+# -------------------------
+
+AVATAR_SIZES = getattr(settings, "AVATAR_SIZES", (64, 256, 512))
+AVATAR_ORIGINAL_MAX = getattr(settings, "AVATAR_ORIGINAL_MAX", 1024)
+AVATAR_WEBP_QUALITY = getattr(settings, "AVATAR_WEBP_QUALITY", 80)
+AVATAR_JPEG_QUALITY = getattr(settings, "AVATAR_JPEG_QUALITY", 85)
+
+VARIANTS_DIR = "avatars/v"
+
+# защита от "бомб": 40 Мп хватит любому телефону
+Image.MAX_IMAGE_PIXELS = getattr(settings, "AVATAR_MAX_PIXELS", 40_000_000)
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    buf = BytesIO()
+    if fmt == "webp":
+        image.save(buf, "WEBP", quality=AVATAR_WEBP_QUALITY, method=4)
+    else:
+        image.save(buf, "JPEG", quality=AVATAR_JPEG_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _profile_dir(profile_id: int) -> str:
+    return f"{VARIANTS_DIR}/{profile_id}/"
+
+
+def _store(profile_id: int, data: bytes, ext: str) -> str:
+    # имя = хэш содержимого: повторная загрузка той же картинки не дублируется, URL не меняется без смены байтов
+    name = f"{_profile_dir(profile_id)}{hashlib.sha256(data).hexdigest()[:32]}.{ext}"
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return name
+
+
+def _normalize(image: Image.Image) -> Image.Image:
+    # поворот по EXIF применяем в пиксели, дальше EXIF не пишем вовсе
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+    return image
+
+
+def _load(name: str) -> Image.Image:
+    with default_storage.open(name, "rb") as f:
+        image = Image.open(f)
+        image.load()
+    return _normalize(image)
+
+
+def strip_upload(upload):
+    """
+    В запросе: пересохраняет загрузку без метаданных, не больше AVATAR_ORIGINAL_MAX,
+    под случайным именем — файл с EXIF не попадает в storage даже до воркера.
+    Не картинка — отдаём как есть, её отклонит ImageField.
+    """
+    try:
+        image = Image.open(upload)
+        # JPEG декодируется сразу в уменьшенном масштабе — дёшево даже для больших фото
+        image.draft("RGB", (AVATAR_ORIGINAL_MAX, AVATAR_ORIGINAL_MAX))
+        image.load()
+        image = _normalize(image)
+    except Exception:
+        upload.seek(0)
+        return upload
+
+    image.thumbnail((AVATAR_ORIGINAL_MAX, AVATAR_ORIGINAL_MAX), Image.Resampling.LANCZOS)
+    return ContentFile(_encode(image, "jpeg"), name=f"{secrets.token_hex(16)}.jpg")
+
+
+def render_variants(profile_id: int, name: str) -> tuple[str, dict]:
+    """
+    Возвращает (имя очищенного оригинала, {size: {"webp": name, "jpeg": name}}).
+    """
+    image = _load(name)
+
+    original = image.copy()
+    original.thumbnail((AVATAR_ORIGINAL_MAX, AVATAR_ORIGINAL_MAX), Image.Resampling.LANCZOS)
+    original_name = _store(profile_id, _encode(original, "jpeg"), "jpg")
+
+    variants = {}
+    for size in AVATAR_SIZES:
+        square = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        variants[str(size)] = {
+            "webp": _store(profile_id, _encode(square, "webp"), "webp"),
+            "jpeg": _store(profile_id, _encode(square, "jpeg"), "jpg"),
+        }
+    return original_name, variants
+
+
+def _variant_names(variants: dict) -> set[str]:
+    return {name for formats in (variants or {}).values() for name in formats.values()}
+
+
+def avatar_file_names(profile: UserProfile) -> set[str]:
+    names = _variant_names(profile.avatar_variants)
+    if profile.avatar:
+        names.add(profile.avatar.name)
+    return names
+
+
+def delete_avatar_files(profile_id: int, names, keep=()) -> None:
+    """
+    names — файлы этого профиля (avatar_file_names): его каталог вариантов и загрузка.
+    """
+    for name in set(names) - set(keep):
+        if not name:
+            continue
+        try:
+            default_storage.delete(name)
+        except Exception:
+            pass
+
+
+def process_avatar(profile_id: int, name: str, stale=()) -> bool:
+    """
+    stale — файлы прошлого аватара (снимок до загрузки). False — профиль пропал
+    или аватар уже сменили (новый обработает следующая задача).
+    """
+    profile = UserProfile.objects.filter(id=profile_id).first()
+    if not profile:
+        return False
+    if profile.avatar.name != name:
+        # нас обогнала новая загрузка: прошлый аватар всё равно больше не нужен
+        delete_avatar_files(profile_id, stale, keep=avatar_file_names(profile))
+        return False
+
+    original_name, variants = render_variants(profile_id, name)
+
+    with transaction.atomic():
+        updated = UserProfile.objects.filter(id=profile_id, avatar=name).update(
+            avatar=original_name,
+            avatar_variants=variants,
+        )
+    if not updated:
+        return False
+
+    # загрузку клиента (с EXIF) и файлы прошлого аватара больше никто не раздаёт
+    keep = _variant_names(variants) | {original_name}
+    delete_avatar_files(profile_id, {*stale, name}, keep=keep)
+
+    # сводка профиля (apps.users.services) видит новые URL
+    from apps.users.services import bump_data_generation
+
+    bump_data_generation(profile.user_id)
+    return True
+
+
+def schedule_avatar_processing(profile: UserProfile, stale=()) -> None:
+    from apps.users.tasks import process_avatar_task
+
+    profile_id, name, stale = profile.id, profile.avatar.name, sorted(stale)
+    transaction.on_commit(lambda: process_avatar_task.delay(profile_id, name, stale))
+
+
+def variant_urls(profile: UserProfile) -> dict:
+    return {
+        size: {fmt: default_storage.url(name) for fmt, name in formats.items()}
+        for size, formats in (profile.avatar_variants or {}).items()
+    }
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+
+from apps.users.models import Privilege
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Публичные справочники (тарифы, мотивация): меняются только из админки.
+# Два уровня: словарь в процессе -> Redis под версией -> БД.
+# Версию поднимают сигналы save/delete; процесс сверяет её не чаще раза в CATALOG_LOCAL_TTL сек.
+# Ответ — готовые JSON-байты + сильный ETag (хэш байтов), If-None-Match -> 304.
+# -------------------------
+
+CATALOG_CACHE_TTL = getattr(settings, "CATALOG_CACHE_TTL", 60 * 60)
+CATALOG_LOCAL_TTL = getattr(settings, "CATALOG_LOCAL_TTL", 5)
+CATALOG_HTTP_MAX_AGE = getattr(settings, "CATALOG_HTTP_MAX_AGE", 60)
+
+
+def render_json(data) -> tuple[bytes, str]:
+    body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+    return body, '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def json_response(request, body: bytes, etag: str, cache_control: str) -> HttpResponse:
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        resp = HttpResponse(status=304)
+    else:
+        resp = HttpResponse(body, content_type="application/json")
+    resp["ETag"] = etag
+    resp["Cache-Control"] = cache_control
+    return resp
+
+
+class VersionedCatalog:
+    """
+    build() -> любой picklable объект (обычно готовые байты/ETag).
+    """
+
+    def __init__(self, name: str, build):
+        self.name = name
+        self.build = build
+        self._lock = threading.Lock()
+        self._local = None  # (version, checked_at, value)
+
+    def version_key(self) -> str:
+        return f"catalog:{self.name}:ver"
+
+    def value_key(self, version: int) -> str:
+        return f"catalog:{self.name}:v{version}"
+
+    def version(self) -> int:
+        key = self.version_key()
+        version = cache.get(key)
+        if version is None:
+            # как у поколений профиля: после потери ключа не совпадаем со старыми значениями
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key)
+        return int(version)
+
+    def bump(self) -> None:
+        def _bump():
+            key = self.version_key()
+            try:
+                cache.incr(key)
+            except Exception as exc:
+                # ValueError — ключа нет: заводим новую версию, как version() после потери ключа
+                logger.warning("catalog %s: version bump failed: %r", self.name, exc)
+                if isinstance(exc, ValueError):
+                    cache.set(key, time.time_ns(), None)
+            # свой процесс видит изменение сразу, остальные — через CATALOG_LOCAL_TTL
+            self._local = None
+
+        transaction.on_commit(_bump)
+
+    def get(self):
+        local = self._local
+        now = time.monotonic()
+        if local and now - local[1] < CATALOG_LOCAL_TTL:
+            return local[2]
+
+        try:
+            version = self.version()
+        except Exception:
+            # Redis недоступен: держим что есть в процессе, иначе из БД
+            return local[2] if local else self.build()
+
+        if local and local[0] == version:
+            self._local = (version, now, local[2])
+            return local[2]
+
+        with self._lock:
+            value = None
+            try:
+                value = cache.get(self.value_key(version))
+            except Exception:
+                pass
+            if value is None:
+                value = self.build()
+                try:
+                    cache.set(self.value_key(version), value, CATALOG_CACHE_TTL)
+                except Exception:
+                    pass
+            self._local = (version, now, value)
+        return value
+
+
+# -------------------------
+# Тарифы (PrivilegeListView)
+# -------------------------
+
+def build_privileges_catalog() -> tuple[bytes, str]:
+    data = [
+        {
+            "id": p.id,
+            "name": p.name,
+            "description": p.description,
+            "price": str(p.price),
+            "created_at": p.created_at.isoformat() if p.created_at else None,
+        }
+        for p in Privilege.objects.all().order_by("price", "id")
+    ]
+    return render_json(data)
+
+
+privileges_catalog = VersionedCatalog("privileges", build_privileges_catalog)
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.users.models import UserPrivilege
+
+# -------------------------
+# Entitlements: набор купленных привилегий юзера.
+# Redis-кэш на юзера (сбрасывается сигналами UserPrivilege: покупка, админка)
+# + мемо на объекте юзера, т.е. в пределах запроса — не больше одного GET в кэш.
+# -------------------------
+
+ENTITLEMENTS_CACHE_TTL = getattr(settings, "ENTITLEMENTS_CACHE_TTL", 60 * 60)
+
+
+class Entitlements:
+    __slots__ = ("user_id", "privilege_ids")
+
+    def __init__(self, user_id, privilege_ids):
+        self.user_id = user_id
+        self.privilege_ids = frozenset(privilege_ids)
+
+    @property
+    def is_premium(self) -> bool:
+        # премиум = любая купленная привилегия
+        return bool(self.privilege_ids)
+
+    def has(self, privilege_id: int) -> bool:
+        return privilege_id in self.privilege_ids
+
+    def __repr__(self):
+        return f"Entitlements(user_id={self.user_id}, privileges={sorted(self.privilege_ids)})"
+
+
+NO_ENTITLEMENTS = Entitlements(None, ())
+
+
+def entitlements_key(user_id: int) -> str:
+    return f"users:ent:u{user_id}"
+
+
+def load_privilege_ids(user_id: int) -> list[int]:
+    try:
+        cached = cache.get(entitlements_key(user_id))
+    except Exception:
+        cached = None
+    if cached is not None:
+        return cached
+
+    ids = sorted(UserPrivilege.objects.filter(user_id=user_id).values_list("privilege_id", flat=True))
+    try:
+        cache.set(entitlements_key(user_id), ids, ENTITLEMENTS_CACHE_TTL)
+    except Exception:
+        pass
+    return ids
+
+
+def get_entitlements(user) -> Entitlements:
+    if user is None or not user.is_authenticated:
+        return NO_ENTITLEMENTS
+
+    ent = getattr(user, "_entitlements", None)
+    if ent is None:
+        ent = Entitlements(user.id, load_privilege_ids(user.id))
+        user._entitlements = ent
+    return ent
+
+
+def has_premium(user_id: int) -> bool:
+    return bool(load_privilege_ids(user_id))
+
+
+def invalidate_entitlements(user_id: int) -> None:
+    def _delete():
+        try:
+            cache.delete(entitlements_key(user_id))
+        except Exception:
+            pass
+
+    # сразу и после коммита: иначе параллельный запрос успеет закэшировать старый набор
+    _delete()
+    transaction.on_commit(_delete)
@@ -0,0 +1,258 @@
+import json
+import logging
+import secrets
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from apps.users.models import DataExport
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Полная выгрузка данных юзера: zip, внутри по NDJSON-файлу на таблицу.
+# Строки читаем .iterator() (server-side cursor на Postgres) и сразу пишем
+# в zip-поток на диске — память не растёт с объёмом данных.
+# -------------------------
+
+DATA_EXPORT_TTL_HOURS = getattr(settings, "DATA_EXPORT_TTL_HOURS", 48)
+DATA_EXPORT_CHUNK_SIZE = getattr(settings, "DATA_EXPORT_CHUNK_SIZE", 2000)
+DATA_EXPORT_STALE_MINUTES = getattr(settings, "DATA_EXPORT_STALE_MINUTES", 30)
+
+DOWNLOAD_SALT = "users.data_export"
+
+# (файл в архиве, модель, поле с юзером, поля, которые не отдаём)
+EXPORT_TABLES = (
+    ("user.ndjson", "users.User", "id", ("password",)),
+    ("profile.ndjson", "users.UserProfile", "user_id", ()),
+    ("privileges.ndjson", "users.UserPrivilege", "user_id", ()),
+    ("social_accounts.ndjson", "users.SocialAccount", "user_id", ()),
+    ("accounts.ndjson", "management.Account", "user_id", ()),
+    ("categories.ndjson", "management.Category", "user_id", ()),
+    ("transactions.ndjson", "management.Transaction", "user_id", ()),
+    ("debts.ndjson", "management.Debt", "user_id", ()),
+    ("calendar_events.ndjson", "notifications.CalendarEvent", "user_id", ()),
+    ("notifications.ndjson", "notifications.Notification", "user_id", ()),
+    ("devices.ndjson", "notifications.DeviceToken", "user_id", ("token",)),
+)
+
+
+def _columns(model, exclude) -> list[str]:
+    return [f.attname for f in model._meta.concrete_fields if f.name not in exclude]
+
+
+def write_table(zf: zipfile.ZipFile, arcname: str, model, user_field: str, exclude, user_id: int) -> int:
+    qs = model._default_manager.filter(**{user_field: user_id}).order_by("pk").values(*_columns(model, exclude))
+
+    n = 0
+    # force_zip64: размер записи заранее неизвестен
+    with zf.open(arcname, "w", force_zip64=True) as out:
+        for row in qs.iterator(chunk_size=DATA_EXPORT_CHUNK_SIZE):
+            out.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False).encode())
+            out.write(b"\n")
+            n += 1
+    return n
+
+
+def write_archive(fileobj, user_id: int) -> dict:
+    counts = {}
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, label, user_field, exclude in EXPORT_TABLES:
+            counts[arcname] = write_table(zf, arcname, apps.get_model(label), user_field, exclude, user_id)
+
+        manifest = {
+            "user_id": user_id,
+            "generated_at": timezone.now(),
+            "format": "ndjson",
+            "files": counts,
+        }
+        zf.writestr("manifest.json", json.dumps(manifest, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+    return counts
+
+
+# -------------------------
+# Ссылка на скачивание: подписанный id, живёт столько же, сколько файл
+# -------------------------
+
+def make_download_token(export_id: int) -> str:
+    return signing.TimestampSigner(salt=DOWNLOAD_SALT).sign(str(export_id))
+
+
+def load_download_token(token: str) -> int | None:
+    try:
+        value = signing.TimestampSigner(salt=DOWNLOAD_SALT).unsign(token, max_age=DATA_EXPORT_TTL_HOURS * 3600)
+        return int(value)
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def download_path(export: DataExport) -> str:
+    return f"/api/v1/users/me/export/download/{make_download_token(export.id)}/"
+
+
+def export_status(export: DataExport | None, request=None) -> dict:
+    if export is None:
+        return {"status": None}
+
+    data = {
+        "id": export.id,
+        "status": export.status,
+        "size": export.size,
+        "created_at": export.created_at.isoformat() if export.created_at else None,
+        "finished_at": export.finished_at.isoformat() if export.finished_at else None,
+        "expires_at": export.expires_at.isoformat() if export.expires_at else None,
+        "url": None,
+    }
+    if export.status == DataExport.STATUS_READY:
+        path = download_path(export)
+        data["url"] = request.build_absolute_uri(path) if request else path
+    return data
+
+
+# -------------------------
+# Создание / сборка / чистка
+# -------------------------
+
+def _stale_cutoff():
+    return timezone.now() - timedelta(minutes=DATA_EXPORT_STALE_MINUTES)
+
+
+def _fail_stale_running(qs) -> int:
+    # воркер умер посреди сборки: строка так и осталась running
+    return qs.filter(status=DataExport.STATUS_RUNNING, started_at__lt=_stale_cutoff()).update(
+        status=DataExport.STATUS_FAILED,
+        error="Сборка не завершилась вовремя",
+        finished_at=timezone.now(),
+    )
+
+
+def request_export(user) -> tuple[DataExport, bool]:
+    """
+    Одна активная выгрузка на юзера: повторный запрос возвращает уже идущую.
+    Зависшая сборка новой не мешает.
+    """
+    _fail_stale_running(DataExport.objects.filter(user=user))
+
+    active = (
+        DataExport.objects
+        .filter(user=user, status__in=(DataExport.STATUS_PENDING, DataExport.STATUS_RUNNING))
+        .order_by("-id")
+        .first()
+    )
+    if active:
+        if active.status == DataExport.STATUS_PENDING and active.created_at < _stale_cutoff():
+            # задача потерялась в брокере — ставим ещё раз, build_export сам отсечёт дубль
+            from apps.users.tasks import build_data_export_task
+            build_data_export_task.delay(active.id)
+        return active, False
+
+    export = DataExport.objects.create(user=user)
+
+    from apps.users.tasks import build_data_export_task
+    transaction.on_commit(lambda: build_data_export_task.delay(export.id))
+    return export, True
+
+
+def _notify_ready(export: DataExport) -> None:
+    from apps.notifications.services import create_and_send_notification
+
+    try:
+        create_and_send_notification(
+            user=export.user,
+            title="Выгрузка данных готова",
+            body=f"Архив можно скачать до {timezone.localtime(export.expires_at):%d.%m.%Y %H:%M}.",
+            type_="SYSTEM",
+            payload={"export_id": export.id, "url": download_path(export)},
+        )
+    except Exception:
+        logger.exception("data export %s: notification failed", export.id)
+
+
+def build_export(export_id: int) -> str:
+    # забираем задачу атомарно: повторная доставка из брокера не соберёт архив дважды
+    taken = DataExport.objects.filter(id=export_id, status=DataExport.STATUS_PENDING).update(
+        status=DataExport.STATUS_RUNNING,
+        started_at=timezone.now(),
+    )
+    if not taken:
+        return "skipped"
+
+    export = DataExport.objects.select_related("user").get(id=export_id)
+
+    try:
+        with tempfile.TemporaryFile(suffix=".zip") as tmp:
+            write_archive(tmp, export.user_id)
+            size = tmp.tell()
+            tmp.seek(0)
+
+            # имя не угадать по user_id: файл не должен находиться в обход подписанной ссылки
+            export.file.save(f"{export.user_id}-{secrets.token_urlsafe(16)}.zip", File(tmp), save=False)
+    except Exception as e:
+        logger.exception("data export %s failed", export_id)
+        export.status = DataExport.STATUS_FAILED
+        export.error = str(e)[:2000]
+        export.finished_at = timezone.now()
+        export.save(update_fields=["status", "error", "finished_at"])
+        return DataExport.STATUS_FAILED
+
+    now = timezone.now()
+    # пока собирали, sweep мог признать сборку зависшей — тогда архив не публикуем
+    done = DataExport.objects.filter(id=export_id, status=DataExport.STATUS_RUNNING).update(
+        file=export.file.name,
+        status=DataExport.STATUS_READY,
+        size=size,
+        finished_at=now,
+        expires_at=now + timedelta(hours=DATA_EXPORT_TTL_HOURS),
+    )
+    if not done:
+        export.file.delete(save=False)
+        return "skipped"
+    export.refresh_from_db()
+
+    _notify_ready(export)
+    return DataExport.STATUS_READY
+
+
+def purge_expired_exports() -> int:
+    """
+    Удаляет файлы просроченных выгрузок; строку оставляем как журнал (status=expired).
+    """
+    n = 0
+    qs = DataExport.objects.filter(status=DataExport.STATUS_READY, expires_at__lt=timezone.now())
+    for export in qs.iterator():
+        if export.file:
+            try:
+                export.file.delete(save=False)
+            except Exception:
+                logger.exception("data export %s: file delete failed", export.id)
+                continue
+        export.file = None
+        export.status = DataExport.STATUS_EXPIRED
+        export.save(update_fields=["file", "status"])
+        n += 1
+    return n
+
+
+def sweep_stale_exports() -> dict:
+    """
+    running дольше DATA_EXPORT_STALE_MINUTES -> failed (юзер может запросить заново),
+    pending столько же -> снова в очередь (повторная доставка безопасна).
+    """
+    from apps.users.tasks import build_data_export_task
+
+    failed = _fail_stale_running(DataExport.objects.all())
+
+    requeued = 0
+    qs = DataExport.objects.filter(status=DataExport.STATUS_PENDING, created_at__lt=_stale_cutoff())
+    for export_id in qs.values_list("id", flat=True).iterator():
+        build_data_export_task.delay(export_id)
+        requeued += 1
+    return {"failed": failed, "requeued": requeued}
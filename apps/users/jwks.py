@@ -0,0 +1,181 @@
+import json
+import re
+import time
+
+import jwt
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+# -------------------------
+# Публичные ключи Google/Apple для проверки id_token.
+# Redis — общий для всех воркеров (срок из Cache-Control: max-age),
+# в процессе — уже распарсенные ключи. Обновляет beat-задача заранее,
+# так что в штатном режиме логин не ходит наружу.
+# -------------------------
+
+JWKS_URLS = {
+    "google": "https://www.googleapis.com/oauth2/v3/certs",
+    "apple": "https://appleid.apple.com/auth/keys",
+}
+
+JWKS_DEFAULT_MAX_AGE = getattr(settings, "SOCIAL_JWKS_DEFAULT_MAX_AGE", 3600)
+# обновляем, когда до истечения осталось меньше этого (beat ходит чаще)
+JWKS_REFRESH_AHEAD = getattr(settings, "SOCIAL_JWKS_REFRESH_AHEAD", 15 * 60)
+# после истечения ещё столько держим ключи в Redis: если провайдер недоступен, логины не падают
+JWKS_STALE_GRACE = getattr(settings, "SOCIAL_JWKS_STALE_GRACE", 60 * 60 * 24)
+# неизвестный kid перезапрашиваем не чаще раза в N сек (иначе мусорными токенами можно долбить провайдера)
+JWKS_MIN_REFETCH = 60
+# провайдер не ответил — столько секунд никто (ни один воркер) не ходит к нему снова,
+# логины работают на последних известных ключах
+JWKS_FAILURE_BACKOFF = getattr(settings, "SOCIAL_JWKS_FAILURE_BACKOFF", 60)
+JWKS_FETCH_TIMEOUT = getattr(settings, "SOCIAL_JWKS_FETCH_TIMEOUT", 3)
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+# provider -> {"fetched_at": float, "expires_at": float, "keys": {kid: key}}
+_parsed: dict[str, dict] = {}
+# provider -> ts, до которого процесс не ходит к провайдеру (без запроса в Redis)
+_backoff_until: dict[str, float] = {}
+
+
+def jwks_cache_key(provider: str) -> str:
+    return f"social:jwks:{provider}"
+
+
+def backoff_key(provider: str) -> str:
+    return f"social:jwks:{provider}:backoff"
+
+
+def _in_backoff(provider: str) -> bool:
+    if time.time() < _backoff_until.get(provider, 0):
+        return True
+    try:
+        return bool(cache.get(backoff_key(provider)))
+    except Exception:
+        return False
+
+
+def _start_backoff(provider: str) -> None:
+    _backoff_until[provider] = time.time() + JWKS_FAILURE_BACKOFF
+    try:
+        cache.set(backoff_key(provider), 1, JWKS_FAILURE_BACKOFF)
+    except Exception:
+        pass
+
+
+def _max_age(headers) -> int:
+    match = _MAX_AGE_RE.search(headers.get("Cache-Control", "") or "")
+    return int(match.group(1)) if match else JWKS_DEFAULT_MAX_AGE
+
+
+def fetch_jwks(provider: str) -> dict:
+    """
+    Тянет JWKS у провайдера и кладёт в Redis. Возвращает документ
+    {"keys": [...], "fetched_at": ts, "expires_at": ts}. Ошибка запускает backoff.
+    """
+    try:
+        r = requests.get(JWKS_URLS[provider], timeout=JWKS_FETCH_TIMEOUT)
+        r.raise_for_status()
+    except Exception:
+        _start_backoff(provider)
+        raise
+
+    now = time.time()
+    doc = {
+        "keys": r.json().get("keys", []),
+        "fetched_at": now,
+        "expires_at": now + _max_age(r.headers),
+    }
+
+    try:
+        cache.set(jwks_cache_key(provider), json.dumps(doc), int(doc["expires_at"] - now) + JWKS_STALE_GRACE)
+    except Exception:
+        pass
+    return doc
+
+
+def _load_shared(provider: str) -> dict | None:
+    try:
+        raw = cache.get(jwks_cache_key(provider))
+    except Exception:
+        return None
+    return json.loads(raw) if raw else None
+
+
+def _parse(doc: dict) -> dict:
+    keys = {}
+    for jwk in doc.get("keys", []):
+        if jwk.get("kty") != "RSA" or not jwk.get("kid"):
+            continue
+        try:
+            keys[jwk["kid"]] = jwt.algorithms.RSAAlgorithm.from_jwk(jwk)
+        except Exception:
+            continue
+    return {"fetched_at": doc["fetched_at"], "expires_at": doc["expires_at"], "keys": keys}
+
+
+def _remember(provider: str, doc: dict) -> dict:
+    local = _parse(doc)
+    _parsed[provider] = local
+    return local
+
+
+def get_public_key(provider: str, kid: str):
+    """
+    Ключ по kid: память процесса -> Redis -> провайдер (только на холодном старте,
+    при ротации ключей или если beat не успел обновить).
+    """
+    now = time.time()
+    local = _parsed.get(provider)
+    if local and now < local["expires_at"] and kid in local["keys"]:
+        return local["keys"][kid]
+
+    doc = _load_shared(provider)
+    if doc and (not local or doc["fetched_at"] > local["fetched_at"]):
+        local = _remember(provider, doc)
+        if now < local["expires_at"] and kid in local["keys"]:
+            return local["keys"][kid]
+
+    stale = not local or now >= local["expires_at"] or now - local["fetched_at"] > JWKS_MIN_REFETCH
+    if stale and not _in_backoff(provider):
+        try:
+            local = _remember(provider, fetch_jwks(provider))
+        except Exception:
+            # провайдер недоступен — работаем на протухших ключах, если они есть
+            pass
+
+    key = local["keys"].get(kid) if local else None
+    if key is None:
+        raise ValueError(f"{provider} public key not found")
+    return key
+
+
+def refresh_jwks(force: bool = False) -> list[str]:
+    """
+    Для beat: обновляет ключи, которые скоро истекут (или отсутствуют). Возвращает обновлённых провайдеров.
+    """
+    refreshed = []
+    now = time.time()
+    for provider in JWKS_URLS:
+        doc = _load_shared(provider)
+        if force or not doc or doc["expires_at"] - now < JWKS_REFRESH_AHEAD:
+            try:
+                fetch_jwks(provider)
+                refreshed.append(provider)
+            except Exception:
+                continue
+    return refreshed
+
+
+def decode_id_token(provider: str, token: str, *, audience: str, issuer) -> dict:
+    header = jwt.get_unverified_header(token)
+    public_key = get_public_key(provider, header.get("kid"))
+
+    return jwt.decode(
+        token,
+        public_key,
+        algorithms=["RS256"],
+        audience=audience,
+        issuer=issuer,
+    )
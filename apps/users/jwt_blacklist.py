@@ -0,0 +1,143 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+# -------------------------
+# Blacklist refresh-токенов: проверка по jti в Redis (TTL = остаток жизни токена),
+# таблицы token_blacklist — только журнал, протухшие строки чистятся пачками.
+# -------------------------
+
+# Промах в Redis значит "не отозван", только пока стоит маркер синхронизации: он ставится
+# после полного переноса журнала в Redis и пропадает вместе с данными (flush/рестарт).
+# Без маркера промах проверяется по БД, а синхронизация ставится в очередь.
+# False — всегда верить Redis.
+JWT_BLACKLIST_DB_FALLBACK = getattr(settings, "JWT_BLACKLIST_DB_FALLBACK", True)
+JWT_PURGE_BATCH_SIZE = getattr(settings, "JWT_PURGE_BATCH_SIZE", 5000)
+
+
+SYNCED_KEY = "jwt:bl-synced"
+SYNCING_KEY = "jwt:bl-syncing"
+SYNCING_TTL = 60 * 60
+
+
+def blacklist_key(jti: str) -> str:
+    return f"jwt:bl:{jti}"
+
+
+def mark_blacklisted(jti: str, exp: int) -> None:
+    ttl = int(exp - time.time())
+    if ttl <= 0:
+        return
+    try:
+        conn = get_redis_connection("default")
+        conn.set(blacklist_key(jti), 1, ex=ttl)
+    except Exception:
+        # строка BlacklistedToken всё равно пишется, is_blacklisted без Redis смотрит в БД
+        pass
+
+
+def _db_blacklisted(jti: str):
+    """
+    (отозван?, exp) по журналу в БД.
+    """
+    row = (
+        BlacklistedToken.objects
+        .filter(token__jti=jti)
+        .values_list("token__expires_at", flat=True)
+        .first()
+    )
+    return row is not None, row
+
+
+def _schedule_sync(conn) -> None:
+    from apps.users.tasks import sync_jwt_blacklist
+
+    # одна задача на все промахи, пока синхронизация не закончилась
+    try:
+        if conn.set(SYNCING_KEY, 1, nx=True, ex=SYNCING_TTL):
+            sync_jwt_blacklist.delay()
+    except Exception:
+        pass
+
+
+def is_blacklisted(jti: str) -> bool:
+    try:
+        conn = get_redis_connection("default")
+        hit, synced = conn.mget(blacklist_key(jti), SYNCED_KEY)
+    except Exception:
+        # Redis недоступен — единственный источник правды БД
+        return _db_blacklisted(jti)[0]
+
+    if hit:
+        return True
+    if synced or not JWT_BLACKLIST_DB_FALLBACK:
+        return False
+
+    # маркера нет: Redis потерял данные или ещё не синхронизирован — пока смотрим в БД
+    _schedule_sync(conn)
+    blacklisted, expires_at = _db_blacklisted(jti)
+    if blacklisted and expires_at:
+        mark_blacklisted(jti, expires_at.timestamp())
+    return blacklisted
+
+
+def sync_blacklist_to_redis(batch_size: int = JWT_PURGE_BATCH_SIZE) -> int:
+    """
+    Переносит ещё живые записи blacklist из БД в Redis (первый деплой, потеря Redis)
+    и ставит маркер синхронизации.
+    """
+    now = timezone.now()
+    conn = get_redis_connection("default")
+    conn.set(SYNCING_KEY, 1, ex=SYNCING_TTL)
+    synced = 0
+    last_id = 0
+
+    while True:
+        rows = list(
+            BlacklistedToken.objects
+            .filter(id__gt=last_id, token__expires_at__gt=now)
+            .order_by("id")
+            .values_list("id", "token__jti", "token__expires_at")[:batch_size]
+        )
+        if not rows:
+            # SYNCING_KEY пропал — Redis сбросили посреди переноса, маркер ставить нельзя
+            if conn.delete(SYNCING_KEY):
+                conn.set(SYNCED_KEY, 1)
+            return synced
+
+        pipe = conn.pipeline(transaction=False)
+        for _, jti, expires_at in rows:
+            ttl = int((expires_at - now).total_seconds())
+            if ttl > 0:
+                pipe.set(blacklist_key(jti), 1, ex=ttl)
+        pipe.execute()
+
+        synced += len(rows)
+        last_id = rows[-1][0]
+
+
+def purge_expired_tokens(batch_size: int = JWT_PURGE_BATCH_SIZE, grace: timedelta = timedelta(hours=1)) -> int:
+    """
+    Удаляет протухшие OutstandingToken (и их BlacklistedToken) пачками по pk —
+    без одного огромного DELETE, который держит блокировки.
+    """
+    cutoff = timezone.now() - grace
+    deleted = 0
+
+    while True:
+        ids = list(
+            OutstandingToken.objects
+            .filter(expires_at__lt=cutoff)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+
+        # BlacklistedToken удаляются каскадом тем же запросом по token_id
+        n, _ = OutstandingToken.objects.filter(id__in=ids).delete()
+        deleted += n
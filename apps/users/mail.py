@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from apps.users.models import EmailOutbox
+
+EMAIL_OUTBOX_BATCH_SIZE = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50)
+EMAIL_OUTBOX_MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 6)
+EMAIL_OUTBOX_BACKOFF_BASE = getattr(settings, "EMAIL_OUTBOX_BACKOFF_BASE", 30)  # сек: 30, 60, 120, ...
+EMAIL_OUTBOX_LEASE_SECONDS = getattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", 300)
+
+
+def queue_email(*, to: str, subject: str, body: str) -> EmailOutbox:
+    """
+    Кладёт письмо в outbox и будит воркер после коммита. Запрос не ждёт SMTP.
+    """
+    from apps.users.tasks import send_email_outbox
+
+    item = EmailOutbox.objects.create(to=to, subject=subject, body=body)
+
+    def kick():
+        try:
+            send_email_outbox.delay()
+        except Exception:
+            # брокер недоступен — подберёт периодический запуск
+            pass
+
+    transaction.on_commit(kick)
+    return item
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=EMAIL_OUTBOX_BACKOFF_BASE * 2 ** max(0, attempts - 1))
+
+
+def _mark_failed_attempt(item: EmailOutbox, error: Exception, now) -> None:
+    item.attempts += 1
+    item.last_error = str(error)[:1000]
+    if item.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+        item.status = EmailOutbox.STATUS_FAILED
+        item.body = ""
+    else:
+        item.status = EmailOutbox.STATUS_PENDING
+        item.next_attempt_at = now + _backoff(item.attempts)
+
+
+def claim_outbox_batch(batch_size: int, now) -> list[EmailOutbox]:
+    """
+    Короткая транзакция: берём созревшие письма (и sending с истёкшей арендой)
+    и помечаем sending. Блокировки отпускаются до SMTP.
+    """
+    with transaction.atomic():
+        items = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                status__in=(EmailOutbox.STATUS_PENDING, EmailOutbox.STATUS_SENDING),
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not items:
+            return []
+
+        lease_until = now + timedelta(seconds=EMAIL_OUTBOX_LEASE_SECONDS)
+        for item in items:
+            item.status = EmailOutbox.STATUS_SENDING
+            item.next_attempt_at = lease_until
+        EmailOutbox.objects.bulk_update(items, ["status", "next_attempt_at"])
+    return items
+
+
+def send_outbox_batch(batch_size: int = EMAIL_OUTBOX_BATCH_SIZE) -> int:
+    """
+    Одна пачка = одно SMTP-соединение. Возвращает число отправленных писем.
+    Захват -> SMTP без транзакции -> итог второй короткой транзакцией.
+    """
+    now = timezone.now()
+    items = claim_outbox_batch(batch_size, now)
+    if not items:
+        return 0
+
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for item in items:
+            try:
+                EmailMessage(
+                    subject=item.subject,
+                    body=item.body,
+                    to=[item.to],
+                    connection=connection,
+                ).send()
+            except Exception as e:
+                _mark_failed_attempt(item, e, timezone.now())
+                continue
+
+            item.status = EmailOutbox.STATUS_SENT
+            item.sent_at = timezone.now()
+            item.body = ""  # коды в письмах не храним дольше, чем нужно
+            sent += 1
+    except Exception as e:
+        # не смогли даже подключиться — вся пачка уходит на повтор
+        for item in items:
+            if item.status == EmailOutbox.STATUS_SENDING:
+                _mark_failed_attempt(item, e, timezone.now())
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    with transaction.atomic():
+        EmailOutbox.objects.bulk_update(
+            items, ["status", "attempts", "last_error", "next_attempt_at", "sent_at", "body"]
+        )
+
+    return sent
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.throttling import rejected_counts
+
+
+class Command(BaseCommand):
+    help = "Show how many auth requests were rejected by throttling (per scope and dimension)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--day", default=None, help="YYYYMMDD, today by default")
+
+    def handle(self, *args, **options):
+        counts = rejected_counts(options["day"])
+        if not counts:
+            self.stdout.write("no rejections")
+            return
+
+        for name, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"total={sum(counts.values())}"))
@@ -0,0 +1,86 @@
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apps.users.jwt_blacklist import purge_expired_tokens
+from apps.users.tokens import ClaimsRefreshToken, ClaimsTokenRefreshSerializer
+
+FILL_BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = "Benchmark /auth/refresh/ (rotation + blacklist) with a large token_blacklist table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Blacklisted tokens to pre-fill")
+        parser.add_argument("--expired-share", type=float, default=0.9, help="Share of pre-filled rows already expired")
+        parser.add_argument("--count", type=int, default=200, help="Refresh calls to measure")
+        parser.add_argument("--purge", action="store_true", help="Run the batched purge and measure again")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = User.objects.create_user(email=f"bench_{time.time_ns()}@example.invalid")
+
+        try:
+            self.fill(user, options["rows"], options["expired_share"])
+            self.run("before purge", user, options["count"])
+
+            if options["purge"]:
+                started = time.perf_counter()
+                deleted = purge_expired_tokens()
+                self.stdout.write(f"purged={deleted} in {time.perf_counter() - started:.1f}s")
+                self.run("after purge", user, options["count"])
+        finally:
+            OutstandingToken.objects.filter(user=user).delete()
+            user.delete()
+
+    def fill(self, user, rows: int, expired_share: float):
+        now = timezone.now()
+        expired = int(rows * expired_share)
+
+        for start in range(0, rows, FILL_BATCH):
+            size = min(FILL_BATCH, rows - start)
+            tokens = OutstandingToken.objects.bulk_create([
+                OutstandingToken(
+                    user=user,
+                    jti=uuid.uuid4().hex,
+                    token="bench",
+                    created_at=now,
+                    expires_at=now - timedelta(days=1) if start + i < expired else now + timedelta(days=30),
+                )
+                for i in range(size)
+            ])
+            BlacklistedToken.objects.bulk_create([BlacklistedToken(token=t) for t in tokens])
+
+        self.stdout.write(f"table rows={OutstandingToken.objects.count()}")
+
+    def run(self, label: str, user, count: int):
+        refresh = str(ClaimsRefreshToken.for_user(user))
+        latencies = []
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                t0 = time.perf_counter()
+                serializer = ClaimsTokenRefreshSerializer(data={"refresh": refresh})
+                serializer.is_valid(raise_exception=True)
+                refresh = serializer.validated_data["refresh"]
+                latencies.append(time.perf_counter() - t0)
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+
+        self.stdout.write(
+            f"{label}: n={count} rate={count / elapsed:8.1f}/s  p50={p50:6.1f}ms  p99={p99:6.1f}ms  "
+            f"queries/refresh={len(queries.captured_queries) / count:.1f}"
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.jwt_blacklist import sync_blacklist_to_redis
+
+
+class Command(BaseCommand):
+    help = "Copy unexpired blacklisted refresh tokens from the database into Redis (first deploy, Redis loss)"
+
+    def handle(self, *args, **options):
+        synced = sync_blacklist_to_redis()
+        self.stdout.write(self.style.SUCCESS(f"synced={synced}"))
@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+from apps.users.entitlements import get_entitlements
+
+
+class EntitlementsMiddleware:
+    """
+    request.entitlements — лениво: юзера DRF проставит позже (JWT во view),
+    а кэш дергается только если к атрибуту реально обратились.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.entitlements = SimpleLazyObject(lambda: get_entitlements(getattr(request, "user", None)))
+        return self.get_response(request)
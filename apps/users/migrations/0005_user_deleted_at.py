@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_userprofile_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалён'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='purge_started_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
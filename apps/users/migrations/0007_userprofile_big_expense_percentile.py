@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 06:44
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_dataexport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='big_expense_percentile',
+            field=models.PositiveSmallIntegerField(default=95, validators=[django.core.validators.MinValueValidator(50), django.core.validators.MaxValueValidator(99)]),
+        ),
+    ]
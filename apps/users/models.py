@@ -1,9 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.core.validators import EmailValidator
+from django.core.validators import EmailValidator, MaxValueValidator, MinValueValidator
 from django.conf import settings
 from django.utils import timezone
-from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.auth.hashers import check_password
+from django.utils.crypto import constant_time_compare
 from datetime import timedelta
 
 class UserManager(BaseUserManager):
@@ -53,6 +54,9 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     is_active = models.BooleanField(default=True, verbose_name="Активен")
     is_staff = models.BooleanField(default=False, verbose_name="Доступ в админку")
+    # soft delete: юзер сразу неактивен, данные удаляет воркер (apps.management.purge)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Удалён")
+    purge_started_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -62,10 +66,38 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    # Юзер из JWT-claims (apps.users.authentication): id/is_active/is_staff взяты из токена,
+    # остальные поля отложены. Первое обращение к отложенному полю догружает все отложенные
+    # поля и claims (они могли устареть за время жизни токена). Уже присвоенные в памяти
+    # значения не затираем: claim перечитываем, только если он всё ещё равен значению из токена.
+    CLAIM_FIELDS = ("id", "is_active", "is_staff")
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        if fields is not None and getattr(self, "_from_claims", False):
+            claims = getattr(self, "_claim_values", {})
+            stale_claims = {
+                name for name in self.CLAIM_FIELDS
+                if name != "id" and name in claims and self.__dict__.get(name) == claims[name]
+            }
+            fields = set(fields) | self.get_deferred_fields() | stale_claims
+            self._from_claims = False
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    def save(self, *args, **kwargs):
+        # не перезаписываем строку значениями из токена: сохраняем только загруженные/изменённые поля
+        if getattr(self, "_from_claims", False) and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.attname for f in self._meta.concrete_fields
+                if f.attname in self.__dict__ and f.attname not in self.CLAIM_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     bio = models.TextField(blank=True, null=True)
     avatar = models.ImageField(upload_to="avatars/", blank=True, null=True)
+    # {"256": {"webp": "avatars/v/<profile_id>/<hash>.webp", "jpeg": "..."}} — заполняет воркер (apps.users.avatars)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     date_of_birth = models.DateField(null=True, blank=True)
 
     goals_achieved = models.PositiveIntegerField(default=0)   
@@ -75,6 +107,11 @@ class UserProfile(models.Model):
     theme = models.CharField(max_length=10, default="system") 
     language = models.CharField(max_length=5, default="ru")  
 
+    # "большой расход" = выше этого перцентиля своих трат в категории (apps.management.expense_sketch)
+    big_expense_percentile = models.PositiveSmallIntegerField(
+        default=95, validators=[MinValueValidator(50), MaxValueValidator(99)],
+    )
+
     def __str__(self):
         return f"Profile of {self.user.email}"
 
@@ -143,10 +180,17 @@ class OneTimeCode(models.Model):
         ]
 
     def set_code(self, code: str):
-        self.code_hash = make_password(code)
+        from apps.users.otp import hash_code
+
+        self.code_hash = hash_code(self.user_id, self.purpose, code)
 
     def check_code(self, code: str) -> bool:
-        return check_password(code, self.code_hash)
+        from apps.users.otp import hash_code
+
+        # старые строки захэшированы PBKDF2 (make_password)
+        if self.code_hash.startswith("pbkdf2_"):
+            return check_password(code, self.code_hash)
+        return constant_time_compare(self.code_hash, hash_code(self.user_id, self.purpose, code))
 
     def is_expired(self) -> bool:
         return timezone.now() >= self.expires_at
@@ -161,3 +205,85 @@ class OneTimeCode(models.Model):
             purpose=purpose,
             expires_at=timezone.now() + timedelta(minutes=ttl_minutes),
         )
+
+
+class EmailOutbox(models.Model):
+    """
+    Очередь писем: HTTP только кладёт строку, отправляет celery-воркер
+    пачками через одно SMTP-соединение.
+    В статусе sending next_attempt_at — конец аренды: воркер упал — письмо снова берут.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "В очереди"),
+        (STATUS_SENDING, "Отправляется"),
+        (STATUS_SENT, "Отправлено"),
+        (STATUS_FAILED, "Ошибка"),
+    )
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True, default="")
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+        verbose_name = "Письмо"
+        verbose_name_plural = "Очередь писем"
+
+    def __str__(self):
+        return f"{self.to}: {self.subject}"
+
+
+class DataExport(models.Model):
+    """
+    Выгрузка всех данных юзера (zip с NDJSON). Собирает celery-воркер,
+    файл живёт до expires_at, потом удаляется beat-задачей.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+    STATUS_EXPIRED = "expired"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "В очереди"),
+        (STATUS_RUNNING, "Собирается"),
+        (STATUS_READY, "Готово"),
+        (STATUS_FAILED, "Ошибка"),
+        (STATUS_EXPIRED, "Истекло"),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="data_exports")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+
+    file = models.FileField(upload_to="exports/", blank=True, null=True)
+    size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+            models.Index(fields=["status", "expires_at"]),
+        ]
+        verbose_name = "Выгрузка данных"
+        verbose_name_plural = "Выгрузки данных"
+
+    def __str__(self):
+        return f"Export #{self.id} ({self.status})"
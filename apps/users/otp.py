@@ -0,0 +1,177 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+
+from apps.users.models import OneTimeCode
+from apps.users.ratelimit import hit_fixed_window, login_key
+
+# -------------------------
+# OTP: короткие коды (сброс пароля).
+# Код живёт 10 минут и перебирается за 10^4 попыток, поэтому PBKDF2 тут не нужен:
+# HMAC-SHA256 с серверным секретом + жёсткий лимит попыток.
+# -------------------------
+
+OTP_TTL_MINUTES = getattr(settings, "OTP_TTL_MINUTES", 10)
+OTP_MAX_ATTEMPTS = getattr(settings, "OTP_MAX_ATTEMPTS", 5)
+OTP_AUDIT = getattr(settings, "OTP_AUDIT", True)
+
+# лимиты на запрос кода: сколько раз за окно (сек)
+OTP_LOGIN_LIMIT = getattr(settings, "OTP_LOGIN_LIMIT", 3)
+OTP_LOGIN_WINDOW = getattr(settings, "OTP_LOGIN_WINDOW", 600)
+OTP_IP_LIMIT = getattr(settings, "OTP_IP_LIMIT", 20)
+OTP_IP_WINDOW = getattr(settings, "OTP_IP_WINDOW", 3600)
+
+OK = "ok"
+INVALID = "invalid"
+NOT_FOUND = "not_found"
+EXPIRED = "expired"
+TOO_MANY = "too_many"
+
+
+def hash_code(user_id: int, purpose: str, code: str) -> str:
+    secret = getattr(settings, "OTP_SECRET", "") or settings.SECRET_KEY
+    return salted_hmac("users.otp", f"{user_id}:{purpose}:{code}", secret=secret, algorithm="sha256").hexdigest()
+
+
+def request_allowed(login: str, ip: str) -> bool:
+    """
+    Лимиты на выдачу кода: по логину и по IP. Считаем до поиска юзера,
+    чтобы ответ не зависел от того, существует ли он.
+    """
+    try:
+        if hit_fixed_window(f"otp:req:login:{login_key(login)}", OTP_LOGIN_WINDOW) > OTP_LOGIN_LIMIT:
+            return False
+        if hit_fixed_window(f"otp:req:ip:{ip}", OTP_IP_WINDOW) > OTP_IP_LIMIT:
+            return False
+    except Exception:
+        # Redis лёг — не блокируем сброс пароля
+        pass
+    return True
+
+
+class RedisOTPBackend:
+    """
+    Код в Redis: HASH {h, attempts} с TTL. Проверка и счётчик попыток — одним Lua-скриптом.
+    """
+
+    VERIFY_LUA = """
+    local h = redis.call('HGET', KEYS[1], 'h')
+    if not h then return -1 end
+    local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+    if attempts > tonumber(ARGV[2]) then return -2 end
+    if h == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+        return 1
+    end
+    return 0
+    """
+
+    @staticmethod
+    def key(user_id: int, purpose: str) -> str:
+        return f"otp:{purpose}:u{user_id}"
+
+    def issue(self, user, purpose: str, code: str) -> None:
+        conn = get_redis_connection("default")
+        key = self.key(user.id, purpose)
+
+        pipe = conn.pipeline()
+        pipe.delete(key)  # новый код отменяет старый
+        pipe.hset(key, mapping={"h": hash_code(user.id, purpose, code), "attempts": 0})
+        pipe.expire(key, OTP_TTL_MINUTES * 60)
+        pipe.execute()
+
+    def verify(self, user, purpose: str, code: str) -> str:
+        conn = get_redis_connection("default")
+        result = conn.eval(
+            self.VERIFY_LUA, 1, self.key(user.id, purpose),
+            hash_code(user.id, purpose, code), OTP_MAX_ATTEMPTS,
+        )
+        return {1: OK, 0: INVALID, -1: NOT_FOUND, -2: TOO_MANY}[int(result)]
+
+
+class DbOTPBackend:
+    """
+    Запасной вариант без Redis: таблица OneTimeCode (HMAC вместо PBKDF2).
+    """
+
+    def issue(self, user, purpose: str, code: str) -> None:
+        otp = OneTimeCode.create(user=user, purpose=purpose, ttl_minutes=OTP_TTL_MINUTES)
+        otp.set_code(code)
+        otp.save()
+
+    def verify(self, user, purpose: str, code: str) -> str:
+        otp = (
+            OneTimeCode.objects
+            .filter(user=user, purpose=purpose, used_at__isnull=True)
+            .order_by("-created_at")
+            .first()
+        )
+        if not otp:
+            return NOT_FOUND
+        if otp.is_expired():
+            return EXPIRED
+        if otp.attempts >= OTP_MAX_ATTEMPTS:
+            return TOO_MANY
+
+        if not otp.check_code(code):
+            otp.attempts += 1
+            otp.save(update_fields=["attempts"])
+            return INVALID
+
+        otp.used_at = timezone.now()
+        otp.save(update_fields=["used_at"])
+        return OK
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(getattr(settings, "OTP_BACKEND", "apps.users.otp.RedisOTPBackend"))()
+    return _backend
+
+
+def issue_code(user, purpose: str, code: str) -> None:
+    backend = get_backend()
+    backend.issue(user, purpose, code)
+
+    # аудит: строка в OneTimeCode (хэш, без самого кода); DB-бэкенд пишет её сам
+    if OTP_AUDIT and not isinstance(backend, DbOTPBackend):
+        otp = OneTimeCode.create(user=user, purpose=purpose, ttl_minutes=OTP_TTL_MINUTES)
+        otp.set_code(code)
+        otp.save()
+
+
+def verify_code(user, purpose: str, code: str) -> str:
+    backend = get_backend()
+    result = backend.verify(user, purpose, code)
+
+    if result == OK and OTP_AUDIT and not isinstance(backend, DbOTPBackend):
+        OneTimeCode.objects.filter(
+            user=user, purpose=purpose, used_at__isnull=True, expires_at__gt=timezone.now(),
+        ).update(used_at=timezone.now())
+    return result
+
+
+def purge_expired_codes(retention_days: int = 7, batch_size: int = 5000) -> int:
+    """
+    Удаляет протухшие OneTimeCode пачками по pk (без долгой блокировки таблицы).
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        ids = list(
+            OneTimeCode.objects.filter(expires_at__lt=cutoff)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        n, _ = OneTimeCode.objects.filter(id__in=ids).delete()
+        deleted += n
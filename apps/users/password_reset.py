@@ -1,14 +1,17 @@
 import secrets
 
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from django.utils import timezone
 from rest_framework import serializers, status
+from rest_framework.exceptions import Throttled
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.users import otp
+from apps.users.mail import queue_email
 from apps.users.models import OneTimeCode
+from apps.users.ratelimit import client_ip
+from apps.users.throttling import AuthFailureMixin, AuthRateThrottle
 
 User = get_user_model()
 
@@ -28,25 +31,28 @@ class PasswordResetRequestSerializer(serializers.Serializer):
     login = serializers.CharField()
 
     def save(self, **kwargs):
-        user = find_user_by_login(self.validated_data["login"])
+        login = self.validated_data["login"]
+
+        # лимит считаем до поиска юзера — ответ одинаковый для всех логинов
+        request = self.context.get("request")
+        ip = client_ip(request) if request else "unknown"
+        if not otp.request_allowed(login, ip):
+            raise Throttled(detail="Too many requests, try later")
+
+        user = find_user_by_login(login)
 
         # Не палим, существует ли юзер
         if not user:
             return
 
         code = gen_4digit()
+        otp.issue_code(user, OneTimeCode.PURPOSE_RESET, code)
 
-        otp = OneTimeCode.create(user=user, purpose=OneTimeCode.PURPOSE_RESET, ttl_minutes=10)
-        otp.set_code(code)
-        otp.save()
-
-        # отправляем на email пользователя
-        send_mail(
+        # отправит celery-воркер, запрос SMTP не ждёт
+        queue_email(
+            to=user.email,
             subject="Besh-Tashta: код для сброса пароля",
-            message=f"Ваш код: {code}\nДействует 10 минут.",
-            from_email=None,
-            recipient_list=[user.email],
-            fail_silently=False,
+            body=f"Ваш код: {code}\nДействует {otp.OTP_TTL_MINUTES} минут.",
         )
 
 
@@ -60,59 +66,51 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
         if not user:
             raise serializers.ValidationError({"detail": "Invalid data"})
 
-        otp = (
-            OneTimeCode.objects.filter(
-                user=user,
-                purpose=OneTimeCode.PURPOSE_RESET,
-                used_at__isnull=True,
-            )
-            .order_by("-created_at")
-            .first()
-        )
-        if not otp:
+        # код гасится внутри verify_code (одноразовый)
+        result = otp.verify_code(user, OneTimeCode.PURPOSE_RESET, attrs["code"].strip())
+        if result == otp.NOT_FOUND:
             raise serializers.ValidationError({"code": "Code not found"})
 
-        if otp.is_expired():
+        if result == otp.EXPIRED:
             raise serializers.ValidationError({"code": "Code expired"})
 
-        if otp.attempts >= 5:
+        if result == otp.TOO_MANY:
             raise serializers.ValidationError({"code": "Too many attempts"})
 
-        if not otp.check_code(attrs["code"].strip()):
-            otp.attempts += 1
-            otp.save(update_fields=["attempts"])
+        if result != otp.OK:
             raise serializers.ValidationError({"code": "Invalid code"})
 
         attrs["user"] = user
-        attrs["otp"] = otp
         return attrs
 
     def save(self, **kwargs):
         user = self.validated_data["user"]
-        otp = self.validated_data["otp"]
 
         user.set_password(self.validated_data["new_password"])
         user.save(update_fields=["password"])
 
-        otp.used_at = timezone.now()
-        otp.save(update_fields=["used_at"])
-
 
-class PasswordResetRequestView(APIView):
+class PasswordResetRequestView(AuthFailureMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "password_reset"
+    throttle_login_field = "login"
 
     def post(self, request):
-        s = PasswordResetRequestSerializer(data=request.data)
+        s = PasswordResetRequestSerializer(data=request.data, context={"request": request})
         s.is_valid(raise_exception=True)
         s.save()
         return Response({"detail": "If user exists, code sent"}, status=status.HTTP_200_OK)
 
 
-class PasswordResetConfirmView(APIView):
+class PasswordResetConfirmView(AuthFailureMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "password_reset_confirm"
+    throttle_login_field = "login"
 
     def post(self, request):
-        s = PasswordResetConfirmSerializer(data=request.data)
+        s = PasswordResetConfirmSerializer(data=request.data, context={"request": request})
         s.is_valid(raise_exception=True)
         s.save()
         return Response({"detail": "Password changed"}, status=status.HTTP_200_OK)
@@ -0,0 +1,29 @@
+from rest_framework.permissions import BasePermission
+
+from apps.users.entitlements import get_entitlements
+
+
+class IsPremium(BasePermission):
+    """
+    Доступ только с купленной привилегией. Проверка через кэш entitlements,
+    внутри запроса повторно не считается (request.entitlements).
+    """
+    message = "Доступно только с премиум-привилегией."
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and get_entitlements(request.user).is_premium)
+
+
+class HasPrivilege(BasePermission):
+    """
+    Доступ по конкретной привилегии: во view задаётся required_privilege_id.
+    """
+    message = "Нужна привилегия для этого действия."
+
+    def has_permission(self, request, view):
+        privilege_id = getattr(view, "required_privilege_id", None)
+        if privilege_id is None:
+            return True
+        if not (request.user and request.user.is_authenticated):
+            return False
+        return get_entitlements(request.user).has(privilege_id)
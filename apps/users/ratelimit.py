@@ -0,0 +1,34 @@
+import hashlib
+
+from django_redis import get_redis_connection
+
+# -------------------------
+# Счётчики запросов в Redis (auth, OTP)
+# -------------------------
+
+
+def client_ip(request) -> str:
+    # за nginx: X-Real-IP ставит сам nginx (devops/nginx/*.conf), клиент его не подделает
+    return (
+        request.META.get("HTTP_X_REAL_IP")
+        or request.META.get("REMOTE_ADDR")
+        or "unknown"
+    )
+
+
+def login_key(login: str) -> str:
+    # логин в ключ Redis кладём хэшем: не храним email/телефон в открытом виде
+    login = (login or "").strip().lower()
+    return hashlib.sha256(login.encode()).hexdigest()[:32]
+
+
+def hit_fixed_window(key: str, window: int) -> int:
+    """
+    +1 к счётчику окна, возвращает текущее значение. TTL ставится на первом хите.
+    """
+    conn = get_redis_connection("default")
+    pipe = conn.pipeline()
+    pipe.incr(key)
+    pipe.expire(key, window, nx=True)
+    count, _ = pipe.execute()
+    return int(count)
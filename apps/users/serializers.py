@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
+from apps.users.avatars import variant_urls
+from apps.users.tokens import ClaimsRefreshToken
 from apps.users.models import User, UserProfile, UserPrivilege
 
 from drf_spectacular.utils import extend_schema_field
@@ -15,13 +16,14 @@ class UserSerializer(serializers.ModelSerializer):
  
 class UserProfileSerializer(serializers.ModelSerializer):
     avatar_url = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = UserProfile
         fields = (
-            "bio", "avatar", "avatar_url", "date_of_birth",
+            "bio", "avatar", "avatar_url", "avatar_variants", "date_of_birth",
             "goals_achieved", "saving_days",
-            "notifications_enabled", "theme", "language",
+            "notifications_enabled", "theme", "language", "big_expense_percentile",
         )
         extra_kwargs = {"avatar": {"write_only": True}}
     def get_avatar_url(self, obj):
@@ -29,6 +31,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
             return obj.avatar.url
         return None
 
+    def get_avatar_variants(self, obj) -> dict:
+        # {"64": {"webp": url, "jpeg": url}, ...}; пусто, пока воркер не обработал загрузку
+        return variant_urls(obj) if obj.avatar else {}
+
 
 class RegisterSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -56,7 +62,7 @@ class RegisterSerializer(serializers.Serializer):
             first_name=validated_data.get("first_name", ""),
             last_name=validated_data.get("last_name", ""),
         )
-        UserProfile.objects.get_or_create(user=user)
+        UserProfile.objects.create(user=user)
         return user
 
 
@@ -79,7 +85,7 @@ class LoginSerializer(serializers.Serializer):
         if not user.is_active:
             raise serializers.ValidationError("Пользователь заблокирован")
 
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         return {"access": str(refresh.access_token), "refresh": str(refresh)}
 
 
@@ -92,7 +98,7 @@ class LogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
 
     def save(self, **kwargs):
-        refresh = RefreshToken(self.validated_data["refresh"])
+        refresh = ClaimsRefreshToken(self.validated_data["refresh"])
         refresh.blacklist()
         return {}
     
@@ -109,6 +115,7 @@ class MeUpdateSerializer(serializers.ModelSerializer):
     notifications_enabled = serializers.BooleanField(source="profile.notifications_enabled", required=False)
     theme = serializers.CharField(source="profile.theme", required=False)
     language = serializers.CharField(source="profile.language", required=False)
+    big_expense_percentile = serializers.IntegerField(source="profile.big_expense_percentile", required=False, min_value=50, max_value=99)
 
     class Meta:
         model = User
@@ -116,7 +123,7 @@ class MeUpdateSerializer(serializers.ModelSerializer):
             "first_name", "last_name",
             "bio", "avatar", "date_of_birth",
             "goals_achieved", "saving_days",
-            "notifications_enabled", "theme", "language",
+            "notifications_enabled", "theme", "language", "big_expense_percentile",
         )
 
     def update(self, instance, validated_data):
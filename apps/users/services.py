@@ -0,0 +1,156 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from apps.users.entitlements import has_premium
+from apps.users.models import UserProfile
+
+# -------------------------
+# Сводка профиля для MeView: кэш под "поколением" данных юзера.
+# Любое изменение денег/привилегий/профиля поднимает поколение — старые ключи
+# просто перестают читаться и истекают по TTL (без scan/delete).
+# -------------------------
+
+PROFILE_SUMMARY_TTL = getattr(settings, "PROFILE_SUMMARY_TTL", 600)
+
+ZERO = Value(Decimal("0"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def generation_key(user_id: int) -> str:
+    return f"users:gen:u{user_id}"
+
+
+def summary_key(user_id: int, generation: int) -> str:
+    return f"users:summary:u{user_id}:g{generation}"
+
+
+def data_generation(user_id: int) -> int:
+    """
+    Текущее поколение. Если ключ потерян (эвикция/рестарт Redis) — стартуем
+    с time_ns, чтобы не совпасть с поколением, под которым лежит старая сводка.
+    """
+    key = generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return int(generation)
+
+
+def bump_data_generation(user_id: int) -> None:
+    try:
+        cache.incr(generation_key(user_id))
+    except ValueError:
+        # ключа нет — следующий data_generation() заведёт новое поколение
+        pass
+    except Exception:
+        pass
+
+
+def get_or_create_profile(user) -> UserProfile:
+    # профиль создаётся при регистрации/соц. входе, это подстраховка для старых юзеров
+    profile, _ = UserProfile.objects.get_or_create(user=user)
+    return profile
+
+
+def calc_money_stats(user_id: int) -> dict:
+    """
+    Доходы, расходы и число операций — один проход по транзакциям юзера.
+    """
+    from apps.management.models import Transaction
+
+    totals = Transaction.objects.filter(user_id=user_id).aggregate(
+        income=Coalesce(Sum("amount", filter=Q(type=Transaction.INCOME)), ZERO),
+        expense=Coalesce(Sum("amount", filter=Q(type=Transaction.EXPENSE)), ZERO),
+        operations_count=Count("id"),
+    )
+    income, expense = totals["income"], totals["expense"]
+
+    economy_percent = 0
+    if income > 0:
+        economy_percent = int(((income - expense) / income) * 100)
+        economy_percent = max(0, min(100, economy_percent))
+
+    return {
+        "balance": str(income - expense),
+        "income_total": str(income),
+        "expense_total": str(expense),
+        "economy_percent": economy_percent,
+        "operations_count": totals["operations_count"],
+    }
+
+
+def build_profile_summary(user, profile: UserProfile, is_premium: bool, stats: dict) -> dict:
+    from apps.users.serializers import UserProfileSerializer, UserSerializer
+
+    return {
+        "user": UserSerializer(user).data,
+        "profile": UserProfileSerializer(profile).data,
+        "is_premium": is_premium,
+        "stats": {**stats, "goals_achieved": profile.goals_achieved},
+    }
+
+
+def compute_profile_summary(user_id: int) -> dict:
+    # юзер + профиль одним запросом, деньги — вторым; премиум — из кэша entitlements
+    profile = UserProfile.objects.select_related("user").filter(user_id=user_id).first()
+    if profile is None:
+        from django.contrib.auth import get_user_model
+
+        profile = get_or_create_profile(get_user_model().objects.get(id=user_id))
+
+    return build_profile_summary(profile.user, profile, has_premium(user_id), calc_money_stats(user_id))
+
+
+def _store_summary(user_id: int, generation: int, summary: dict) -> None:
+    """
+    Пишет сводку, только если поколение не сдвинулось, пока её считали:
+    иначе под новым поколением оказались бы данные до изменения.
+    """
+    try:
+        if data_generation(user_id) == generation:
+            cache.set(summary_key(user_id, generation), summary, PROFILE_SUMMARY_TTL)
+    except Exception:
+        pass
+
+
+def get_profile_summary(user_id: int) -> dict:
+    try:
+        generation = data_generation(user_id)
+        cached = cache.get(summary_key(user_id, generation))
+    except Exception:
+        generation, cached = None, None
+
+    if cached is not None:
+        return cached
+
+    summary = compute_profile_summary(user_id)
+    if generation is not None:
+        _store_summary(user_id, generation, summary)
+    return summary
+
+
+def write_profile_summary(user, profile: UserProfile, previous_generation: int | None = None) -> dict:
+    """
+    Write-through после PATCH /me: деньги и премиум берём из прошлой сводки
+    (они от PATCH не меняются), user/profile — из только что сохранённых объектов.
+    """
+    previous, generation = None, None
+    try:
+        generation = data_generation(user.id)
+        if previous_generation is not None:
+            previous = cache.get(summary_key(user.id, previous_generation))
+    except Exception:
+        previous = None
+
+    if previous is None or generation is None:
+        return get_profile_summary(user.id)
+
+    stats = {k: v for k, v in previous["stats"].items() if k != "goals_achieved"}
+    summary = build_profile_summary(user, profile, previous["is_premium"], stats)
+    _store_summary(user.id, generation, summary)
+    return summary
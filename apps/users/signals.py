@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.users.active_cache import set_user_active
+from apps.users.catalog import privileges_catalog
+from apps.users.entitlements import invalidate_entitlements
+from apps.users.models import Privilege, User, UserPrivilege, UserProfile
+from apps.users.services import bump_data_generation
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    set_user_active(instance.id, instance.is_active)
+    bump_data_generation(instance.id)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    set_user_active(instance.id, False)
+
+
+# сводка профиля (apps.users.services) — под поколением данных юзера
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=UserPrivilege)
+@receiver(post_delete, sender=UserPrivilege)
+def profile_data_changed(sender, instance, **kwargs):
+    bump_data_generation(instance.user_id)
+
+
+# покупка (BuyPrivilegeView), выдача/отзыв в админке, удаление самой привилегии (каскад)
+@receiver(post_save, sender=UserPrivilege)
+@receiver(post_delete, sender=UserPrivilege)
+def entitlements_changed(sender, instance, **kwargs):
+    invalidate_entitlements(instance.user_id)
+
+
+@receiver(post_save, sender=Privilege)
+@receiver(post_delete, sender=Privilege)
+def privileges_catalog_changed(sender, instance, **kwargs):
+    privileges_catalog.bump()
@@ -1,10 +1,7 @@
 from __future__ import annotations
 
-import time
 from typing import Any, Dict
 
-import jwt
-import requests
 from django.conf import settings
 from django.core import signing
 from django.db import IntegrityError, transaction
@@ -12,12 +9,11 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token as google_id_token
-
-from apps.users.models import SocialAccount
+from apps.users.jwks import decode_id_token
+from apps.users.models import SocialAccount, UserProfile
+from apps.users.throttling import AuthFailureMixin, AuthRateThrottle
+from apps.users.tokens import ClaimsRefreshToken
 from django.contrib.auth import get_user_model
 from drf_spectacular.utils import extend_schema
 from rest_framework import serializers
@@ -48,7 +44,7 @@ SOCIAL_SIGN_MAX_AGE = 600  # 10 минут
 
 
 def issue_jwt(user) -> Dict[str, str]:
-    refresh = RefreshToken.for_user(user)
+    refresh = ClaimsRefreshToken.for_user(user)
     return {"access": str(refresh.access_token), "refresh": str(refresh)}
 
 
@@ -72,43 +68,16 @@ def normalize_phone(phone: str) -> str:
     return (phone or "").strip()
 
 
-# ---------- Apple keys cache ----------
-APPLE_KEYS_CACHE: Dict[str, Any] = {"ts": 0, "keys": None}
-
-
-def _get_apple_keys() -> list[dict]:
-    now = int(time.time())
-    if APPLE_KEYS_CACHE["keys"] and now - APPLE_KEYS_CACHE["ts"] < 3600:
-        return APPLE_KEYS_CACHE["keys"]
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
 
-    r = requests.get("https://appleid.apple.com/auth/keys", timeout=10)
-    r.raise_for_status()
-    data = r.json()
 
-    APPLE_KEYS_CACHE["keys"] = data.get("keys", [])
-    APPLE_KEYS_CACHE["ts"] = now
-    return APPLE_KEYS_CACHE["keys"]
+def verify_google_id_token(token: str, audience: str) -> Dict[str, Any]:
+    # ключи из общего кэша (apps.users.jwks), без HTTP к Google на каждый логин
+    return decode_id_token("google", token, audience=audience, issuer=GOOGLE_ISSUERS)
 
 
 def verify_apple_identity_token(identity_token: str, audience: str) -> Dict[str, Any]:
-    header = jwt.get_unverified_header(identity_token)
-    kid = header.get("kid")
-
-    keys = _get_apple_keys()
-    jwk = next((k for k in keys if k.get("kid") == kid), None)
-    if not jwk:
-        raise ValueError("Apple public key not found")
-
-    public_key = jwt.algorithms.RSAAlgorithm.from_jwk(jwk)
-
-    payload = jwt.decode(
-        identity_token,
-        public_key,
-        algorithms=["RS256"],
-        audience=audience,
-        issuer="https://appleid.apple.com",
-    )
-    return payload
+    return decode_id_token("apple", identity_token, audience=audience, issuer="https://appleid.apple.com")
 
 
 def _email_verified_apple(payload: Dict[str, Any]) -> bool:
@@ -116,8 +85,10 @@ def _email_verified_apple(payload: Dict[str, Any]) -> bool:
     return ev in (True, "true", "True", 1, "1")
 
 
-class GoogleAuthView(APIView):
+class GoogleAuthView(AuthFailureMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "social"
     @extend_schema(
         tags=['Social Auth'],
         request=GoogleAuthRequestSerializer,
@@ -137,11 +108,7 @@ class GoogleAuthView(APIView):
             return Response({"detail": "GOOGLE_CLIENT_ID is not set"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         try:
-            info = google_id_token.verify_oauth2_token(
-                token,
-                google_requests.Request(),
-                google_client_id,
-            )
+            info = verify_google_id_token(token, google_client_id)
         except Exception:
             return Response({"detail": "Invalid Google token"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -184,12 +151,15 @@ class GoogleAuthView(APIView):
             )
 
             SocialAccount.objects.create(user=user, provider="google", uid=google_sub)
+            UserProfile.objects.create(user=user)
 
         return Response(issue_jwt(user), status=status.HTTP_200_OK)
 
 
-class AppleAuthView(APIView):
+class AppleAuthView(AuthFailureMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "social"
     @extend_schema(
         tags=['Social Auth'],
         summary="Вход через Apple",
@@ -256,16 +226,19 @@ class AppleAuthView(APIView):
             )
 
             SocialAccount.objects.create(user=user, provider="apple", uid=apple_sub)
+            UserProfile.objects.create(user=user)
 
         return Response(issue_jwt(user), status=status.HTTP_200_OK)
 
 
-class SocialCompleteView(APIView):
+class SocialCompleteView(AuthFailureMixin, APIView):
     """
     POST /auth/social/complete/
     Body: {signup_token, phone_number, first_name?, last_name?}
     """
     permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "social"
     @extend_schema(
         tags=['Social Auth'],
         request=SocialCompleteRequestSerializer,
@@ -323,5 +296,6 @@ class SocialCompleteView(APIView):
             )
 
             SocialAccount.objects.create(user=user, provider=provider, uid=uid)
+            UserProfile.objects.create(user=user)
 
         return Response(issue_jwt(user), status=status.HTTP_200_OK)
@@ -0,0 +1,61 @@
+from celery import shared_task
+
+from apps.users.avatars import process_avatar
+from apps.users.export import build_export, purge_expired_exports, sweep_stale_exports
+from apps.users.jwks import refresh_jwks
+from apps.users.jwt_blacklist import purge_expired_tokens, sync_blacklist_to_redis
+from apps.users.mail import send_outbox_batch
+from apps.users.otp import purge_expired_codes
+
+OUTBOX_MAX_BATCHES = 20
+
+
+@shared_task
+def send_email_outbox():
+    sent = 0
+    for _ in range(OUTBOX_MAX_BATCHES):
+        n = send_outbox_batch()
+        sent += n
+        if n == 0:
+            break
+    return sent
+
+
+@shared_task
+def purge_expired_otp_codes():
+    return purge_expired_codes()
+
+
+@shared_task
+def refresh_social_jwks():
+    return refresh_jwks()
+
+
+@shared_task
+def purge_expired_jwt_tokens():
+    return purge_expired_tokens()
+
+
+@shared_task
+def sync_jwt_blacklist():
+    return sync_blacklist_to_redis()
+
+
+@shared_task
+def process_avatar_task(profile_id: int, name: str, stale=()):
+    return process_avatar(profile_id, name, stale)
+
+
+@shared_task
+def build_data_export_task(export_id: int):
+    return build_export(export_id)
+
+
+@shared_task
+def purge_expired_data_exports():
+    return purge_expired_exports()
+
+
+@shared_task
+def sweep_stale_data_exports():
+    return sweep_stale_exports()
@@ -1,3 +1,716 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+
+from apps.management.models import Account
+from apps.users import jwks, otp, services, throttling
+from apps.users.active_cache import set_user_active
+from apps.users.avatars import AVATAR_SIZES, process_avatar, strip_upload
+from apps.users.authentication import ClaimsJWTAuthentication
+from apps.users.catalog import privileges_catalog
+from apps.users.entitlements import get_entitlements, has_premium
+from apps.users.export import build_export, request_export, sweep_stale_exports
+from apps.users.jwt_blacklist import (
+    SYNCED_KEY,
+    blacklist_key,
+    is_blacklisted,
+    sync_blacklist_to_redis,
+)
+from apps.users.mail import (
+    EMAIL_OUTBOX_LEASE_SECONDS,
+    EMAIL_OUTBOX_MAX_ATTEMPTS,
+    claim_outbox_batch,
+    queue_email,
+    send_outbox_batch,
+)
+from apps.users.models import (
+    DataExport,
+    EmailOutbox,
+    OneTimeCode,
+    Privilege,
+    User,
+    UserPrivilege,
+    UserProfile,
+)
+from apps.users.permissions import HasPrivilege, IsPremium
+from apps.users.social_auth import issue_jwt
+from apps.users.tokens import ClaimsRefreshToken
+from core.testing import FakeRedisMixin
+
+
+# -------------------------
+# Выгрузка данных
+# -------------------------
+
+class DataExportApiTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.delay = self.enterContext(mock.patch("apps.users.tasks.build_data_export_task.delay"))
+
+        self.user = User.objects.create_user(email="export@example.com", password="pass12345")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_build_download(self):
+        self.assertEqual(self.client.get("/api/v1/users/me/export/").json(), {"status": None})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post("/api/v1/users/me/export/")
+        self.assertEqual(r.status_code, 202)
+        self.assertEqual(r.json()["status"], DataExport.STATUS_PENDING)
+        self.delay.assert_called_once_with(r.json()["id"])
+
+        # повторный запрос, пока идёт сборка, возвращает ту же выгрузку
+        self.assertEqual(self.client.post("/api/v1/users/me/export/").json()["id"], r.json()["id"])
+
+        self.assertEqual(build_export(r.json()["id"]), DataExport.STATUS_READY)
+        self.assertEqual(build_export(r.json()["id"]), "skipped")
+
+        status = self.client.get("/api/v1/users/me/export/").json()
+        self.assertEqual(status["status"], DataExport.STATUS_READY)
+
+        download = APIClient().get(status["url"].replace("http://testserver", ""))
+        self.assertEqual(download.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(download.streaming_content)))
+        self.assertIn("manifest.json", archive.namelist())
+        self.assertNotIn("password", archive.read("user.ndjson").decode())
+
+    def test_bad_download_token(self):
+        self.assertEqual(APIClient().get("/api/v1/users/me/export/download/abc/").status_code, 404)
+
+    def test_stale_running_export_does_not_block_new_one(self):
+        stuck = DataExport.objects.create(user=self.user, status=DataExport.STATUS_RUNNING)
+        DataExport.objects.filter(pk=stuck.pk).update(started_at=timezone.now() - timedelta(hours=2))
+
+        export, created = request_export(self.user)
+        self.assertTrue(created)
+        self.assertNotEqual(export.pk, stuck.pk)
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.status, DataExport.STATUS_FAILED)
+
+    def test_sweep_requeues_lost_pending_export(self):
+        lost = DataExport.objects.create(user=self.user)
+        DataExport.objects.filter(pk=lost.pk).update(created_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(sweep_stale_exports(), {"failed": 0, "requeued": 1})
+        self.delay.assert_called_once_with(lost.pk)
+
+
+# -------------------------
+# Очередь писем
+# -------------------------
+
+class EmailOutboxTests(TestCase):
+    def queue(self, n: int = 1) -> list[EmailOutbox]:
+        return [queue_email(to=f"to{i}@example.com", subject="Код", body=f"123{i}") for i in range(n)]
+
+    def test_queue_kicks_worker_after_commit(self):
+        with mock.patch("apps.users.tasks.send_email_outbox.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.queue()
+        delay.assert_called_once_with()
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.queue(3)
+        self.assertEqual(send_outbox_batch(), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(
+            set(EmailOutbox.objects.values_list("status", "body")),
+            {(EmailOutbox.STATUS_SENT, "")},
+        )
+        self.assertEqual(send_outbox_batch(), 0)
+
+    def test_claimed_items_are_reclaimed_after_lease(self):
+        item, = self.queue()
+        now = timezone.now()
+        self.assertEqual([i.pk for i in claim_outbox_batch(10, now)], [item.pk])
+        # воркер "упал" с письмом на руках: до конца аренды его никто не берёт
+        self.assertEqual(claim_outbox_batch(10, now + timedelta(seconds=1)), [])
+        later = now + timedelta(seconds=EMAIL_OUTBOX_LEASE_SECONDS + 1)
+        self.assertEqual([i.pk for i in claim_outbox_batch(10, later)], [item.pk])
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        item, = self.queue()
+        with mock.patch("apps.users.mail.EmailMessage.send", side_effect=OSError("smtp down")):
+            self.assertEqual(send_outbox_batch(), 0)
+            item.refresh_from_db()
+            self.assertEqual((item.status, item.attempts, item.last_error), (EmailOutbox.STATUS_PENDING, 1, "smtp down"))
+            self.assertGreater(item.next_attempt_at, timezone.now() + timedelta(seconds=20))
+
+            for _ in range(EMAIL_OUTBOX_MAX_ATTEMPTS - 1):
+                EmailOutbox.objects.filter(pk=item.pk).update(next_attempt_at=timezone.now())
+                send_outbox_batch()
+
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts, item.body), (EmailOutbox.STATUS_FAILED, EMAIL_OUTBOX_MAX_ATTEMPTS, ""))
+
+
+# -------------------------
+# Одноразовые коды
+# -------------------------
+
+class OtpTests(FakeRedisMixin, TestCase):
+    purpose = OneTimeCode.PURPOSE_RESET
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="otp@example.com", password="pass12345")
+
+    def test_redis_code_is_stored_as_hmac_and_used_once(self):
+        otp.issue_code(self.user, self.purpose, "1234")
+        stored = self.redis.hgetall(otp.RedisOTPBackend.key(self.user.id, self.purpose))
+        self.assertEqual(stored[b"h"].decode(), otp.hash_code(self.user.id, self.purpose, "1234"))
+
+        self.assertEqual(otp.verify_code(self.user, self.purpose, "0000"), otp.INVALID)
+        self.assertEqual(otp.verify_code(self.user, self.purpose, "1234"), otp.OK)
+        self.assertEqual(otp.verify_code(self.user, self.purpose, "1234"), otp.NOT_FOUND)
+
+        audit = OneTimeCode.objects.get(user=self.user)
+        self.assertNotIn("1234", audit.code_hash)
+        self.assertIsNotNone(audit.used_at)
+
+    def test_redis_attempts_are_limited(self):
+        otp.issue_code(self.user, self.purpose, "1234")
+        for _ in range(otp.OTP_MAX_ATTEMPTS):
+            otp.verify_code(self.user, self.purpose, "0000")
+        self.assertEqual(otp.verify_code(self.user, self.purpose, "1234"), otp.TOO_MANY)
+
+    def test_db_backend(self):
+        backend = otp.DbOTPBackend()
+        backend.issue(self.user, self.purpose, "1234")
+        for _ in range(otp.OTP_MAX_ATTEMPTS):
+            self.assertEqual(backend.verify(self.user, self.purpose, "0000"), otp.INVALID)
+        self.assertEqual(backend.verify(self.user, self.purpose, "1234"), otp.TOO_MANY)
+
+        backend.issue(self.user, self.purpose, "5678")
+        self.assertEqual(backend.verify(self.user, self.purpose, "5678"), otp.OK)
+
+        OneTimeCode.objects.update(used_at=None, attempts=0, expires_at=timezone.now())
+        self.assertEqual(backend.verify(self.user, self.purpose, "5678"), otp.EXPIRED)
+
+    def test_legacy_pbkdf2_rows_still_verify(self):
+        code = OneTimeCode.create(user=self.user, purpose=self.purpose, ttl_minutes=10)
+        code.code_hash = make_password("1234")
+        self.assertTrue(code.check_code("1234"))
+        self.assertFalse(code.check_code("0000"))
+
+    def test_request_limit_per_login(self):
+        allowed = [otp.request_allowed("OTP@example.com ", f"10.0.0.{i}") for i in range(otp.OTP_LOGIN_LIMIT + 1)]
+        self.assertEqual(allowed, [True] * otp.OTP_LOGIN_LIMIT + [False])
+        self.assertTrue(otp.request_allowed("other@example.com", "10.0.0.1"))
+
+    def test_purge_expired_codes(self):
+        for days in (1, 8, 9):
+            code = OneTimeCode.create(user=self.user, purpose=self.purpose, ttl_minutes=10)
+            code.set_code("1234")
+            code.expires_at = timezone.now() - timedelta(days=days)
+            code.save()
+        self.assertEqual(otp.purge_expired_codes(batch_size=1), 2)
+        self.assertEqual(OneTimeCode.objects.count(), 1)
+
+
+# -------------------------
+# Stateless JWT
+# -------------------------
+
+class ClaimsJWTAuthenticationTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="claims@example.com", password="pass12345")
+        set_user_active(self.user.id, True)
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        return ClaimsJWTAuthentication().authenticate(request)
+
+    def test_user_is_built_from_claims_without_query(self):
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(access)
+        self.assertEqual((user.pk, user.is_active, user.is_staff), (self.user.pk, True, False))
+
+        # остальные поля догружаются при первом обращении
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "claims@example.com")
+
+    def test_blocked_user_is_rejected_before_token_expires(self):
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        set_user_active(self.user.id, False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    def test_token_without_claims_falls_back_to_db(self):
+        access = RefreshToken.for_user(self.user).access_token
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(access)
+        self.assertEqual(user.email, "claims@example.com")
+
+
+# -------------------------
+# Sliding window (Lua)
+# -------------------------
+
+class ParseRateTests(SimpleTestCase):
+    def test_drf_format(self):
+        self.assertEqual(throttling.parse_rate("20/min"), (20, 60))
+        self.assertEqual(throttling.parse_rate("200/s"), (200, 1))
+        self.assertEqual(throttling.parse_rate("10/hour"), (10, 3600))
+
+
+class SlidingWindowTests(FakeRedisMixin, SimpleTestCase):
+    window_start = 1_699_999_980.0  # кратно 60
+    now = window_start + 40
+    ident = "test"
+
+    def check(self, *limits, now=None):
+        return throttling.check_sliding_windows(list(limits), now=self.now if now is None else now)
+
+    def test_limit_within_window(self):
+        limit = ("test:ip", self.ident, "3/m")
+        self.assertEqual([self.check(limit) for _ in range(3)], [None, None, None])
+        self.assertEqual(self.check(limit), ("test:ip", 60))
+
+    def test_previous_window_is_weighted(self):
+        limit = ("test:ip", self.ident, "3/m")
+        for _ in range(3):
+            self.check(limit)
+
+        # середина следующего окна: прошлое весит 3 * 0.5 = 1.5 -> пропускаем ещё два
+        half_later = self.window_start + 60 + 30
+        self.assertIsNone(self.check(limit, now=half_later))
+        self.assertIsNone(self.check(limit, now=half_later))
+        self.assertEqual(self.check(limit, now=half_later), ("test:ip", 60))
+
+    def test_rejection_does_not_count_in_other_dimensions(self):
+        ip = ("test:ip", self.ident, "10/m")
+        login = ("test:login", self.ident, "1/m")
+        self.assertIsNone(self.check(ip, login))
+        self.assertEqual(self.check(ip, login), ("test:login", 60))
+        # отклонённый запрос не списался с окна по IP
+        for _ in range(9):
+            self.assertIsNone(self.check(ip))
+        self.assertEqual(self.check(ip), ("test:ip", 60))
+
+    def test_check_only_dimension_counts_failures(self):
+        failures = ("test:global", self.ident, "2/m", False)
+        for _ in range(5):
+            self.assertIsNone(self.check(failures))
+
+        throttling.record_failure("test:global", self.ident, "2/m", now=self.now)
+        throttling.record_failure("test:global", self.ident, "2/m", now=self.now)
+        self.assertEqual(self.check(failures), ("test:global", 60))
+
+
+class LoginThrottleTests(FakeRedisMixin, TestCase):
+    def test_per_login_limit_across_ips(self):
+        client = APIClient()
+        limit, _ = throttling.parse_rate(throttling.AUTH_THROTTLE_RATES["login"]["login"])
+        body = {"login": "victim@example.com", "password": "wrong"}
+
+        for i in range(limit):
+            r = client.post("/api/v1/users/auth/login/", body, format="json", REMOTE_ADDR=f"10.0.0.{i}")
+            self.assertEqual(r.status_code, 400)
+
+        r = client.post("/api/v1/users/auth/login/", body, format="json", REMOTE_ADDR="10.0.1.1")
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(throttling.rejected_counts(), {"login:login": 1})
+
+
+# -------------------------
+# JWKS провайдеров
+# -------------------------
+
+class JwksTests(FakeRedisMixin, SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.jwk = {**json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(cls.private_key.public_key())), "kid": "k1"}
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.dict(jwks._parsed, clear=True))
+        self.enterContext(mock.patch.dict(jwks._backoff_until, clear=True))
+        response = mock.Mock(headers={"Cache-Control": "public, max-age=3600"})
+        response.json.return_value = {"keys": [self.jwk]}
+        self.get = self.enterContext(mock.patch("apps.users.jwks.requests.get", return_value=response))
+
+    def new_worker(self):
+        jwks._parsed.clear()
+        jwks._backoff_until.clear()
+
+    def test_keys_are_fetched_once_and_shared(self):
+        self.assertIsNotNone(jwks.get_public_key("google", "k1"))
+        self.assertIsNotNone(jwks.get_public_key("google", "k1"))
+        self.new_worker()
+        self.assertIsNotNone(jwks.get_public_key("google", "k1"))
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_decode_id_token(self):
+        token = jwt.encode(
+            {"sub": "42", "aud": "client", "iss": "https://accounts.google.com"},
+            self.private_key, algorithm="RS256", headers={"kid": "k1"},
+        )
+        claims = jwks.decode_id_token("google", token, audience="client", issuer="https://accounts.google.com")
+        self.assertEqual(claims["sub"], "42")
+
+    def test_provider_outage_serves_stale_keys_with_shared_backoff(self):
+        # в Redis остались только давно протухшие ключи
+        doc = jwks.fetch_jwks("google")
+        cache.set(jwks.jwks_cache_key("google"), json.dumps({**doc, "fetched_at": 0, "expires_at": 0}))
+        self.new_worker()
+
+        self.get.reset_mock()
+        self.get.side_effect = OSError("timeout")
+        self.assertIsNotNone(jwks.get_public_key("google", "k1"))
+        self.assertIsNotNone(jwks.get_public_key("google", "k1"))
+        self.new_worker()
+        self.assertIsNotNone(jwks.get_public_key("google", "k1"))
+        self.assertEqual(self.get.call_count, 1)
+
+        with self.assertRaises(ValueError):
+            jwks.get_public_key("google", "unknown")
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_refresh_only_missing_or_expiring(self):
+        self.assertEqual(jwks.refresh_jwks(), ["google", "apple"])
+        self.assertEqual(jwks.refresh_jwks(), [])
+        self.assertEqual(jwks.refresh_jwks(force=True), ["google", "apple"])
+
+
+# -------------------------
+# Refresh / blacklist
+# -------------------------
+
+class RefreshBlacklistTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch("apps.users.tasks.sync_jwt_blacklist.delay"))
+        self.user = User.objects.create_user(email="jwt@example.com", password="pass12345")
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post("/api/v1/users/auth/refresh/", {"refresh": token}, format="json")
+
+    def test_rotated_refresh_cannot_be_reused(self):
+        tokens = issue_jwt(self.user)
+
+        r = self.refresh(tokens["refresh"])
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r.json()["refresh"], tokens["refresh"])
+
+        self.assertEqual(self.refresh(tokens["refresh"]).status_code, 401)
+        self.assertEqual(self.refresh(r.json()["refresh"]).status_code, 200)
+
+    def test_reuse_is_rejected_after_redis_was_flushed(self):
+        tokens = issue_jwt(self.user)
+        self.assertEqual(self.refresh(tokens["refresh"]).status_code, 200)
+
+        jti = UntypedToken(tokens["refresh"])["jti"]
+        self.redis.delete(blacklist_key(jti), SYNCED_KEY)
+
+        # промах без маркера синхронизации -> журнал в БД
+        self.assertEqual(self.refresh(tokens["refresh"]).status_code, 401)
+        self.assertTrue(self.redis.exists(blacklist_key(jti)))
+
+    def test_inactive_user_cannot_refresh(self):
+        tokens = issue_jwt(self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.refresh(tokens["refresh"]).status_code, 401)
+
+
+class BlacklistMarkerTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="marker@example.com", password="pass12345")
+        self.sync = self.enterContext(mock.patch("apps.users.tasks.sync_jwt_blacklist.delay"))
+
+    def revoke(self) -> str:
+        refresh = RefreshToken.for_user(self.user)
+        token = OutstandingToken.objects.get(jti=refresh["jti"])
+        BlacklistedToken.objects.create(token=token)
+        return refresh["jti"]
+
+    def test_miss_is_trusted_only_after_sync(self):
+        jti = self.revoke()
+
+        # маркера нет — проверяем по журналу и один раз ставим синхронизацию в очередь
+        self.assertTrue(is_blacklisted(jti))
+        self.assertFalse(is_blacklisted("other"))
+        self.sync.assert_called_once_with()
+
+        self.redis.delete(blacklist_key(jti))
+        self.assertEqual(sync_blacklist_to_redis(), 1)
+        self.assertTrue(self.redis.exists(SYNCED_KEY))
+
+        with self.assertNumQueries(0):
+            self.assertTrue(is_blacklisted(jti))
+            self.assertFalse(is_blacklisted("other"))
+
+    def test_flush_during_sync_leaves_no_marker(self):
+        self.revoke()
+        with mock.patch("apps.users.jwt_blacklist.BlacklistedToken.objects.filter", side_effect=self.flush_then_filter):
+            sync_blacklist_to_redis()
+        self.assertFalse(self.redis.exists(SYNCED_KEY))
+
+    def flush_then_filter(self, *args, **kwargs):
+        self.redis.flushall()
+        return BlacklistedToken._default_manager.get_queryset().filter(*args, **kwargs)
+
+
+# -------------------------
+# Сводка профиля (/me)
+# -------------------------
+
+class ProfileSummaryCacheTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="summary@example.com", password="pass12345")
+        UserProfile.objects.create(user=self.user)  # как при регистрации
+        self.account = Account.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_second_read_is_cached_until_data_changes(self):
+        self.assertEqual(self.client.get("/api/v1/users/me/").json()["stats"]["operations_count"], 0)
+        with self.assertNumQueries(0):
+            services.get_profile_summary(self.user.id)
+
+        r = self.client.post(
+            "/api/v1/management/transactions/",
+            {
+                "account": self.account.id,
+                "type": "INCOME",
+                "amount": "150.00",
+                "occurred_at": timezone.now().isoformat(),
+            },
+            format="json",
+        )
+        self.assertEqual(r.status_code, 201)
+        stats = self.client.get("/api/v1/users/me/").json()["stats"]
+        self.assertEqual((stats["operations_count"], Decimal(stats["balance"])), (1, Decimal("150")))
+
+    def test_summary_is_not_stored_if_generation_moved_during_compute(self):
+        generation = services.data_generation(self.user.id)
+        compute = services.compute_profile_summary
+
+        def compute_and_bump(user_id):
+            summary = compute(user_id)
+            services.bump_data_generation(user_id)  # данные поменялись, пока считали
+            return summary
+
+        with mock.patch("apps.users.services.compute_profile_summary", side_effect=compute_and_bump):
+            services.get_profile_summary(self.user.id)
+
+        self.assertIsNone(cache.get(services.summary_key(self.user.id, generation)))
+        self.assertIsNone(cache.get(services.summary_key(self.user.id, generation + 1)))
+
+    def test_lost_generation_does_not_resurrect_old_summary(self):
+        generation = services.data_generation(self.user.id)
+        services.get_profile_summary(self.user.id)
+        cache.delete(services.generation_key(self.user.id))
+        self.assertNotEqual(services.data_generation(self.user.id), generation)
+
+
+# -------------------------
+# Аватары
+# -------------------------
+
+def photo_with_exif(width: int = 40, height: int = 20) -> bytes:
+    image = Image.new("RGB", (width, height), (200, 30, 30))
+    exif = image.getexif()
+    exif[0x0112] = 6  # Orientation: повернуть на 90°
+    exif[0x010F] = "PhoneMaker"
+    exif[0x8825] = {1: "N", 2: (42.0, 52.0, 0.0)}  # GPSInfo
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", exif=exif.tobytes())
+    return buf.getvalue()
+
+
+class AvatarTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+        self.user = User.objects.create_user(email="avatar@example.com", password="pass12345")
+        self.profile = UserProfile.objects.create(user=self.user)
+
+    def test_strip_upload_drops_exif_and_applies_rotation(self):
+        upload = SimpleUploadedFile("me.jpg", photo_with_exif(), content_type="image/jpeg")
+        stripped = strip_upload(upload)
+
+        self.assertNotEqual(stripped.name, "me.jpg")
+        image = Image.open(stripped)
+        self.assertEqual(image.size, (20, 40))
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_strip_upload_leaves_non_images_to_validation(self):
+        upload = SimpleUploadedFile("me.jpg", b"not an image", content_type="image/jpeg")
+        self.assertIs(strip_upload(upload), upload)
+
+    def test_patch_stores_clean_file_and_schedules_variants(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile("me.jpg", photo_with_exif(), content_type="image/jpeg")
+
+        with mock.patch("apps.users.tasks.process_avatar_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                r = client.patch("/api/v1/users/me/", {"avatar": upload}, format="multipart")
+        self.assertEqual(r.status_code, 200)
+
+        self.profile.refresh_from_db()
+        with default_storage.open(self.profile.avatar.name) as f:
+            self.assertEqual(dict(Image.open(f).getexif()), {})
+        delay.assert_called_once_with(self.profile.id, self.profile.avatar.name, [])
+
+    def test_process_avatar_renders_variants_and_drops_upload(self):
+        self.profile.avatar = strip_upload(SimpleUploadedFile("me.jpg", photo_with_exif(300, 200)))
+        self.profile.save()
+        upload_name = self.profile.avatar.name
+
+        self.assertTrue(process_avatar(self.profile.id, upload_name))
+        self.profile.refresh_from_db()
+
+        self.assertEqual(set(self.profile.avatar_variants), {str(size) for size in AVATAR_SIZES})
+        with default_storage.open(self.profile.avatar_variants["64"]["webp"]) as f:
+            self.assertEqual(Image.open(f).size, (64, 64))
+        self.assertTrue(self.profile.avatar.name.startswith(f"avatars/v/{self.profile.id}/"))
+        self.assertFalse(default_storage.exists(upload_name))
+
+        # задача по устаревшей загрузке ничего не трогает
+        self.assertFalse(process_avatar(self.profile.id, upload_name))
+
+
+# -------------------------
+# Привилегии
+# -------------------------
+
+class PremiumView(APIView):
+    permission_classes = [IsPremium, HasPrivilege]
+    required_privilege_id = None
+
+    def get(self, request):
+        return Response({"ok": True})
+
+
+class EntitlementsTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="premium@example.com", password="pass12345")
+        self.privilege = Privilege.objects.create(name="Premium", description="", price=Decimal("99"))
+
+    def call(self, view, user):
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=user)
+        return view(request).status_code
+
+    def test_premium_is_cached_and_reset_on_purchase(self):
+        self.assertFalse(has_premium(self.user.id))
+        with self.assertNumQueries(0):
+            self.assertFalse(has_premium(self.user.id))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.post(f"/api/v1/users/privileges/{self.privilege.id}/buy/").status_code, 201)
+        self.assertTrue(has_premium(self.user.id))
+
+        UserPrivilege.objects.filter(user=self.user).delete()
+        self.assertFalse(has_premium(self.user.id))
+
+    def test_entitlements_are_memoized_per_request_user(self):
+        UserPrivilege.objects.create(user=self.user, privilege=self.privilege)
+        first = get_entitlements(self.user)
+        with mock.patch("apps.users.entitlements.cache.get") as cache_get:
+            self.assertIs(get_entitlements(self.user), first)
+        cache_get.assert_not_called()
+        self.assertTrue(first.has(self.privilege.id))
+
+    def test_permissions(self):
+        view = PremiumView.as_view()
+        self.assertEqual(self.call(view, self.user), 403)
+
+        UserPrivilege.objects.create(user=self.user, privilege=self.privilege)
+        self.assertEqual(self.call(view, User.objects.get(pk=self.user.pk)), 200)
+
+        other = Privilege.objects.create(name="Export", description="", price=Decimal("10"))
+        strict = PremiumView.as_view(required_privilege_id=other.id)
+        self.assertEqual(self.call(strict, User.objects.get(pk=self.user.pk)), 403)
+
+
+# -------------------------
+# Справочники с ETag
+# -------------------------
+
+class PrivilegesCatalogTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.object(privileges_catalog, "_local", None))
+        privileges_catalog.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Privilege.objects.create(name="Premium", description="", price=Decimal("99"))
+
+    def get(self, **headers):
+        return APIClient().get("/api/v1/users/privileges/", **headers)
+
+    def test_etag_and_304(self):
+        r = self.get()
+        self.assertEqual([p["name"] for p in r.json()], ["Premium"])
+        self.assertIn("public", r["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            r304 = self.get(HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(r304.status_code, 304)
+        self.assertEqual(r304["ETag"], r["ETag"])
+
+    def test_other_process_reads_from_redis(self):
+        etag = self.get()["ETag"]
+        privileges_catalog._local = None
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get()["ETag"], etag)
+
+    def test_admin_change_bumps_version(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Privilege.objects.create(name="Family", description="", price=Decimal("199"))
+
+        r = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([p["name"] for p in r.json()], ["Premium", "Family"])
+
+    def test_bump_after_lost_version_starts_new_one(self):
+        etag = self.get()["ETag"]
+        version = privileges_catalog.version()
+        cache.delete(privileges_catalog.version_key())
+
+        with self.assertLogs("apps.users.catalog", "WARNING"):
+            with self.captureOnCommitCallbacks(execute=True):
+                Privilege.objects.filter(name="Premium").update(price=Decimal("89"))
+                privileges_catalog.bump()
+        self.assertNotEqual(privileges_catalog.version(), version)
+        self.assertNotEqual(self.get()["ETag"], etag)
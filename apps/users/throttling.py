@@ -0,0 +1,198 @@
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from rest_framework.throttling import BaseThrottle
+
+from apps.users.ratelimit import client_ip, login_key
+
+# -------------------------
+# Троттлинг auth-эндпоинтов: sliding window (два фиксированных окна с весом)
+# по IP, по логину и глобально. Проверка — один Lua-скрипт до парсинга пароля/хэширования.
+# Глобальное окно считает только неудачные попытки (ответ 4xx): поток обычных входов
+# в час пик не закрывает auth для всех, а credential stuffing — закрывает.
+# -------------------------
+
+AUTH_THROTTLE_ENABLED = getattr(settings, "AUTH_THROTTLE_ENABLED", True)
+AUTH_THROTTLE_RATES = getattr(settings, "AUTH_THROTTLE_RATES", {})
+AUTH_THROTTLE_GLOBAL = getattr(settings, "AUTH_THROTTLE_GLOBAL", "200/s")
+
+GLOBAL_DIMENSION = "auth:global"
+
+METRICS_TTL = 60 * 60 * 24 * 7
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """
+    "20/min" -> (20, 60). Формат как у DRF.
+    """
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+# Сначала проверяем все измерения, потом (если пропускаем) считаем хит в тех,
+# где count = 1. Отклонённые запросы окно не продлевают.
+_SLIDING_LUA = """
+local n = #KEYS / 2
+for i = 1, n do
+    local curr = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local prev = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    local limit = tonumber(ARGV[4 * i - 3])
+    local weight = tonumber(ARGV[4 * i - 2])
+    if prev * weight + curr >= limit then
+        return i
+    end
+end
+for i = 1, n do
+    if ARGV[4 * i] == '1' then
+        redis.call('INCR', KEYS[2 * i - 1])
+        redis.call('EXPIRE', KEYS[2 * i - 1], tonumber(ARGV[4 * i - 1]))
+    end
+end
+return 0
+"""
+
+
+def metrics_key(day: str | None = None) -> str:
+    return f"auth:throttle:rejected:{day or time.strftime('%Y%m%d')}"
+
+
+def record_rejection(scope: str, dimension: str) -> None:
+    try:
+        conn = get_redis_connection("default")
+        key = metrics_key()
+        pipe = conn.pipeline()
+        pipe.hincrby(key, f"{scope}:{dimension}", 1)
+        pipe.expire(key, METRICS_TTL)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def rejected_counts(day: str | None = None) -> dict[str, int]:
+    """
+    {"login:ip": 12, "login:global": 3, ...} за день (YYYYMMDD, по умолчанию сегодня).
+    """
+    conn = get_redis_connection("default")
+    raw = conn.hgetall(metrics_key(day))
+    return {k.decode() if isinstance(k, bytes) else k: int(v) for k, v in raw.items()}
+
+
+def _window_keys(dimension: str, ident: str, window: int, now: float) -> tuple[str, str]:
+    index = int(now // window)
+    return f"throttle:{dimension}:{ident}:{index}", f"throttle:{dimension}:{ident}:{index - 1}"
+
+
+def check_sliding_windows(limits: list[tuple], now: float | None = None):
+    """
+    limits: [(dimension, ident, rate)] или [(dimension, ident, rate, count)]:
+    count=False — лимит только проверяется, хит не считается (его добавит record_failure).
+    Возвращает None (пропускаем) или (dimension, retry_after_sec) первого превышенного лимита.
+    """
+    now = time.time() if now is None else now
+    keys, args, windows = [], [], []
+
+    for dimension, ident, rate, *rest in limits:
+        count = rest[0] if rest else True
+        limit, window = parse_rate(rate)
+        weight = 1 - (now % window) / window
+        keys += _window_keys(dimension, ident, window, now)
+        args += [limit, weight, window * 2, 1 if count else 0]
+        windows.append(window)
+
+    conn = get_redis_connection("default")
+    rejected = int(conn.eval(_SLIDING_LUA, len(keys), *keys, *args))
+    if not rejected:
+        return None
+
+    # точное время до освобождения без счётчиков не посчитать — отдаём верхнюю границу
+    return limits[rejected - 1][0], windows[rejected - 1]
+
+
+def record_failure(dimension: str, ident: str, rate: str, now: float | None = None) -> None:
+    now = time.time() if now is None else now
+    _, window = parse_rate(rate)
+    key, _ = _window_keys(dimension, ident, window, now)
+    try:
+        conn = get_redis_connection("default")
+        pipe = conn.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, window * 2)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+class AuthRateThrottle(BaseThrottle):
+    """
+    Во view: throttle_classes = [AuthRateThrottle], throttle_scope = "login",
+    throttle_login_field = "login" (поле тела с email/телефоном, если есть).
+    Неудачные ответы в глобальное окно пишет AuthFailureMixin этого же view.
+    """
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_limits(self, request, view) -> list[tuple[str, str, str]]:
+        scope = getattr(view, "throttle_scope", None)
+        rates = AUTH_THROTTLE_RATES.get(scope, {})
+        limits = []
+
+        if rates.get("ip"):
+            limits.append((f"{scope}:ip", client_ip(request), rates["ip"]))
+
+        login_field = getattr(view, "throttle_login_field", None)
+        if login_field and rates.get("login"):
+            try:
+                login = request.data.get(login_field)
+            except Exception:
+                login = None
+            if login and isinstance(login, str):
+                limits.append((f"{scope}:login", login_key(login), rates["login"]))
+
+        # общий потолок неудачных попыток на все auth-эндпоинты: держит CPU под
+        # credential stuffing с многих IP; успешные входы сюда не списываются
+        if AUTH_THROTTLE_GLOBAL:
+            limits.append((GLOBAL_DIMENSION, "all", AUTH_THROTTLE_GLOBAL, False))
+        return limits
+
+    def allow_request(self, request, view):
+        if not AUTH_THROTTLE_ENABLED:
+            return True
+
+        scope = getattr(view, "throttle_scope", None)
+        try:
+            result = check_sliding_windows(self.get_limits(request, view))
+        except Exception:
+            # Redis недоступен — не блокируем вход
+            return True
+
+        if result is None:
+            return True
+
+        dimension, self.retry_after = result
+        record_rejection(scope, dimension.rsplit(":", 1)[-1])
+        return False
+
+    def wait(self):
+        return self.retry_after
+
+
+class AuthFailureMixin:
+    """
+    Первым базовым классом у view с AuthRateThrottle: ответ 4xx (кроме самого 429)
+    засчитывается в глобальное окно неудачных попыток.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            AUTH_THROTTLE_ENABLED
+            and AUTH_THROTTLE_GLOBAL
+            and 400 <= response.status_code < 500
+            and response.status_code != 429
+        ):
+            record_failure(GLOBAL_DIMENSION, "all", AUTH_THROTTLE_GLOBAL)
+        return response
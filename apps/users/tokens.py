@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from apps.users.entitlements import has_premium
+from apps.users.jwt_blacklist import is_blacklisted, mark_blacklisted
+
+# -------------------------
+# JWT с claims юзера: по access-токену можно аутентифицировать без запроса в БД
+# (см. apps.users.authentication.ClaimsJWTAuthentication)
+# -------------------------
+
+
+def set_user_claims(token, user) -> None:
+    token["is_active"] = bool(user.is_active)
+    token["is_staff"] = bool(user.is_staff)
+    token["premium"] = has_premium(user.id)
+
+
+class ClaimsRefreshToken(RefreshToken):
+    _user = None
+    _user_loaded = False
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user)
+        token._user = user
+        token._user_loaded = True
+        return token
+
+    def _load_user(self):
+        # один SELECT на токен: нужен и для claims, и для журнала outstanding/blacklist
+        if not self._user_loaded:
+            self._user = get_user_model().objects.filter(id=self.payload.get("user_id")).first()
+            self._user_loaded = True
+        return self._user
+
+    @property
+    def access_token(self):
+        access = super().access_token
+
+        # при refresh claims пересчитываем: привилегию могли купить, юзера — заблокировать
+        user = self._load_user()
+        if user:
+            set_user_claims(access, user)
+        return access
+
+    # -------------------------
+    # Blacklist: проверка по jti в Redis, строки в БД — журнал (без лишнего SELECT юзера)
+    # -------------------------
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload["jti"]):
+            raise TokenError("Token is blacklisted")
+
+    def _journal_user_id(self):
+        # как в simplejwt: юзера уже нет (удалён) — строка журнала пишется с user=None
+        user = self._load_user()
+        return user.id if user else None
+
+    def _outstanding(self):
+        token, _ = OutstandingToken.objects.get_or_create(
+            jti=self.payload["jti"],
+            defaults={
+                "user_id": self._journal_user_id(),
+                "created_at": self.current_time,
+                "token": str(self),
+                "expires_at": datetime_from_epoch(self.payload["exp"]),
+            },
+        )
+        return token
+
+    def blacklist(self):
+        mark_blacklisted(self.payload["jti"], self.payload["exp"])
+        return BlacklistedToken.objects.get_or_create(token=self._outstanding())
+
+    def outstand(self):
+        # вызывается после ротации: jti только что выдан, get_or_create (с savepoint) не нужен
+        return OutstandingToken.objects.create(
+            jti=self.payload["jti"],
+            user_id=self._journal_user_id(),
+            created_at=self.current_time,
+            token=str(self),
+            expires_at=datetime_from_epoch(self.payload["exp"]),
+        )
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    validate() из simplejwt, но юзер берётся из токена: тот же SELECT идёт
+    и в проверку активности, и в claims нового access, и в журнал outstanding.
+    """
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user = refresh._load_user()
+        if refresh.payload.get(api_settings.USER_ID_CLAIM) and (
+            user is None or not api_settings.USER_AUTHENTICATION_RULE(user)
+        ):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data["refresh"] = str(refresh)
+
+        return data
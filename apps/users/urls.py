@@ -4,7 +4,7 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from apps.users.views import (
     RegisterView, LoginView, MeView,
     MyPrivilegesView, BuyPrivilegeView, ChangePasswordView, LogoutView,
-    PrivilegeListView
+    PrivilegeListView, DataExportView, DataExportDownloadView,
 )
 from apps.users.social_auth import GoogleAuthView, AppleAuthView, SocialCompleteView
 from apps.users.password_reset import PasswordResetRequestView, PasswordResetConfirmView
@@ -17,6 +17,8 @@ urlpatterns = [
     path("auth/logout/", LogoutView.as_view()),
     path("me/", MeView.as_view()),
     path("me/privileges/", MyPrivilegesView.as_view()),
+    path("me/export/", DataExportView.as_view()),
+    path("me/export/download/<str:token>/", DataExportDownloadView.as_view()),
     path("privileges/", PrivilegeListView.as_view()),
     path("privileges/<int:privilege_id>/buy/", BuyPrivilegeView.as_view()),
     
@@ -1,8 +1,8 @@
 import json
-from decimal import Decimal
 
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
+from django.db import transaction
+from django.http import FileResponse
+from django.utils import timezone
 
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -11,7 +11,12 @@ from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from drf_spectacular.utils import extend_schema, OpenApiTypes
 
-from apps.users.models import UserProfile, UserPrivilege, Privilege
+from apps.users.avatars import avatar_file_names, delete_avatar_files, schedule_avatar_processing, strip_upload
+from apps.users.catalog import CATALOG_HTTP_MAX_AGE, json_response, privileges_catalog
+from apps.users.export import export_status, load_download_token, request_export
+from apps.users.models import DataExport, UserPrivilege, Privilege
+from apps.users.services import data_generation, get_or_create_profile, get_profile_summary, write_profile_summary
+from apps.users.throttling import AuthFailureMixin, AuthRateThrottle
 from .serializers import (
     RegisterSerializer,
     LoginSerializer,
@@ -37,18 +42,9 @@ class PrivilegeListView(APIView):
         responses={200: PrivilegeResponseSerializer(many=True)}
     )
     def get(self, request):
-        qs = Privilege.objects.all().order_by("price", "id")
-        data = [
-            {
-                "id": p.id,
-                "name": p.name,
-                "description": p.description,
-                "price": str(p.price),
-                "created_at": p.created_at.isoformat() if p.created_at else None,
-            }
-            for p in qs
-        ]
-        return Response(data, status=status.HTTP_200_OK)
+        # готовый JSON из apps.users.catalog; публичный кэш — nginx отдаёт без Django
+        body, etag = privileges_catalog.get()
+        return json_response(request, body, etag, f"public, max-age={CATALOG_HTTP_MAX_AGE}")
 
 
 class BuyPrivilegeView(APIView):
@@ -94,52 +90,15 @@ class MyPrivilegesView(APIView):
         return Response(data, status=status.HTTP_200_OK)
 
 
-# ---------------------------
-# Profile stats helper
-# ---------------------------
-
-class ProfileStatsMixin:
-    def get_profile(self, user):
-        profile, _ = UserProfile.objects.get_or_create(user=user)
-        return profile
-
-    def is_premium(self, user) -> bool:
-        return UserPrivilege.objects.filter(user=user).exists()
-
-    def calc_money_stats(self, user):
-        from apps.management.models import Transaction
-
-        income = Transaction.objects.filter(
-            user=user, type=Transaction.INCOME
-        ).aggregate(s=Coalesce(Sum("amount"), Decimal("0")))["s"]
-
-        expense = Transaction.objects.filter(
-            user=user, type=Transaction.EXPENSE
-        ).aggregate(s=Coalesce(Sum("amount"), Decimal("0")))["s"]
-
-        balance = income - expense
-        operations_count = Transaction.objects.filter(user=user).count()
-
-        economy_percent = 0
-        if income > 0:
-            economy_percent = int(((income - expense) / income) * 100)
-            economy_percent = max(0, min(100, economy_percent))
-
-        return {
-            "balance": str(balance),
-            "income_total": str(income),
-            "expense_total": str(expense),
-            "economy_percent": economy_percent,
-            "operations_count": operations_count,
-        }
-
-
 # ---------------------------
 # Auth
 # ---------------------------
 
-class RegisterView(APIView):
+class RegisterView(AuthFailureMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "register"
+    throttle_login_field = "email"
     @extend_schema(
         tags=['Auth'],
         request=RegisterSerializer,
@@ -152,8 +111,12 @@ class RegisterView(APIView):
         user = ser.save()
         return Response({"detail": "OK", "user_id": user.id}, status=status.HTTP_201_CREATED)
 
-class LoginView(APIView):
+class LoginView(AuthFailureMixin, APIView):
     permission_classes = [AllowAny]
+    # отсекаем перебор до check_password (PBKDF2 — самое дорогое в запросе)
+    throttle_classes = [AuthRateThrottle]
+    throttle_scope = "login"
+    throttle_login_field = "login"
     @extend_schema(
         tags=['Auth'],
         request=LoginSerializer,
@@ -186,7 +149,7 @@ class LogoutView(APIView):
 # Me
 # ---------------------------
 
-class MeView(ProfileStatsMixin, APIView):
+class MeView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
     @extend_schema(
@@ -196,18 +159,13 @@ class MeView(ProfileStatsMixin, APIView):
     )
     
     def get(self, request):
-        profile = self.get_profile(request.user)
-        stats = self.calc_money_stats(request.user)
-        return Response({
-            "user": UserSerializer(request.user).data,
-            "profile": UserProfileSerializer(profile, context={"request": request}).data,
-            "is_premium": self.is_premium(request.user),
-            "stats": {**stats, "goals_achieved": profile.goals_achieved}
-        })
+        # кэш под поколением данных юзера (apps.users.services)
+        return Response(get_profile_summary(request.user.id))
 
     
     def patch(self, request):
-        profile = self.get_profile(request.user)
+        generation = data_generation(request.user.id)
+        profile = get_or_create_profile(request.user)
 
         user_data = request.data.get("user", {})
         profile_data = request.data.get("profile", {})
@@ -225,9 +183,9 @@ class MeView(ProfileStatsMixin, APIView):
             except Exception:
                 profile_data = {}
 
-        # avatar отдельным полем (file)
+        # avatar отдельным полем (file); EXIF срезаем до сохранения
         if "avatar" in request.FILES:
-            profile_data["avatar"] = request.FILES["avatar"]
+            profile_data["avatar"] = strip_upload(request.FILES["avatar"])
 
         user_ser = UserSerializer(request.user, data=user_data, partial=True)
         prof_ser = UserProfileSerializer(profile, data=profile_data, partial=True, context={"request": request})
@@ -235,15 +193,81 @@ class MeView(ProfileStatsMixin, APIView):
         user_ser.is_valid(raise_exception=True)
         prof_ser.is_valid(raise_exception=True)
 
+        # файлы прошлого аватара: удалит воркер после обработки нового
+        old_avatar_files = avatar_file_names(profile) if "avatar" in profile_data else set()
+
         user_ser.save()
         prof_ser.save()
 
+        if "avatar" in profile_data:
+            # старые варианты относятся к прошлому аватару; новые сделает воркер
+            profile.avatar_variants = {}
+            profile.save(update_fields=["avatar_variants"])
+            if profile.avatar:
+                schedule_avatar_processing(profile, stale=old_avatar_files)
+            else:
+                profile_id = profile.id
+                transaction.on_commit(lambda: delete_avatar_files(profile_id, old_avatar_files))
+
+        # write-through: GET /me сразу отдаёт новые данные без пересчёта денег
+        write_profile_summary(user_ser.instance, prof_ser.instance, previous_generation=generation)
+
         return Response({
             "user": user_ser.data,
             "profile": prof_ser.data
         }, status=status.HTTP_200_OK)
 
 
+# ---------------------------
+# Data export
+# ---------------------------
+
+class DataExportView(APIView):
+    """
+    POST — поставить полную выгрузку в очередь (202), GET — статус последней и ссылка.
+    Архив собирает воркер (apps.users.export), о готовности приходит уведомление.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(tags=['Profile'], summary="Статус выгрузки данных", responses={200: OpenApiTypes.OBJECT})
+    def get(self, request):
+        export = DataExport.objects.filter(user=request.user).order_by("-id").first()
+        return Response(export_status(export, request), status=status.HTTP_200_OK)
+
+    @extend_schema(tags=['Profile'], summary="Запросить выгрузку данных", request=None, responses={202: OpenApiTypes.OBJECT})
+    def post(self, request):
+        export, _ = request_export(request.user)
+        return Response(export_status(export, request), status=status.HTTP_202_ACCEPTED)
+
+
+class DataExportDownloadView(APIView):
+    """
+    GET /me/export/download/<token>/ — по подписанной ссылке (без JWT), пока не истекла.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @extend_schema(exclude=True)
+    def get(self, request, token: str):
+        export_id = load_download_token(token)
+        export = None
+        if export_id is not None:
+            export = DataExport.objects.filter(
+                id=export_id, status=DataExport.STATUS_READY, expires_at__gt=timezone.now(),
+            ).first()
+        if not export or not export.file:
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        resp = FileResponse(
+            export.file.open("rb"),
+            as_attachment=True,
+            filename=f"besh-tashta-export-{export.created_at:%Y%m%d}.zip",
+            content_type="application/zip",
+        )
+        resp["Cache-Control"] = "private, no-store"
+        return resp
+
+
 class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -1,6 +1,7 @@
 from pathlib import Path
 from datetime import timedelta
 from decouple import AutoConfig
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 env = AutoConfig(search_path=BASE_DIR)
@@ -53,6 +54,7 @@ MIDDLEWARE = [
 
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "apps.users.middleware.EntitlementsMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -101,13 +103,20 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Аватары: размеры квадратных вариантов (WebP + JPEG), делает celery-воркер
+AVATAR_SIZES = (64, 256, 512)
+AVATAR_ORIGINAL_MAX = env("AVATAR_ORIGINAL_MAX", cast=int, default=1024)
+AVATAR_WEBP_QUALITY = env("AVATAR_WEBP_QUALITY", cast=int, default=80)
+AVATAR_JPEG_QUALITY = env("AVATAR_JPEG_QUALITY", cast=int, default=85)
+
 AUTHENTICATION_BACKENDS = (
     "django.contrib.auth.backends.ModelBackend",
 )
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # юзер из claims access-токена (без запроса в БД), отзыв — через кэш is_active
+        "apps.users.authentication.ClaimsJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -128,8 +137,14 @@ SIMPLE_JWT = {
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "apps.users.tokens.ClaimsTokenRefreshSerializer",
 }
 
+# Blacklist refresh-токенов проверяется по jti в Redis; промах без маркера синхронизации — по БД.
+# (maxmemory-policy этого Redis — noeviction: иначе ключ blacklist может вытесниться при живом маркере)
+JWT_BLACKLIST_DB_FALLBACK = env("JWT_BLACKLIST_DB_FALLBACK", cast=bool, default=True)
+JWT_PURGE_BATCH_SIZE = env("JWT_PURGE_BATCH_SIZE", cast=int, default=5000)
+
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -175,12 +190,56 @@ DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default=EMAIL_HOST_USER)
 
 EMAIL_TIMEOUT = env("EMAIL_TIMEOUT", cast=int, default=10)
 
+# Outbox писем: воркер шлёт пачками через одно SMTP-соединение, повтор с backoff
+EMAIL_OUTBOX_BATCH_SIZE = env("EMAIL_OUTBOX_BATCH_SIZE", cast=int, default=50)
+EMAIL_OUTBOX_MAX_ATTEMPTS = env("EMAIL_OUTBOX_MAX_ATTEMPTS", cast=int, default=6)
+EMAIL_OUTBOX_BACKOFF_BASE = env("EMAIL_OUTBOX_BACKOFF_BASE", cast=int, default=30)
+EMAIL_OUTBOX_LEASE_SECONDS = env("EMAIL_OUTBOX_LEASE_SECONDS", cast=int, default=300)
+
+# OTP сброса пароля: код в Redis (HMAC), лимиты на выдачу по логину и IP
+OTP_BACKEND = env("OTP_BACKEND", default="apps.users.otp.RedisOTPBackend")
+OTP_SECRET = env("OTP_SECRET", default="")
+OTP_TTL_MINUTES = env("OTP_TTL_MINUTES", cast=int, default=10)
+OTP_MAX_ATTEMPTS = env("OTP_MAX_ATTEMPTS", cast=int, default=5)
+OTP_AUDIT = env("OTP_AUDIT", cast=bool, default=True)
+OTP_LOGIN_LIMIT = env("OTP_LOGIN_LIMIT", cast=int, default=3)
+OTP_LOGIN_WINDOW = env("OTP_LOGIN_WINDOW", cast=int, default=600)
+OTP_IP_LIMIT = env("OTP_IP_LIMIT", cast=int, default=20)
+OTP_IP_WINDOW = env("OTP_IP_WINDOW", cast=int, default=3600)
+
+# Троттлинг auth-эндпоинтов (sliding window в Redis): "число/период", период s|min|hour|day
+AUTH_THROTTLE_ENABLED = env("AUTH_THROTTLE_ENABLED", cast=bool, default=True)
+AUTH_THROTTLE_GLOBAL = env("AUTH_THROTTLE_GLOBAL", default="200/s")
+AUTH_THROTTLE_RATES = {
+    "login": {
+        "ip": env("AUTH_THROTTLE_LOGIN_IP", default="30/min"),
+        "login": env("AUTH_THROTTLE_LOGIN_PER_LOGIN", default="10/min"),
+    },
+    "register": {"ip": env("AUTH_THROTTLE_REGISTER_IP", default="10/hour")},
+    "password_reset": {
+        "ip": env("AUTH_THROTTLE_PASSWORD_RESET_IP", default="20/hour"),
+        "login": env("AUTH_THROTTLE_PASSWORD_RESET_PER_LOGIN", default="10/hour"),
+    },
+    "password_reset_confirm": {
+        "ip": env("AUTH_THROTTLE_PASSWORD_RESET_CONFIRM_IP", default="30/hour"),
+        "login": env("AUTH_THROTTLE_PASSWORD_RESET_CONFIRM_PER_LOGIN", default="15/hour"),
+    },
+    "social": {"ip": env("AUTH_THROTTLE_SOCIAL_IP", default="30/min")},
+}
+
 SOCIAL_AUTH_GOOGLE_CLIENT_ID = env("SOCIAL_AUTH_GOOGLE_CLIENT_ID", default="")
 SOCIAL_AUTH_APPLE_CLIENT_ID = env("SOCIAL_AUTH_APPLE_CLIENT_ID", default="")
 
 GOOGLE_CLIENT_ID = SOCIAL_AUTH_GOOGLE_CLIENT_ID
 APPLE_CLIENT_ID = SOCIAL_AUTH_APPLE_CLIENT_ID
 
+# JWKS Google/Apple: срок по Cache-Control, фоновое обновление заранее, запас на недоступность провайдера
+SOCIAL_JWKS_DEFAULT_MAX_AGE = env("SOCIAL_JWKS_DEFAULT_MAX_AGE", cast=int, default=3600)
+SOCIAL_JWKS_REFRESH_AHEAD = env("SOCIAL_JWKS_REFRESH_AHEAD", cast=int, default=15 * 60)
+SOCIAL_JWKS_STALE_GRACE = env("SOCIAL_JWKS_STALE_GRACE", cast=int, default=60 * 60 * 24)
+SOCIAL_JWKS_FAILURE_BACKOFF = env("SOCIAL_JWKS_FAILURE_BACKOFF", cast=int, default=60)
+SOCIAL_JWKS_FETCH_TIMEOUT = env("SOCIAL_JWKS_FETCH_TIMEOUT", cast=int, default=3)
+
 
 REDIS_URL = env("REDIS_URL", default="redis://127.0.0.1:6379/0")
 
@@ -201,6 +260,64 @@ CHANNEL_LAYERS = {
 }
 FIREBASE_SERVICE_ACCOUNT = env("FIREBASE_SERVICE_ACCOUNT", default="")
 
+# Push-транспорт: настоящий FCM или apps.notifications.fake_fcm.FakeFCMTransport (локально/бенчмарк)
+NOTIFICATIONS_PUSH_TRANSPORT = env("NOTIFICATIONS_PUSH_TRANSPORT", default="apps.notifications.firebase.FirebaseTransport")
+NOTIFICATIONS_FAKE_FCM = {
+    "LATENCY_MS": env("FAKE_FCM_LATENCY_MS", cast=float, default=30),
+    "UNREGISTERED_RATE": env("FAKE_FCM_UNREGISTERED_RATE", cast=float, default=0.0),
+    "QUOTA_RATE": env("FAKE_FCM_QUOTA_RATE", cast=float, default=0.0),
+}
+
+# WS replay: сколько последних сообщений храним на юзера и сколько живёт стрим
+NOTIFICATIONS_WS_STREAM_MAXLEN = env("NOTIFICATIONS_WS_STREAM_MAXLEN", cast=int, default=200)
+NOTIFICATIONS_WS_STREAM_TTL = env("NOTIFICATIONS_WS_STREAM_TTL", cast=int, default=60 * 60 * 24 * 7)
+
+# WS auth: юзер из claims токена (без БД) + кэш is_active; отдельный пул для sync-вызовов
+WS_AUTH_TOKEN_USER = env("WS_AUTH_TOKEN_USER", cast=bool, default=True)
+USER_ACTIVE_CACHE_TTL = env("USER_ACTIVE_CACHE_TTL", cast=int, default=60)
+
+# Soft delete счетов/категорий/юзеров: воркер удаляет зависимые строки пачками
+PURGE_BATCH_SIZE = env("PURGE_BATCH_SIZE", cast=int, default=2000)
+# аренда purge: столько минут объект считается занятым воркером (продлевается после каждой пачки)
+PURGE_LEASE_MINUTES = env("PURGE_LEASE_MINUTES", cast=int, default=10)
+
+# Сводка профиля (/users/me/) в кэше под поколением данных юзера
+PROFILE_SUMMARY_TTL = env("PROFILE_SUMMARY_TTL", cast=int, default=600)
+
+# Купленные привилегии юзера в кэше (сброс сигналами UserPrivilege)
+ENTITLEMENTS_CACHE_TTL = env("ENTITLEMENTS_CACHE_TTL", cast=int, default=60 * 60)
+
+# Публичные справочники (тарифы, мотивация): Redis под версией + копия в процессе
+CATALOG_CACHE_TTL = env("CATALOG_CACHE_TTL", cast=int, default=60 * 60)
+CATALOG_LOCAL_TTL = env("CATALOG_LOCAL_TTL", cast=int, default=5)
+CATALOG_HTTP_MAX_AGE = env("CATALOG_HTTP_MAX_AGE", cast=int, default=60)
+
+# Персональные подсказки ленты: ночной пересчёт пачками юзеров
+INSIGHTS_CHUNK_SIZE = env("INSIGHTS_CHUNK_SIZE", cast=int, default=500)
+INSIGHTS_SPIKE_MIN_AMOUNT = env("INSIGHTS_SPIKE_MIN_AMOUNT", cast=int, default=500)
+
+# "Большой расход": перцентиль по скетчу трат; до BIG_EXPENSE_MIN_SAMPLES трат — фиксированный порог
+BIG_EXPENSE_MIN_SAMPLES = env("BIG_EXPENSE_MIN_SAMPLES", cast=int, default=20)
+BIG_EXPENSE_FALLBACK_THRESHOLD = env("BIG_EXPENSE_FALLBACK_THRESHOLD", cast=int, default=1000)
+
+# Выгрузка всех данных юзера (zip с NDJSON): сколько живёт ссылка, размер пачки курсора
+DATA_EXPORT_TTL_HOURS = env("DATA_EXPORT_TTL_HOURS", cast=int, default=48)
+DATA_EXPORT_CHUNK_SIZE = env("DATA_EXPORT_CHUNK_SIZE", cast=int, default=2000)
+# через сколько минут висящая выгрузка (воркер упал, задача потерялась) считается зависшей
+DATA_EXPORT_STALE_MINUTES = env("DATA_EXPORT_STALE_MINUTES", cast=int, default=30)
+NOTIFICATIONS_WS_EXECUTOR_WORKERS = env("NOTIFICATIONS_WS_EXECUTOR_WORKERS", cast=int, default=8)
+NOTIFICATIONS_PUSH_EXECUTOR_WORKERS = env("NOTIFICATIONS_PUSH_EXECUTOR_WORKERS", cast=int, default=16)
+
+NOTIFICATIONS_BROADCAST_CHUNK_SIZE = env("NOTIFICATIONS_BROADCAST_CHUNK_SIZE", cast=int, default=1000)
+
+# Схлопывание однотипных уведомлений (сек) и token bucket на push для юзера
+NOTIFICATIONS_COLLAPSE_WINDOW = env("NOTIFICATIONS_COLLAPSE_WINDOW", cast=int, default=600)
+NOTIFICATIONS_PUSH_BUCKET_CAPACITY = env("NOTIFICATIONS_PUSH_BUCKET_CAPACITY", cast=int, default=5)
+NOTIFICATIONS_PUSH_BUCKET_REFILL_PER_MIN = env("NOTIFICATIONS_PUSH_BUCKET_REFILL_PER_MIN", cast=float, default=1)
+
+# Presence: сокет считается живым столько секунд после connect/ping
+NOTIFICATIONS_PRESENCE_TTL = env("NOTIFICATIONS_PRESENCE_TTL", cast=int, default=90)
+
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL 
 CELERY_ACCEPT_CONTENT = ["json"]
@@ -208,6 +325,54 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Bishkek"
 
+CELERY_BEAT_SCHEDULE = {
+    # напоминания календаря: точность = период тика
+    "calendar-fire-due-reminders": {
+        "task": "apps.notifications.tasks.fire_due_reminders",
+        "schedule": env("CALENDAR_REMINDER_TICK_SECONDS", cast=float, default=5.0),
+    },
+    # подбирает повторы и письма, для которых не дошёл .delay()
+    "users-send-email-outbox": {
+        "task": "apps.users.tasks.send_email_outbox",
+        "schedule": 30.0,
+    },
+    # ключи Google/Apple обновляем заранее, логины читают их из Redis
+    "users-refresh-social-jwks": {
+        "task": "apps.users.tasks.refresh_social_jwks",
+        "schedule": 5 * 60,
+    },
+    "management-purge-soft-deleted": {
+        "task": "apps.management.tasks.purge_soft_deleted",
+        "schedule": 10 * 60,
+    },
+    # возвращает в Redis ключи blacklist и маркер синхронизации после flush/эвикции/первого деплоя
+    "users-sync-jwt-blacklist": {
+        "task": "apps.users.tasks.sync_jwt_blacklist",
+        "schedule": 60 * 60,
+    },
+    "users-purge-expired-jwt-tokens": {
+        "task": "apps.users.tasks.purge_expired_jwt_tokens",
+        "schedule": 60 * 60 * 6,
+    },
+    "users-purge-expired-otp-codes": {
+        "task": "apps.users.tasks.purge_expired_otp_codes",
+        "schedule": 60 * 60 * 24,
+    },
+    "motivation-nightly-insights": {
+        "task": "apps.motivation.tasks.schedule_nightly_insights",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "users-purge-expired-data-exports": {
+        "task": "apps.users.tasks.purge_expired_data_exports",
+        "schedule": 60 * 60,
+    },
+    # зависшие выгрузки: running -> failed, потерянные pending — снова в очередь
+    "users-sweep-stale-data-exports": {
+        "task": "apps.users.tasks.sweep_stale_data_exports",
+        "schedule": 10 * 60,
+    },
+}
+
 # from pathlib import Path
 # from datetime import timedelta
 # from decouple import AutoConfig
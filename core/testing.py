@@ -0,0 +1,30 @@
+import fakeredis
+from django.test import override_settings
+from django_redis import get_redis_connection
+
+# -------------------------
+# Тесты без живого Redis: django-redis поверх fakeredis (Lua-скрипты — через lupa),
+# channels — in-memory слой. Состояние общее на процесс, setUp его чистит.
+# -------------------------
+
+FAKE_REDIS_CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://fakeredis:6379/0",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_POOL_KWARGS": {"connection_class": fakeredis.FakeConnection},
+        },
+        "KEY_PREFIX": "beshtash",
+    }
+}
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class FakeRedisMixin:
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(CACHES=FAKE_REDIS_CACHES, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS))
+        self.redis = get_redis_connection("default")
+        self.redis.flushall()